@@ -1,8 +1,8 @@
 cimport cython
-# cimport numpy as np
-# import numpy as np
+cimport numpy as np
+import numpy as np
 
-# np.import_array()
+np.import_array()
 
 
 
@@ -269,4 +269,153 @@ cdef class FDRSet(object):
 
     def __reduce__(self):
         return self.__class__, (self.total_q_value, self.peptide_q_value,
-                                self.glycan_q_value, self.glycopeptide_q_value)
\ No newline at end of file
+                                self.glycan_q_value, self.glycopeptide_q_value)
+
+
+# Peak matching kernels operating on the arrays of a :class:`~.ScanPeakIndex`. The
+# loops run without the GIL, so several threads can match against the same scan at once.
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline Py_ssize_t _lower_bound(const double* values, Py_ssize_t n, double x) nogil:
+    cdef Py_ssize_t lo = 0, hi = n, mid
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if values[mid] < x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline Py_ssize_t _upper_bound(const double* values, Py_ssize_t n, double x) nogil:
+    cdef Py_ssize_t lo = 0, hi = n, mid
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if values[mid] <= x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef tuple match_masses(const double[::1] neutral_masses, const double[::1] query_masses,
+                         double error_tolerance=2e-5):
+    """Find every entry of the sorted array `neutral_masses` within `error_tolerance`
+    PPM of each of `query_masses`.
+
+    Parameters
+    ----------
+    neutral_masses : :class:`np.ndarray`
+        The sorted peak masses
+    query_masses : :class:`np.ndarray`
+        The masses to search for
+    error_tolerance : float
+
+    Returns
+    -------
+    query_indices : :class:`np.ndarray`
+    peak_indices : :class:`np.ndarray`
+    """
+    cdef:
+        Py_ssize_t i, j, k, n_peaks, n_queries, total, lo
+        double width
+        Py_ssize_t[::1] lows, counts, query_view, peak_view
+
+    n_peaks = neutral_masses.shape[0]
+    n_queries = query_masses.shape[0]
+    lows_array = np.zeros(n_queries, dtype=np.intp)
+    counts_array = np.zeros(n_queries, dtype=np.intp)
+    lows = lows_array
+    counts = counts_array
+    total = 0
+    if n_peaks > 0:
+        with nogil:
+            for i in range(n_queries):
+                width = query_masses[i] * error_tolerance
+                lo = _lower_bound(&neutral_masses[0], n_peaks, query_masses[i] - width)
+                lows[i] = lo
+                counts[i] = _upper_bound(&neutral_masses[0], n_peaks, query_masses[i] + width) - lo
+                total += counts[i]
+    query_indices = np.empty(total, dtype=np.intp)
+    peak_indices = np.empty(total, dtype=np.intp)
+    query_view = query_indices
+    peak_view = peak_indices
+    with nogil:
+        k = 0
+        for i in range(n_queries):
+            for j in range(counts[i]):
+                query_view[k] = i
+                peak_view[k] = lows[i] + j
+                k += 1
+    return query_indices, peak_indices
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef double sum_log_intensities(const double[::1] log_intensities, const Py_ssize_t[::1] peak_indices,
+                                 double minimum=-np.inf):
+    """Sum the entries of `log_intensities` selected by `peak_indices`, raising any
+    entry less than `minimum` to `minimum`.
+
+    Parameters
+    ----------
+    log_intensities : :class:`np.ndarray`
+    peak_indices : :class:`np.ndarray`
+    minimum : float
+
+    Returns
+    -------
+    float
+    """
+    cdef:
+        Py_ssize_t i, n
+        double total, value
+
+    n = peak_indices.shape[0]
+    total = 0
+    with nogil:
+        for i in range(n):
+            value = log_intensities[peak_indices[i]]
+            if value < minimum:
+                value = minimum
+            total += value
+    return total
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef double weighted_log_intensity_sum(const double[::1] log_intensities, const Py_ssize_t[::1] peak_indices,
+                                        const double[::1] mass_errors, double error_tolerance=2e-5):
+    """Sum the entries of `log_intensities` selected by `peak_indices`, each weighted
+    by ``1 - (|error| / error_tolerance) ** 4`` as the log intensity scorers do.
+
+    Parameters
+    ----------
+    log_intensities : :class:`np.ndarray`
+    peak_indices : :class:`np.ndarray`
+    mass_errors : :class:`np.ndarray`
+        The PPM error of each match
+    error_tolerance : float
+
+    Returns
+    -------
+    float
+    """
+    cdef:
+        Py_ssize_t i, n
+        double total, ratio
+
+    n = peak_indices.shape[0]
+    total = 0
+    with nogil:
+        for i in range(n):
+            ratio = mass_errors[i] / error_tolerance
+            if ratio < 0:
+                ratio = -ratio
+            total += log_intensities[peak_indices[i]] * (1 - ratio * ratio * ratio * ratio)
+    return total
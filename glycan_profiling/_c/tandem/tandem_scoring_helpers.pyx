@@ -202,14 +202,13 @@ def calculate_glycan_score(self, double error_tolerance=2e-5, double core_weight
 def SimpleCoverageScorer_match_backbone_series(self, IonSeriesBase series, double error_tolerance=2e-5,
                                                set masked_peaks=None, strategy=None, bint include_neutral_losses=False):
     cdef:
-        list frags, fragments
-        tuple peaks
+        list frags, matches, peak_groups
+        tuple peaks, position
         bint glycosylated_position, previous_position_glycosylated
         PeptideFragment frag
         FragmentMatchMap solution_map
         long glycosylated_term_ions_count
         DeconvolutedPeak peak
-        DeconvolutedPeakSet spectrum
         size_t i, n, j, m, i_peaks, n_peaks
 
     if strategy is None:
@@ -220,25 +219,22 @@ def SimpleCoverageScorer_match_backbone_series(self, IonSeriesBase series, doubl
     previous_position_glycosylated = False
     glycosylated_term_ions_count = 0
 
-    spectrum = self.spectrum
-    obj = self.get_fragments(series, strategy=strategy, include_neutral_losses=include_neutral_losses)
-    if not isinstance(obj, list):
-        fragments = list(obj)
-    else:
-        fragments = <list>obj
+    matches = <list>self._backbone_peak_matches(series, error_tolerance, strategy, include_neutral_losses)
 
     solution_map = <FragmentMatchMap>self.solution_map
 
-    n = PyList_GET_SIZE(fragments)
+    n = PyList_GET_SIZE(matches)
     for i in range(n):
-        frags = <list>PyList_GET_ITEM(fragments, i)
+        position = <tuple>PyList_GET_ITEM(matches, i)
+        frags = <list>PyTuple_GET_ITEM(position, 0)
+        peak_groups = <list>PyTuple_GET_ITEM(position, 1)
         glycosylated_position = previous_position_glycosylated
         m = PyList_GET_SIZE(frags)
         for j in range(m):
             frag = <PeptideFragment>PyList_GET_ITEM(frags, j)
             if not glycosylated_position:
                 glycosylated_position |= frag._is_glycosylated()
-            peaks = <tuple>spectrum.all_peaks_for(frag.mass, error_tolerance)
+            peaks = <tuple>PyList_GET_ITEM(peak_groups, j)
             for i_peaks in range(PyTuple_Size(peaks)):
                 peak = <DeconvolutedPeak>PyTuple_GetItem(peaks, i_peaks)
                 if peak._index.neutral_mass in masked_peaks:
@@ -261,15 +257,14 @@ def CoverageWeightedBinomialScorer_match_backbone_series(self, IonSeriesBase ser
                                                          set masked_peaks=None, strategy=None,
                                                          bint include_neutral_losses=False):
     cdef:
-        list frags, fragments
-        tuple peaks
+        list frags, matches, peak_groups
+        tuple peaks, position
         bint glycosylated_position, previous_position_glycosylated
         PeptideFragment frag
         FragmentMatchMap solution_map
         long glycosylated_term_ions_count
         long n_theoretical
         DeconvolutedPeak peak
-        DeconvolutedPeakSet spectrum
         size_t i, n, j, m, i_peaks, n_peaks
 
 
@@ -280,18 +275,15 @@ def CoverageWeightedBinomialScorer_match_backbone_series(self, IonSeriesBase ser
     previous_position_glycosylated = False
     glycosylated_term_ions_count = 0
 
-    spectrum = self.spectrum
-    obj = self.get_fragments(series, strategy=strategy, include_neutral_losses=include_neutral_losses)
-    if not isinstance(obj, list):
-        fragments = list(obj)
-    else:
-        fragments = <list>obj
+    matches = <list>self._backbone_peak_matches(series, error_tolerance, strategy, include_neutral_losses)
 
     solution_map = <FragmentMatchMap>self.solution_map
 
-    n = PyList_GET_SIZE(fragments)
+    n = PyList_GET_SIZE(matches)
     for i in range(n):
-        frags = <list>PyList_GET_ITEM(fragments, i)
+        position = <tuple>PyList_GET_ITEM(matches, i)
+        frags = <list>PyTuple_GET_ITEM(position, 0)
+        peak_groups = <list>PyTuple_GET_ITEM(position, 1)
 
         glycosylated_position = previous_position_glycosylated
         n_theoretical += 1
@@ -300,7 +292,7 @@ def CoverageWeightedBinomialScorer_match_backbone_series(self, IonSeriesBase ser
             frag = <PeptideFragment>PyList_GET_ITEM(frags, j)
             if not glycosylated_position:
                 glycosylated_position |= frag._is_glycosylated()
-            peaks = spectrum.all_peaks_for(frag.mass, error_tolerance)
+            peaks = <tuple>PyList_GET_ITEM(peak_groups, j)
             n_peaks = PyTuple_Size(peaks)
             for i_peaks in range(n_peaks):
                 peak = <DeconvolutedPeak>PyTuple_GetItem(peaks, i_peaks)
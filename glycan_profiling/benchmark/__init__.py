@@ -0,0 +1,21 @@
+"""A reproducible benchmark suite for the hot stages of glycan and glycopeptide
+analysis, run offline against the bundled test fixtures and synthetic data scaled
+up from them.
+"""
+from .harness import (
+    BenchmarkCase,
+    BenchmarkResult,
+    BenchmarkRunner,
+    BenchmarkHistory,
+    BenchmarkRegression,
+    benchmark_registry,
+    register_benchmark,
+    execute_benchmark,
+    execute_benchmark_isolated,
+    compare_to_baseline,
+    load_benchmark_record,
+    write_benchmark_record,
+    peak_resident_set_size,
+    format_bytes)
+
+from . import cases
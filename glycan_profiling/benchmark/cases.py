@@ -0,0 +1,297 @@
+"""The benchmark cases covering the hot stages of glycan and glycopeptide analysis.
+
+Each case builds its inputs from the bundled test fixtures, scaled up with the
+generators in :mod:`glycan_profiling.benchmark.synthetic`, and times only the
+stage it is named for.
+"""
+import os
+import shutil
+import tempfile
+
+from glycan_profiling.chromatogram_tree import Unmodified, Ammonium
+from glycan_profiling.database import GlycanCompositionDiskBackedStructureDatabase
+from glycan_profiling.database.builder.glycan import CombinatorialGlycanHypothesisSerializer
+from glycan_profiling.database.analysis.analysis_migration import (
+    GlycanCompositionChromatogramAnalysisSerializer)
+from glycan_profiling.models import GeneralScorer
+from glycan_profiling.test.fixtures import get_test_data
+from glycan_profiling.trace import (
+    ChromatogramExtractor, ChromatogramProcessor, GlycanChromatogramMatcher)
+from glycan_profiling.tandem.target_decoy import TargetDecoyAnalyzer
+from glycan_profiling.tandem.glycopeptide.core_search import GlycanFilteringPeptideMassEstimator
+from glycan_profiling.tandem.glycopeptide.dynamic_generation.search_space import (
+    PeptideGlycosylator, PredictiveGlycopeptideSearch)
+from glycan_profiling.tandem.glycopeptide.dynamic_generation.journal import (
+    JournalFileWriter, JournalFileReader)
+from glycan_profiling.tandem.glycopeptide.scoring import LogIntensityScorer
+
+from .harness import BenchmarkCase, register_benchmark
+from .synthetic import (
+    load_sample, load_msn_scans, glycomics_sample, glycan_rules,
+    glycan_combinations_from_rules, synthetic_peptides,
+    synthetic_target_decoy_scores, synthetic_solution_sets,
+    ReplicatedRunPeakSource)
+
+
+mass_error_tolerance = 1e-5
+product_error_tolerance = 2e-5
+grouping_error_tolerance = 1.5e-5
+minimum_mass = 500.
+delta_rt = 0.5
+
+
+class TemporaryDirectoryMixin(object):
+    def make_directory(self):
+        self.directory = tempfile.mkdtemp(prefix="glycresoft-benchmark-")
+        return self.directory
+
+    def remove_directory(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class GlycomicsBenchmarkBase(TemporaryDirectoryMixin, BenchmarkCase):
+    """Shared setup for the stages of a glycan composition LC-MS analysis of
+    the bundled AGP glycomics run, replicated ``scale`` times end to end.
+    """
+    unit = "chromatograms"
+
+    def build_peak_source(self):
+        self.peak_source = ReplicatedRunPeakSource(load_sample(glycomics_sample), self.scale)
+        return self.peak_source
+
+    def build_database(self):
+        path = os.path.join(self.directory, "glycans.db")
+        builder = CombinatorialGlycanHypothesisSerializer(get_test_data(glycan_rules), path)
+        builder.run()
+        self.database = GlycanCompositionDiskBackedStructureDatabase(path, builder.hypothesis_id)
+        return self.database
+
+    def make_extractor(self):
+        return ChromatogramExtractor(
+            self.peak_source, minimum_mass=minimum_mass,
+            grouping_tolerance=grouping_error_tolerance, delta_rt=delta_rt)
+
+    def teardown(self):
+        self.remove_directory()
+
+
+@register_benchmark
+class ChromatogramExtractionBenchmark(GlycomicsBenchmarkBase):
+    """Aggregate MS1 peaks into chromatograms. The peaks are read from the sample
+    during setup so the timing covers aggregation, filtering and summary traces
+    rather than file parsing.
+    """
+    name = "chromatogram-extraction"
+    unit = "peaks"
+
+    def setup(self):
+        self.make_directory()
+        self.build_peak_source()
+        # Warm the peak cache so only extraction is timed
+        self.make_extractor().load_peaks()
+
+    def run(self):
+        extractor = self.make_extractor()
+        extractor.run()
+        return len(extractor.accumulated)
+
+
+@register_benchmark
+class ChromatogramMatchingBenchmark(GlycomicsBenchmarkBase):
+    """Match extracted chromatograms to glycan compositions with :meth:`ChromatogramMatcher.process`,
+    including mass shift handling.
+    """
+    name = "chromatogram-matching"
+
+    def setup(self):
+        self.make_directory()
+        self.build_peak_source()
+        self.build_database()
+        self.chromatograms = self.make_extractor().run()
+
+    def prepare(self):
+        self.matcher = GlycanChromatogramMatcher(self.database)
+        self.inputs = [chromatogram.clone() for chromatogram in self.chromatograms]
+
+    def run(self):
+        self.matcher.process(
+            self.inputs, [Ammonium], mass_error_tolerance, delta_rt=delta_rt * 4)
+        return len(self.inputs)
+
+
+@register_benchmark
+class AnalysisSerializationBenchmark(GlycomicsBenchmarkBase):
+    """Write scored glycan composition chromatograms, with the hypothesis and sample
+    records they reference, to a new analysis database.
+    """
+    name = "analysis-serialization"
+
+    def setup(self):
+        self.make_directory()
+        self.build_peak_source()
+        self.build_database()
+        self.extractor = self.make_extractor()
+        processor = ChromatogramProcessor(
+            self.extractor.run(), self.database, mass_error_tolerance=mass_error_tolerance,
+            scoring_model=GeneralScorer, delta_rt=delta_rt, peak_loader=self.peak_source)
+        self.solutions = processor.run()
+        # Serialization rewrites composition ids to those in the output database
+        self.composition_ids = [
+            (solution, solution.composition.id) for solution in self.solutions
+            if solution.composition is not None]
+        self.iteration = 0
+
+    def prepare(self):
+        for solution, composition_id in self.composition_ids:
+            solution.composition.id = composition_id
+        self.iteration += 1
+        self.output_path = os.path.join(self.directory, "analysis-%d.db" % self.iteration)
+
+    def run(self):
+        serializer = GlycanCompositionChromatogramAnalysisSerializer(
+            self.output_path, "benchmark", self.peak_source.sample_run,
+            self.solutions, self.database, self.extractor)
+        serializer.run()
+        return len(self.solutions)
+
+
+class GlycoproteomicsBenchmarkBase(BenchmarkCase):
+    """Shared setup for the stages of a dynamically generated glycopeptide search
+    of the bundled glycopeptide spectra against a synthetic peptide database which
+    grows with ``scale`` and the bundled human N-glycan composition space.
+    """
+    unit = "spectra"
+
+    peptides_per_scale = 250
+    scan_copies = 25
+
+    def build_search(self):
+        self.scans = load_msn_scans(copies=self.scan_copies)
+        self.glycan_combinations = glycan_combinations_from_rules()
+        self.peptides = synthetic_peptides(self.peptides_per_scale * self.scale)
+        self.glycosylator = PeptideGlycosylator(self.peptides, self.glycan_combinations)
+        self.search = PredictiveGlycopeptideSearch(
+            self.glycosylator, product_error_tolerance=product_error_tolerance)
+        return self.search
+
+    def candidates_by_scan(self):
+        workload = self.search.handle_scan_group(
+            load_msn_scans(), mass_error_tolerance, [Unmodified])
+        return {
+            scan_id: [workload.hit_map[hit_id] for hit_id in sorted(set(hit_ids))]
+            for scan_id, hit_ids in workload.scan_to_hit_map.items()}
+
+
+@register_benchmark
+class PeptideMassEstimationBenchmark(GlycoproteomicsBenchmarkBase):
+    """Rank peptide backbone masses for each spectrum with
+    :meth:`GlycanFilteringPeptideMassEstimator.match`.
+    """
+    name = "peptide-mass-estimation"
+
+    def setup(self):
+        self.scans = load_msn_scans(copies=self.scan_copies * self.scale)
+        self.estimator = GlycanFilteringPeptideMassEstimator(
+            glycan_combinations_from_rules(), product_error_tolerance)
+
+    def run(self):
+        match = self.estimator.match
+        for scan in self.scans:
+            match(scan)
+        return len(self.scans)
+
+
+@register_benchmark
+class PredictiveSearchBenchmark(GlycoproteomicsBenchmarkBase):
+    """Generate candidate glycopeptides for each spectrum with
+    :meth:`PredictiveGlycopeptideSearch.handle_scan_group`.
+    """
+    name = "predictive-glycopeptide-search"
+
+    def setup(self):
+        self.build_search()
+
+    def prepare(self):
+        self.search.reset()
+
+    def run(self):
+        self.search.handle_scan_group(self.scans, mass_error_tolerance, [Unmodified])
+        return len(self.scans)
+
+
+@register_benchmark
+class GlycopeptideScoringBenchmark(GlycoproteomicsBenchmarkBase):
+    """Evaluate each candidate glycopeptide against its spectrum with the scoring
+    model used by the dynamically generated search. Every repetition scores freshly
+    built structures so fragment caches do not carry over.
+    """
+    name = "glycopeptide-scoring"
+    unit = "candidates"
+
+    def setup(self):
+        self.build_search()
+        candidates = self.candidates_by_scan()
+        self.pairs = [
+            (scan, record) for scan in load_msn_scans(copies=self.scan_copies)
+            for record in candidates.get(scan.id, ())]
+
+    def prepare(self):
+        self.targets = [(scan, record.convert()) for scan, record in self.pairs]
+
+    def run(self):
+        evaluate = LogIntensityScorer.evaluate
+        for scan, target in self.targets:
+            evaluate(scan, target, error_tolerance=product_error_tolerance)
+        return len(self.targets)
+
+
+@register_benchmark
+class TargetDecoyBenchmark(BenchmarkCase):
+    """Estimate q-values for synthetic target and decoy score series with
+    :class:`TargetDecoyAnalyzer`.
+    """
+    name = "target-decoy-q-values"
+    unit = "matches"
+
+    matches_per_scale = 10000
+
+    def setup(self):
+        self.targets, self.decoys = synthetic_target_decoy_scores(self.matches_per_scale * self.scale)
+
+    def run(self):
+        analyzer = TargetDecoyAnalyzer(self.targets, self.decoys)
+        analyzer.q_values()
+        return len(self.targets) + len(self.decoys)
+
+
+@register_benchmark
+class JournalRoundTripBenchmark(TemporaryDirectoryMixin, GlycoproteomicsBenchmarkBase):
+    """Write glycopeptide spectrum matches to a journal file and read them back."""
+    name = "journal-round-trip"
+    unit = "matches"
+
+    solution_set_copies = 500
+
+    def setup(self):
+        self.make_directory()
+        self.build_search()
+        candidates = {
+            scan_id: [record.convert() for record in records]
+            for scan_id, records in self.candidates_by_scan().items()}
+        self.solution_sets = synthetic_solution_sets(
+            load_msn_scans(copies=self.solution_set_copies * self.scale), candidates)
+        self.path = os.path.join(self.directory, "journal.tsv")
+
+    def run(self):
+        writer = JournalFileWriter(self.path)
+        writer.writeall(self.solution_sets)
+        writer.close()
+        reader = JournalFileReader(self.path)
+        count = 0
+        for _ in reader:
+            count += 1
+        reader.close()
+        return count
+
+    def teardown(self):
+        self.remove_directory()
@@ -0,0 +1,401 @@
+import os
+import sys
+import gc
+import json
+import platform
+import traceback
+import multiprocessing
+
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from timeit import default_timer
+
+try:
+    from Queue import Empty
+except ImportError:
+    from queue import Empty
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import numpy as np
+import six
+
+from glycan_profiling.task import TaskBase
+from glycan_profiling.version import version
+
+
+def peak_resident_set_size():
+    """Get the peak resident set size of the current process in bytes.
+
+    Returns
+    -------
+    int or :const:`None`
+        The high water mark of the process's resident memory, or :const:`None`
+        if it cannot be determined on this platform.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return int(usage)
+    return int(usage) * 1024
+
+
+benchmark_registry = OrderedDict()
+
+
+def register_benchmark(cls):
+    """A class decorator which adds a :class:`BenchmarkCase` subclass to
+    :data:`benchmark_registry` under its :attr:`~.BenchmarkCase.name`.
+    """
+    benchmark_registry[cls.name] = cls
+    return cls
+
+
+class BenchmarkCase(object):
+    """A single timed stage of the search pipeline.
+
+    A case builds its inputs once in :meth:`setup`, restores any state the
+    timed call consumes in :meth:`prepare` before each repetition, and does
+    the measured work in :meth:`run`, returning the number of items it processed
+    so that throughput can be compared across scales.
+
+    Attributes
+    ----------
+    name : str
+        The name the case is registered and reported under
+    unit : str
+        What one item processed by :meth:`run` represents
+    scale : int
+        A multiplier for the size of the synthetic inputs the case builds
+    """
+    name = None
+    unit = "items"
+
+    def __init__(self, scale=1):
+        self.scale = scale
+
+    def setup(self):
+        pass
+
+    def prepare(self):
+        pass
+
+    def run(self):
+        raise NotImplementedError()
+
+    def teardown(self):
+        pass
+
+
+class BenchmarkResult(object):
+    """The measurements collected for one :class:`BenchmarkCase`.
+
+    Attributes
+    ----------
+    name : str
+        The name of the measured case
+    scale : int
+        The scale the case was run at
+    wall_times : list of float
+        The wall clock time in seconds of each repetition of :meth:`BenchmarkCase.run`
+    items : int
+        The number of items processed by a single repetition
+    unit : str
+        What one item represents
+    peak_rss : int
+        The peak resident set size in bytes of the process which ran the case,
+        including its setup
+    error : str
+        The formatted traceback if the case failed, otherwise :const:`None`
+    """
+
+    def __init__(self, name, scale, wall_times=None, items=0, unit="items", peak_rss=None, error=None):
+        self.name = name
+        self.scale = scale
+        self.wall_times = list(wall_times or [])
+        self.items = items
+        self.unit = unit
+        self.peak_rss = peak_rss
+        self.error = error
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    @property
+    def wall_time(self):
+        """The median wall time of a repetition"""
+        if not self.wall_times:
+            return None
+        return float(np.median(self.wall_times))
+
+    @property
+    def min_wall_time(self):
+        if not self.wall_times:
+            return None
+        return min(self.wall_times)
+
+    @property
+    def items_per_second(self):
+        wall_time = self.wall_time
+        if not wall_time:
+            return None
+        return self.items / wall_time
+
+    def to_dict(self):
+        return OrderedDict([
+            ("name", self.name),
+            ("scale", self.scale),
+            ("items", self.items),
+            ("unit", self.unit),
+            ("wall_time", self.wall_time),
+            ("min_wall_time", self.min_wall_time),
+            ("wall_times", self.wall_times),
+            ("items_per_second", self.items_per_second),
+            ("peak_rss", self.peak_rss),
+            ("error", self.error),
+        ])
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['name'], data['scale'], data.get('wall_times'), data.get('items', 0),
+            data.get('unit', 'items'), data.get('peak_rss'), data.get('error'))
+
+    def __repr__(self):
+        if self.failed:
+            return "{self.__class__.__name__}({self.name!r}, failed)".format(self=self)
+        return ("{self.__class__.__name__}({self.name!r}, wall_time={self.wall_time:0.4f}, "
+                "items={self.items}, peak_rss={self.peak_rss})").format(self=self)
+
+
+def execute_benchmark(case_type, scale=1, repeats=3):
+    """Set up and time ``case_type`` in the current process.
+
+    Parameters
+    ----------
+    case_type : type
+        A :class:`BenchmarkCase` subclass
+    scale : int
+        The scale to build the case's inputs at
+    repeats : int
+        The number of timed repetitions of :meth:`BenchmarkCase.run`
+
+    Returns
+    -------
+    :class:`BenchmarkResult`
+    """
+    case = case_type(scale)
+    wall_times = []
+    items = 0
+    try:
+        case.setup()
+        try:
+            for _ in range(repeats):
+                case.prepare()
+                gc.collect()
+                start = default_timer()
+                items = case.run()
+                wall_times.append(default_timer() - start)
+        finally:
+            case.teardown()
+    except Exception:
+        return BenchmarkResult(
+            case.name, scale, wall_times, items, case.unit, peak_resident_set_size(),
+            error=traceback.format_exc())
+    return BenchmarkResult(
+        case.name, scale, wall_times, items, case.unit, peak_resident_set_size())
+
+
+def _execute_benchmark_in_worker(case_type, scale, repeats, queue):
+    result = execute_benchmark(case_type, scale, repeats)
+    queue.put(result.to_dict())
+
+
+def execute_benchmark_isolated(case_type, scale=1, repeats=3):
+    """Run :func:`execute_benchmark` in a separate process so that the peak
+    resident set size reported reflects only ``case_type``.
+    """
+    queue = multiprocessing.Queue()
+    worker = multiprocessing.Process(
+        target=_execute_benchmark_in_worker, args=(case_type, scale, repeats, queue))
+    worker.start()
+    result = None
+    while result is None:
+        try:
+            result = queue.get(True, 1)
+        except Empty:
+            if not worker.is_alive():
+                break
+    worker.join()
+    if result is None:
+        return BenchmarkResult(
+            case_type.name, scale, unit=case_type.unit,
+            error="Benchmark process exited with code %r" % (worker.exitcode,))
+    return BenchmarkResult.from_dict(result)
+
+
+class BenchmarkRunner(TaskBase):
+    """Run a collection of :class:`BenchmarkCase` types and summarize the results
+    into a record suitable for :class:`BenchmarkHistory`.
+
+    Attributes
+    ----------
+    cases : list of type
+        The :class:`BenchmarkCase` types to run. Defaults to everything in
+        :data:`benchmark_registry`
+    scale : int
+        The scale to build each case's inputs at
+    repeats : int
+        The number of timed repetitions of each case
+    isolate : bool
+        Whether to run each case in its own process
+    """
+
+    def __init__(self, cases=None, scale=1, repeats=3, isolate=True):
+        if cases is None:
+            cases = list(benchmark_registry.values())
+        self.cases = [benchmark_registry[case] if isinstance(case, six.string_types) else case
+                      for case in cases]
+        self.scale = scale
+        self.repeats = repeats
+        self.isolate = isolate
+        self.results = []
+
+    def run_case(self, case_type):
+        if self.isolate:
+            return execute_benchmark_isolated(case_type, self.scale, self.repeats)
+        return execute_benchmark(case_type, self.scale, self.repeats)
+
+    def run(self):
+        self.results = []
+        n = len(self.cases)
+        for i, case_type in enumerate(self.cases, 1):
+            self.log("Running %s (%d/%d)" % (case_type.name, i, n))
+            result = self.run_case(case_type)
+            if result.failed:
+                self.log("... %s failed:\n%s" % (result.name, result.error))
+            else:
+                self.log("... %0.3f sec, %0.2f %s/sec, %s peak RSS" % (
+                    result.wall_time, result.items_per_second or 0, result.unit,
+                    format_bytes(result.peak_rss)))
+            self.results.append(result)
+        return self.record()
+
+    def record(self):
+        return OrderedDict([
+            ("timestamp", datetime.now().isoformat()),
+            ("version", version),
+            ("python", platform.python_version()),
+            ("platform", platform.platform()),
+            ("scale", self.scale),
+            ("repeats", self.repeats),
+            ("results", [result.to_dict() for result in self.results]),
+        ])
+
+
+def format_bytes(n):
+    if n is None:
+        return "unknown"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024.0:
+            return "%0.1f %s" % (n, unit)
+        n /= 1024.0
+    return "%0.1f TB" % (n,)
+
+
+class BenchmarkHistory(object):
+    """A JSON file accumulating the records produced by :class:`BenchmarkRunner`
+    across runs.
+
+    Attributes
+    ----------
+    path : str
+        The path to the history file
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rt') as fh:
+            return json.load(fh)
+
+    def append(self, record):
+        records = self.load()
+        records.append(record)
+        write_benchmark_record(records, self.path)
+        return records
+
+    def latest(self):
+        records = self.load()
+        if not records:
+            return None
+        return records[-1]
+
+    def __len__(self):
+        return len(self.load())
+
+
+def write_benchmark_record(record, path):
+    with open(path, 'wt') as fh:
+        json.dump(record, fh, indent=2, sort_keys=False)
+
+
+def load_benchmark_record(path):
+    with open(path, 'rt') as fh:
+        return json.load(fh)
+
+
+BenchmarkRegression = namedtuple("BenchmarkRegression", ("name", "metric", "baseline", "observed", "ratio"))
+
+
+def compare_to_baseline(record, baseline, time_tolerance=0.2, memory_tolerance=0.2):
+    """Find cases in ``record`` which are slower or use more memory than they
+    did in ``baseline`` by more than the given relative tolerances.
+
+    Only cases which succeeded in both records at the same scale are compared.
+
+    Parameters
+    ----------
+    record : dict
+        A record produced by :meth:`BenchmarkRunner.record`
+    baseline : dict
+        A previous record to compare against
+    time_tolerance : float
+        The fraction by which the median wall time may grow
+    memory_tolerance : float
+        The fraction by which the peak resident set size may grow
+
+    Returns
+    -------
+    list of :class:`BenchmarkRegression`
+    """
+    reference = {
+        (result['name'], result['scale']): BenchmarkResult.from_dict(result)
+        for result in baseline['results']}
+    regressions = []
+    for result in record['results']:
+        result = BenchmarkResult.from_dict(result)
+        try:
+            previous = reference[result.name, result.scale]
+        except KeyError:
+            continue
+        if result.failed or previous.failed:
+            continue
+        checks = [("wall_time", result.wall_time, previous.wall_time, time_tolerance),
+                  ("peak_rss", result.peak_rss, previous.peak_rss, memory_tolerance)]
+        for metric, observed, expected, tolerance in checks:
+            if not observed or not expected:
+                continue
+            ratio = observed / float(expected)
+            if ratio > 1 + tolerance:
+                regressions.append(BenchmarkRegression(result.name, metric, expected, observed, ratio))
+    return regressions
@@ -0,0 +1,277 @@
+"""Generators for scaled-up inputs built from the bundled test fixtures, so
+that benchmarks can probe how each stage behaves as the data grows without
+needing data files that are not shipped with the package.
+"""
+import copy
+import random
+
+import numpy as np
+
+from glycopeptidepy import PeptideSequence
+from glypy.structure.glycan_composition import HashableGlycanComposition
+
+from ms_deisotope.output import ProcessedMzMLDeserializer
+
+from glycan_profiling.test.fixtures import get_test_data
+
+from glycan_profiling.serialize.hypothesis.glycan import GlycanTypes
+from glycan_profiling.database.builder.glycan.constrained_combinatorics import (
+    CombinatoricCompositionGenerator, parse_rules_from_file)
+from glycan_profiling.structure.structure_loader import PeptideDatabaseRecord
+from glycan_profiling.tandem.glycopeptide.core_search import GlycanCombinationRecord
+from glycan_profiling.tandem.spectrum_match import (
+    MultiScoreSpectrumMatch, MultiScoreSpectrumSolutionSet, ScoreSet)
+from glycan_profiling.chromatogram_tree import Unmodified
+
+
+glycomics_sample = "AGP_Glycomics_20150930_06.deconvoluted.mzML"
+glycoproteomics_sample = "example_glycopeptide_spectra.mzML"
+glycan_rules = "human_n_glycan_rules.txt"
+
+# The peptide whose glycoforms are present in the glycoproteomics test spectra
+anchor_peptide = "YLGNATAIFFLPDEGK"
+
+
+def load_sample(name):
+    return ProcessedMzMLDeserializer(get_test_data(name))
+
+
+def load_msn_scans(name=glycoproteomics_sample, copies=1):
+    """Load all of the scans from a processed glycoproteomics sample, repeated
+    ``copies`` times.
+
+    Returns
+    -------
+    list
+    """
+    scans = list(load_sample(name))
+    return scans * copies
+
+
+def glycan_combinations_from_rules(path=None):
+    """Enumerate the N-glycan compositions described by a combinatorial rules
+    file as :class:`~.GlycanCombinationRecord` objects holding a single glycan.
+
+    Parameters
+    ----------
+    path : str, optional
+        The rules file to read. Defaults to the bundled human N-glycan rules.
+
+    Returns
+    -------
+    list of :class:`~.GlycanCombinationRecord`
+    """
+    if path is None:
+        path = get_test_data(glycan_rules)
+    rules_table, constraints = parse_rules_from_file(path)
+    generator = CombinatoricCompositionGenerator(rules_table=rules_table, constraints=constraints)
+    records = []
+    for composition, structure_classes in generator:
+        if GlycanTypes.n_glycan not in structure_classes:
+            continue
+        composition = HashableGlycanComposition(composition)
+        records.append(GlycanCombinationRecord(
+            len(records) + 1, composition.mass() - composition.composition_offset.mass,
+            composition, 1, [GlycanTypes.n_glycan]))
+    return records
+
+
+def synthetic_peptides(count, seed=1, include=(anchor_peptide,)):
+    """Generate a reproducible set of tryptic peptides which each carry at least one
+    N-glycosylation sequon.
+
+    Parameters
+    ----------
+    count : int
+        The number of random peptides to generate
+    seed : int
+        The seed for the random number generator
+    include : Iterable of str
+        Sequences to place at the start of the set, such as those actually present
+        in the sample being searched
+
+    Returns
+    -------
+    list of :class:`~.PeptideDatabaseRecord`
+    """
+    rng = random.Random(seed)
+    sequences = list(include)
+    for _ in range(count):
+        size = rng.randint(6, 20)
+        residues = [rng.choice("ADEFGHILMPQSTVWY") for _ in range(size)]
+        site = rng.randint(0, size - 3)
+        residues[site:site + 3] = ["N", rng.choice("ADEFGHILQV"), rng.choice("ST")]
+        sequences.append("".join(residues) + rng.choice("KR"))
+    records = []
+    offset = 0
+    for i, sequence in enumerate(sequences, 1):
+        n_glycosylation_sites = [
+            j for j in range(len(sequence) - 2)
+            if sequence[j] == 'N' and sequence[j + 1] != 'P' and sequence[j + 2] in 'ST']
+        records.append(PeptideDatabaseRecord(
+            i, PeptideSequence(sequence).mass, sequence, 1, offset, offset + len(sequence), 1,
+            n_glycosylation_sites, [], []))
+        offset += len(sequence)
+    return records
+
+
+class ScoredItem(object):
+    """A minimal stand-in for a spectrum match as consumed by target-decoy
+    FDR estimation.
+    """
+    __slots__ = ('score', 'q_value')
+
+    def __init__(self, score, q_value=1.0):
+        self.score = score
+        self.q_value = q_value
+
+    def __repr__(self):
+        return "ScoredItem(%0.3f, %0.3f)" % (self.score, self.q_value)
+
+
+def synthetic_target_decoy_scores(count, seed=1, true_fraction=0.3):
+    """Draw target and decoy score series where a fraction of the targets come from
+    a better scoring distribution than the decoys.
+
+    Returns
+    -------
+    targets : list of :class:`ScoredItem`
+    decoys : list of :class:`ScoredItem`
+    """
+    rng = random.Random(seed)
+    targets = []
+    decoys = []
+    for _ in range(count):
+        if rng.random() < true_fraction:
+            targets.append(ScoredItem(round(rng.gauss(25, 6), 3)))
+        else:
+            targets.append(ScoredItem(round(rng.gauss(8, 3), 3)))
+        decoys.append(ScoredItem(round(rng.gauss(8, 3), 3)))
+    return targets, decoys
+
+
+def synthetic_solution_sets(scans, candidates_by_scan, seed=1):
+    """Build :class:`~.MultiScoreSpectrumSolutionSet` objects pairing each scan
+    with its candidate glycopeptides under random scores.
+
+    Parameters
+    ----------
+    scans : list
+        The scans to build solution sets for
+    candidates_by_scan : dict
+        Maps scan id to a list of glycopeptides bearing a :class:`~.glycopeptide_key_t`
+        as their id.
+
+    Returns
+    -------
+    list of :class:`~.MultiScoreSpectrumSolutionSet`
+    """
+    rng = random.Random(seed)
+    solution_sets = []
+    for scan in scans:
+        matches = []
+        for target in candidates_by_scan.get(scan.id, ()):
+            peptide_score = rng.random() * 20
+            glycan_score = rng.random() * 30
+            matches.append(MultiScoreSpectrumMatch(
+                scan, target, ScoreSet(peptide_score + glycan_score, peptide_score, glycan_score, rng.random()),
+                mass_shift=Unmodified))
+        solution_sets.append(MultiScoreSpectrumSolutionSet(scan, matches))
+    return solution_sets
+
+
+class ReplicatedRunPeakSource(object):
+    """Present ``scale`` back-to-back copies of an LC-MS run's MS1 peaks as if they
+    were a single longer run, a drop-in replacement for the peak loader given to
+    :class:`~.ChromatogramExtractor`.
+
+    Each copy after the first has its scan ids suffixed with the replicate number, its
+    scan times shifted past the end of the previous copy, and its peaks cloned, so that
+    the extracted chromatograms, their matches, and their serialized forms all grow in
+    proportion to ``scale``.
+
+    Attributes
+    ----------
+    peak_loader : :class:`~.ProcessedMzMLDeserializer`
+        The source of the original run
+    scale : int
+        The number of copies of the run
+    run_length : float
+        The retention time span that each copy is shifted by
+    """
+
+    def __init__(self, peak_loader, scale=1):
+        self.peak_loader = peak_loader
+        self.scale = scale
+        self.sample_run = peak_loader.sample_run
+        self.extended_index = peak_loader.extended_index
+        self._ms1_ids = list(peak_loader.extended_index.ms1_ids)
+        self._retention_times = {
+            scan_id: peak_loader.convert_scan_id_to_retention_time(scan_id)
+            for scan_id in self._ms1_ids}
+        self.run_length = max(self._retention_times.values()) - min(self._retention_times.values()) + 1.0
+        self._peaks = {}
+
+    def replicate_id(self, scan_id, replicate):
+        if replicate == 0:
+            return scan_id
+        return "%s replicate=%d" % (scan_id, replicate)
+
+    def _split_id(self, scan_id):
+        source_id, sep, replicate = scan_id.rpartition(" replicate=")
+        if not sep:
+            return scan_id, 0
+        return source_id, int(replicate)
+
+    def _load_peaks(self, mass_threshold, intensity_threshold):
+        key = (mass_threshold, intensity_threshold)
+        try:
+            return self._peaks[key]
+        except KeyError:
+            pass
+        source = self.peak_loader.ms1_peaks_above(mass_threshold, intensity_threshold)
+        accumulate = []
+        for replicate in range(self.scale):
+            for scan_id, peak, _ in source:
+                if replicate:
+                    peak = peak.clone()
+                accumulate.append((self.replicate_id(scan_id, replicate), peak, id(peak)))
+        self._peaks[key] = accumulate
+        return accumulate
+
+    def ms1_peaks_above(self, mass_threshold=500, intensity_threshold=1000.):
+        return list(self._load_peaks(mass_threshold, intensity_threshold))
+
+    def convert_scan_id_to_retention_time(self, scan_id):
+        source_id, replicate = self._split_id(scan_id)
+        return self._retention_times[source_id] + replicate * self.run_length
+
+    def ms1_scan_times(self):
+        times = sorted(self._retention_times.values())
+        return np.concatenate([
+            np.array(times) + replicate * self.run_length for replicate in range(self.scale)])
+
+    def extract_total_ion_current_chromatogram(self):
+        current = self.peak_loader.extract_total_ion_current_chromatogram()
+        return np.concatenate([current] * self.scale)
+
+    def _replicate_scan(self, scan, replicate):
+        if replicate == 0:
+            return scan
+        scan = copy.copy(scan)
+        scan.index += replicate * len(self.peak_loader.index)
+        scan.scan_time += replicate * self.run_length
+        scan.id = self.replicate_id(scan.id, replicate)
+        return scan
+
+    def get_scan_by_id(self, scan_id):
+        source_id, replicate = self._split_id(scan_id)
+        return self._replicate_scan(self.peak_loader.get_scan_by_id(source_id), replicate)
+
+    def get_scan_header_by_id(self, scan_id):
+        source_id, replicate = self._split_id(scan_id)
+        return self._replicate_scan(self.peak_loader.get_scan_header_by_id(source_id), replicate)
+
+    def get_index_information_by_scan_id(self, scan_id):
+        source_id, _ = self._split_id(scan_id)
+        return self.peak_loader.get_index_information_by_scan_id(source_id)
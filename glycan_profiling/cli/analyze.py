@@ -144,6 +144,9 @@ def sample_path_arg(fn):
 @click.option("--isotope-probing-range", type=int, default=3, help=(
     "The maximum number of isotopic peak errors to allow when searching for untrusted precursor masses"))
 @click.option("-R", "--rare-signatures", is_flag=True, default=False, help="Look for rare signature ions when scoring glycan oxonium signature")
+@click.option("--oxonium-triage-threshold", default=None, type=float, help=(
+    "Drop MS/MS scans whose HexNAc-derived oxonium ion abundance ratio is below this value before "
+    "mapping any scans to structures, reading the ratios from the sample's oxonium ion index"))
 def search_glycopeptide(context, database_connection, sample_path, hypothesis_identifier,
                         analysis_name, output_path=None, grouping_error_tolerance=1.5e-5, mass_error_tolerance=1e-5,
                         msn_mass_error_tolerance=2e-5, psm_fdr_threshold=0.05, peak_shape_scoring_model=None,
@@ -151,7 +154,8 @@ def search_glycopeptide(context, database_connection, sample_path, hypothesis_id
                         processes=4, workload_size=500, mass_shifts=None, export=None,
                         use_peptide_mass_filter=False, maximum_mass=float('inf'),
                         decoy_database_connection=None, fdr_correction='auto',
-                        isotope_probing_range=3, permute_decoy_glycan_fragments=False, rare_signatures=False):
+                        isotope_probing_range=3, permute_decoy_glycan_fragments=False, rare_signatures=False,
+                        oxonium_triage_threshold=None):
     """Identify glycopeptide sequences from processed LC-MS/MS data
     """
     if tandem_scoring_model is None:
@@ -211,7 +215,8 @@ def search_glycopeptide(context, database_connection, sample_path, hypothesis_id
             maximum_mass=maximum_mass,
             probing_range_for_missing_precursors=isotope_probing_range,
             permute_decoy_glycans=permute_decoy_glycan_fragments,
-            rare_signatures=rare_signatures)
+            rare_signatures=rare_signatures,
+            oxonium_triage_threshold=oxonium_triage_threshold)
     else:
         analyzer = MzMLComparisonGlycopeptideLCMSMSAnalyzer(
             database_connection._original_connection,
@@ -235,7 +240,8 @@ def search_glycopeptide(context, database_connection, sample_path, hypothesis_id
             use_decoy_correction_threshold=fdr_correction,
             probing_range_for_missing_precursors=isotope_probing_range,
             permute_decoy_glycans=permute_decoy_glycan_fragments,
-            rare_signatures=rare_signatures)
+            rare_signatures=rare_signatures,
+            oxonium_triage_threshold=oxonium_triage_threshold)
     analyzer.display_header()
     result = analyzer.start()
     gps, unassigned, target_decoy_set = result[:3]
@@ -328,6 +334,9 @@ def search_glycopeptide(context, database_connection, sample_path, hypothesis_id
     "The maximum number of isotopic peak errors to allow when searching for untrusted precursor masses"))
 @click.option("-S", "--glycoproteome-smoothing-model", type=click.Path(readable=True), help=(
     "Path to a glycoproteome site-specific glycome model"), default=None)
+@click.option("--oxonium-triage-threshold", default=None, type=float, help=(
+    "Drop MS/MS scans whose HexNAc-derived oxonium ion abundance ratio is below this value before "
+    "mapping any scans to structures, reading the ratios from the sample's oxonium ion index"))
 def search_glycopeptide_multipart(context, database_connection, decoy_database_connection, sample_path,
                                   target_hypothesis_identifier=1, decoy_hypothesis_identifier=1,
                                   analysis_name=None, output_path=None, grouping_error_tolerance=1.5e-5,
@@ -336,7 +345,8 @@ def search_glycopeptide_multipart(context, database_connection, decoy_database_c
                                   memory_database_index=False, save_intermediate_results=None, processes=4,
                                   workload_size=500, mass_shifts=None, export=None, maximum_mass=float('inf'),
                                   isotope_probing_range=3, fdr_estimation_strategy=None,
-                                  glycoproteome_smoothing_model=None, durable_fucose=False, rare_signatures=False):
+                                  glycoproteome_smoothing_model=None, durable_fucose=False, rare_signatures=False,
+                                  oxonium_triage_threshold=None):
     if fdr_estimation_strategy is None:
         fdr_estimation_strategy = GlycopeptideFDREstimationStrategy.multipart_gamma_gaussian_mixture
     else:
@@ -408,7 +418,8 @@ def search_glycopeptide_multipart(context, database_connection, decoy_database_c
         fdr_estimation_strategy=fdr_estimation_strategy,
         glycosylation_site_models_path=glycoproteome_smoothing_model,
         fragile_fucose=not durable_fucose,
-        rare_signatures=rare_signatures)
+        rare_signatures=rare_signatures,
+        oxonium_triage_threshold=oxonium_triage_threshold)
     analyzer.display_header()
     result = analyzer.start()
     gps, unassigned, target_decoy_set = result[:3]
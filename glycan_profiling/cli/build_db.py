@@ -234,10 +234,14 @@ def glycopeptide_hypothesis_common_options(cmd):
 @click.option("--dry-run", default=False, is_flag=True, help="Do not save glycopeptides", cls=HiddenOption)
 @click.option("-F", "--not-full-crossproduct", is_flag=True, help=(
     "Do not produce full crossproduct. For when the search space is too large to enumerate, store, and load."))
+@click.option("--digest-cache", type=click.Path(file_okay=False, writable=True), default=None, help=(
+    "A directory in which to cache protein digests, re-used when building hypotheses from the same"
+    " proteins with the same digestion and modification rules"))
 def glycopeptide_fa(context, fasta_file, database_connection, enzyme, missed_cleavages, occupied_glycosites, name,
                     constant_modification, variable_modification, processes, glycan_source, glycan_source_type,
                     glycan_source_identifier=None, semispecific_digest=False, reverse=False, dry_run=False,
-                    peptide_length_range=(5, 60), not_full_crossproduct=False, max_variable_modifications=4):
+                    peptide_length_range=(5, 60), not_full_crossproduct=False, max_variable_modifications=4,
+                    digest_cache=None):
     '''Constructs a glycopeptide hypothesis from a FASTA file of proteins and a
     collection of glycans.
     '''
@@ -283,7 +287,8 @@ def glycopeptide_fa(context, fasta_file, database_connection, enzyme, missed_cle
         n_processes=processes,
         full_cross_product=not not_full_crossproduct,
         max_variable_modifications=max_variable_modifications,
-        peptide_length_range=peptide_length_range)
+        peptide_length_range=peptide_length_range,
+        digest_cache=digest_cache)
     builder.display_header()
     builder.start()
     return builder.hypothesis_id
@@ -3,7 +3,7 @@ import sys
 
 import click
 
-from glycan_profiling.cli.base import cli
+from glycan_profiling.cli.base import cli, processes_option
 from glycan_profiling.cli.validators import get_by_name_or_id, DatabaseConnectionParam
 
 from glycan_profiling.serialize import (
@@ -27,12 +27,17 @@ from glycan_profiling.output import (
     GlycopeptideLCMSMSAnalysisCSVSerializer,
     GlycopeptideSpectrumMatchAnalysisCSVSerializer,
     MzIdentMLSerializer,
+    StreamingMzIdentMLSerializer,
     GlycanChromatogramReportCreator,
     GlycopeptideDatabaseSearchReportCreator,
     TrainingMGFExporter,
     SpectrumAnnotatorExport)
 
 from glycan_profiling.output.csv_format import csv_stream
+from glycan_profiling.output.columnar import (
+    GlycopeptideSpectrumMatchColumnarExporter,
+    IdentifiedGlycopeptideColumnarExporter,
+    make_chunk_writer)
 
 from glycan_profiling.cli.utils import ctxstream
 
@@ -54,6 +59,49 @@ def analysis_identifier_arg(analysis_type):
     return wrapper
 
 
+def columnar_export_options(fn):
+    options = [
+        click.option("-F", "--format", "columnar_format", type=click.Choice(['csv', 'columnar', 'parquet']),
+                     default=None, help=(
+                         "Stream flat rows directly from the database in this format instead of "
+                         "building each object. 'columnar' writes a directory with one file per column, "
+                         "and 'parquet' requires pyarrow")),
+        click.option("-c", "--column", "columns", multiple=True, help=(
+            "A column to include when streaming rows. May be specified more than once. "
+            "Defaults to all columns")),
+    ]
+    for option in reversed(options):
+        fn = option(fn)
+    return fn
+
+
+def export_columnar(session, exporter_type, analysis_id, output_path, columnar_format, columns):
+    if not columns:
+        columns = None
+    try:
+        exporter = exporter_type(session, analysis_id, columns=columns)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--column")
+    if columnar_format == 'csv':
+        if output_path is None:
+            writer = make_chunk_writer(
+                columnar_format, None, exporter, click.get_binary_stream('stdout'))
+        else:
+            writer = make_chunk_writer(columnar_format, None, exporter, open(output_path, 'wb'))
+    else:
+        if output_path is None:
+            raise click.BadParameter(
+                "An output path is required for %r output" % (columnar_format, ),
+                param_hint="--output-path")
+        try:
+            writer = make_chunk_writer(columnar_format, output_path, exporter)
+        except ImportError as e:
+            raise click.ClickException(str(e))
+    exporter.run(writer)
+    if output_path is not None and columnar_format == 'csv':
+        writer.outstream.close()
+
+
 def hypothesis_identifier_arg(hypothesis_type):
     def wrapper(fn):
         arg = click.argument("hypothesis-identifier", doc_help=(
@@ -199,8 +247,14 @@ def glycan_composition_identification(database_connection, analysis_identifier,
 @click.option("-m", "--mzml-path", type=click.Path(exists=True), default=None, help=(
     "Path to read processed spectra from instead of the path embedded in the analysis metadata"))
 @click.option("-t", "--threshold", type=float, default=0)
+@columnar_export_options
+@processes_option
+@click.option("--figure-cache", type=click.Path(file_okay=False), default=None, help=(
+    "A directory to store rendered report figures in, so that regenerating the report, for "
+    "example with a different threshold, only renders figures not already in it"))
 def glycopeptide_identification(database_connection, analysis_identifier, output_path=None,
-                                report=False, mzml_path=None, threshold=0):
+                                report=False, mzml_path=None, threshold=0, columnar_format=None, columns=None,
+                                processes=4, figure_cache=None):
     '''Write each distinct identified glycopeptide in CSV format
     '''
     database_connection = DatabaseBoundOperation(database_connection)
@@ -211,6 +265,11 @@ def glycopeptide_identification(database_connection, analysis_identifier, output
             str(analysis.name), str(analysis.analysis_type)), fg='red', err=True)
         raise click.Abort()
     analysis_id = analysis.id
+    if (columnar_format or columns) and not report:
+        export_columnar(
+            session, IdentifiedGlycopeptideColumnarExporter, analysis_id, output_path,
+            columnar_format or 'csv', columns)
+        return
     if output_path is None:
         output_stream = ctxstream(click.get_binary_stream('stdout'))
     else:
@@ -227,7 +286,8 @@ def glycopeptide_identification(database_connection, analysis_identifier, output
             GlycopeptideDatabaseSearchReportCreator(
                 database_connection._original_connection, analysis_id,
                 stream=output_stream, threshold=threshold,
-                mzml_path=mzml_path).run()
+                mzml_path=mzml_path, n_processes=processes,
+                cache_directory=figure_cache).run()
     else:
         query = session.query(Protein.id, Protein.name).join(Protein.glycopeptides).join(
             IdentifiedGlycopeptide).filter(
@@ -259,7 +319,9 @@ def glycopeptide_identification(database_connection, analysis_identifier, output
 @database_connection_arg
 @analysis_identifier_arg("glycopeptide")
 @click.option("-o", "--output-path", type=click.Path(), default=None, help='Path to write to instead of stdout')
-def glycopeptide_spectrum_matches(database_connection, analysis_identifier, output_path=None):
+@columnar_export_options
+def glycopeptide_spectrum_matches(database_connection, analysis_identifier, output_path=None,
+                                  columnar_format=None, columns=None):
     '''Write each matched glycopeptide spectrum in CSV format
     '''
     database_connection = DatabaseBoundOperation(database_connection)
@@ -270,6 +332,11 @@ def glycopeptide_spectrum_matches(database_connection, analysis_identifier, outp
             str(analysis.name), str(analysis.analysis_type)), fg='red', err=True)
         raise click.Abort()
     analysis_id = analysis.id
+    if columnar_format or columns:
+        export_columnar(
+            session, GlycopeptideSpectrumMatchColumnarExporter, analysis_id, output_path,
+            columnar_format or 'csv', columns)
+        return
     query = session.query(Protein.id, Protein.name).join(Protein.glycopeptides).join(
         GlycopeptideSpectrumMatch).filter(
             GlycopeptideSpectrumMatch.analysis_id == analysis.id)
@@ -312,8 +379,11 @@ def glycopeptide_spectrum_matches(database_connection, analysis_identifier, outp
               help="Include protein sequences in the output file")
 @click.option("-m", '--mzml-path', type=click.Path(exists=True), default=None,
               help="Alternative path to find the source mzML file")
+@click.option("--streaming/--in-memory", is_flag=True, default=True,
+              help=("Write spectrum identifications as they are read from the database in chunks "
+                    "instead of loading the whole analysis into memory first"))
 def glycopeptide_mzidentml(database_connection, analysis_identifier, output_path=None,
-                           mzml_path=None, embed_protein_sequences=True):
+                           mzml_path=None, embed_protein_sequences=True, streaming=True):
     '''Write identified glycopeptides as mzIdentML file, and associated MSn spectra
     to a paired mzML file if the matched data are available. If an mzML file is written
     it will also contain the extracted ion chromatograms for each glycopeptide with an
@@ -328,6 +398,14 @@ def glycopeptide_mzidentml(database_connection, analysis_identifier, output_path
         raise click.Abort()
     loader = AnalysisDeserializer(
         database_connection._original_connection, analysis_id=analysis.id)
+    if streaming:
+        with open(output_path, 'wb') as outfile:
+            writer = StreamingMzIdentMLSerializer(
+                outfile, analysis, loader,
+                source_mzml_path=mzml_path,
+                embed_protein_sequences=embed_protein_sequences)
+            writer.run()
+        return
     click.echo("Loading Identifications")
     # glycopeptides = loader.load_identified_glycopeptides()
     glycopeptides = loader.query(IdentifiedGlycopeptide).filter(
@@ -400,7 +478,8 @@ def export_identified_glycans_from_glycopeptides(database_connection, analysis_i
 @click.option("-o", "--output-path", type=click.Path(), default=None, help='Path to write to instead of stdout')
 @click.option("-m", '--mzml-path', type=click.Path(exists=True), default=None,
               help="Alternative path to find the source mzML file")
-def annotate_matched_spectra(database_connection, analysis_identifier, output_path, mzml_path=None):
+@processes_option
+def annotate_matched_spectra(database_connection, analysis_identifier, output_path, mzml_path=None, processes=4):
     database_connection = DatabaseBoundOperation(database_connection)
     session = database_connection.session()  # pylint: disable=not-callable
     analysis = get_by_name_or_id(session, Analysis, analysis_identifier)
@@ -413,7 +492,7 @@ def annotate_matched_spectra(database_connection, analysis_identifier, output_pa
 
     task = SpectrumAnnotatorExport(
         database_connection._original_connection, analysis.id, output_path,
-        mzml_path)
+        mzml_path, n_processes=processes)
     task.display_header()
     task.start()
 
@@ -321,10 +321,18 @@ def oxonium_signature(ms_file, g_score_threshold=0.05):
 
     from glycan_profiling.tandem.glycan.scoring.signature_ion_scoring import SignatureIonScorer
     from glycan_profiling.tandem.oxonium_ions import gscore_scanner
+    from glycan_profiling.tandem.oxonium_index import OxoniumIndex
+    oxonium_index = OxoniumIndex.for_file(ms_file)
     refcomp = glypy.GlycanComposition.parse("{Fuc:1; Hex:5; HexNAc:4; Neu5Ac:2}")
     for scan_id in reader.extended_index.msn_ids.keys():
-        scan = reader.get_scan_by_id(scan_id)
-        gscore = gscore_scanner(scan.deconvoluted_peak_set)
+        if oxonium_index is not None and scan_id in oxonium_index:
+            gscore = oxonium_index.oxonium_ratio(scan_id, use_acquisition_window=False)
+            if gscore < g_score_threshold:
+                continue
+            scan = reader.get_scan_by_id(scan_id)
+        else:
+            scan = reader.get_scan_by_id(scan_id)
+            gscore = gscore_scanner(scan.deconvoluted_peak_set)
         if gscore >= g_score_threshold:
             signature_match = SignatureIonScorer.evaluate(scan, refcomp)
             click.echo("%s\t%f\t%r\t%f\t%f" % (
@@ -333,6 +341,24 @@ def oxonium_signature(ms_file, g_score_threshold=0.05):
                 signature_match.score))
 
 
+@mzml_cli.command("oxonium-index", short_help=(
+    'Build the oxonium and signature ion index of a processed mzML file'))
+@click.argument("ms-file", type=click.Path(exists=True, file_okay=True, dir_okay=False))
+@click.option("-e", "--error-tolerance", type=float, default=2e-5,
+              help="The PPM error tolerance to match ions with")
+def oxonium_index(ms_file, error_tolerance=2e-5):
+    from glycan_profiling.tandem.oxonium_index import OxoniumIndexBuilder, OxoniumIndex
+    reader = ProcessedMzMLDeserializer(ms_file)
+    builder = OxoniumIndexBuilder(error_tolerance=error_tolerance)
+    reader.make_iterator(grouped=False)
+    for scan in reader:
+        if scan.ms_level > 1:
+            builder.add(scan)
+    index = builder.build()
+    index.save(OxoniumIndex.index_file_name(ms_file))
+    click.echo("Indexed %d MSn Scans" % (len(index),))
+
+
 @mzml_cli.command("peak-picking", short_help=(
     "Convert raw mass spectra data into centroid peak lists written to mzML."
     " Can accept mzML or mzXML with either profile or centroided scans."))
@@ -567,3 +567,57 @@ def csv_concat(csv_paths, output_path=None):
                 writer.writerow(row)
             infh.close()
             outfh.flush()
+
+
+@tools.command("benchmark", short_help="Time the core search stages against the bundled test data")
+@click.option("-c", "--case", "cases", multiple=True,
+              help="Run only the named benchmark case. May be specified multiple times. Runs all cases by default")
+@click.option("-s", "--scale", type=int, default=1, help="Multiply the size of the synthetic inputs by this factor")
+@click.option("-r", "--repeats", type=int, default=3, help="The number of timed repetitions of each case")
+@click.option("-H", "--history", "history_path", type=click.Path(dir_okay=False, writable=True),
+              help="Append the results to this JSON history file")
+@click.option("-b", "--baseline", "baseline_path", type=click.Path(dir_okay=False),
+              help="Compare the results against this JSON baseline file")
+@click.option("--save-baseline", is_flag=True, help="Write the results to the baseline file instead of comparing")
+@click.option("-t", "--tolerance", type=float, default=0.2,
+              help="The fraction by which wall time or peak memory may grow before it is a regression")
+@click.option("--in-process", is_flag=True, help=(
+    "Run every case in this process rather than one process per case. Peak memory is then cumulative"))
+def benchmark(cases, scale=1, repeats=3, history_path=None, baseline_path=None, save_baseline=False,
+              tolerance=0.2, in_process=False):
+    from glycan_profiling.benchmark import (
+        BenchmarkRunner, BenchmarkHistory, benchmark_registry, compare_to_baseline,
+        load_benchmark_record, write_benchmark_record, format_bytes)
+    for case in cases:
+        if case not in benchmark_registry:
+            raise click.BadParameter("Unknown benchmark %r, choose from %s" % (
+                case, ', '.join(benchmark_registry)), param_hint="--case")
+    if save_baseline and baseline_path is None:
+        raise click.BadParameter("A baseline path is required to save a baseline", param_hint="--baseline")
+    runner = BenchmarkRunner(cases or None, scale=scale, repeats=repeats, isolate=not in_process)
+    record = runner.run()
+    click.secho("%-32s %12s %16s %12s" % ("Benchmark", "Wall Time", "Throughput", "Peak RSS"), fg='yellow')
+    for result in runner.results:
+        if result.failed:
+            click.secho("%-32s %12s" % (result.name, "failed"), fg='red')
+            continue
+        click.echo("%-32s %11.3fs %16s %12s" % (
+            result.name, result.wall_time, "%0.1f %s/s" % (result.items_per_second, result.unit),
+            format_bytes(result.peak_rss)))
+    if history_path is not None:
+        BenchmarkHistory(history_path).append(record)
+    if baseline_path is None:
+        return
+    if save_baseline:
+        write_benchmark_record(record, baseline_path)
+        click.secho("Baseline written to %s" % (baseline_path,), fg='yellow')
+        return
+    regressions = compare_to_baseline(
+        record, load_benchmark_record(baseline_path), tolerance, tolerance)
+    for regression in regressions:
+        click.secho("%s %s regressed from %0.4g to %0.4g (%0.2fx)" % (
+            regression.name, regression.metric, regression.baseline, regression.observed,
+            regression.ratio), fg='red')
+    if regressions:
+        raise click.ClickException("%d benchmark regression(s) against %s" % (
+            len(regressions), baseline_path))
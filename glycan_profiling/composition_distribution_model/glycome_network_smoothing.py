@@ -86,12 +86,17 @@ class GlycomeModel(LaplacianSmoothingModel):
         from :attr:`observed_compositions`.
     inverse_variance_matrix: :class:`np.ndarray[float, ndim=2]`
         The inverse of :attr:`variance_matrix`, computed separately for efficiency.
+    laplacian_matrix: :class:`np.ndarray[float, ndim=2]`
+        The unregularized weighted Laplacian of :attr:`_network`, if one was provided. This is
+        re-used each time :attr:`block_L` is rebuilt instead of re-computing it from the edges.
     """
     def __init__(self, observed_compositions, network, belongingness_matrix=None,
                  regularize=DEFAULT_LAPLACIAN_REGULARIZATION,
                  belongingness_normalization=NORMALIZATION,
-                 observation_aggregator=VariableObservationAggregation):
+                 observation_aggregator=VariableObservationAggregation,
+                 laplacian_matrix=None):
         self.observation_aggregator = observation_aggregator
+        self.laplacian_matrix = laplacian_matrix
         observed_compositions = [
             o for o in observed_compositions if _has_glycan_composition(o) and o.score > 0]
         self._observed_compositions = observed_compositions
@@ -100,7 +105,8 @@ class GlycomeModel(LaplacianSmoothingModel):
             self._network.add_node(CompositionGraphNode(GlycanComposition(), -1), reindex=True)
             self._configure_with_network(self._network)
 
-        self.block_L = BlockLaplacian(self.network, regularize=regularize)
+        self.block_L = BlockLaplacian(
+            self.network, regularize=regularize, laplacian=self.laplacian_matrix)
         self.threshold = self.block_L.threshold
 
         # Initialize Names
@@ -137,7 +143,7 @@ class GlycomeModel(LaplacianSmoothingModel):
         return self.__class__, (
             self._observed_compositions, self._network, self.belongingness_matrix,
             self.block_L.regularize, self._belongingness_normalization,
-            self.observation_aggregator)
+            self.observation_aggregator, self.laplacian_matrix)
 
     def _populate(self, observations):
         var_agg = self.observation_aggregator(self._network)
@@ -160,7 +166,9 @@ class GlycomeModel(LaplacianSmoothingModel):
         if len(accepted) == 0:
             raise ValueError("Threshold %f produces an empty observed set" % (threshold,))
         self._populate(accepted)
-        self.block_L = BlockLaplacian(self.network, threshold=threshold, regularize=self.block_L.regularize)
+        self.block_L = BlockLaplacian(
+            self.network, threshold=threshold, regularize=self.block_L.regularize,
+            laplacian=self.laplacian_matrix)
         self.threshold = self.block_L.threshold
 
     def reset(self):
@@ -391,7 +399,8 @@ def smooth_network(network, observed_compositions, threshold_step=0.5, apex_thre
                    belongingness_matrix=None, rho=DEFAULT_RHO, lambda_max=1,
                    include_missing=False, lmbda=None, model_state=None,
                    observation_aggregator=VariableObservationAggregation,
-                   belongingness_normalization=NORMALIZATION, annotate_network=True):
+                   belongingness_normalization=NORMALIZATION, annotate_network=True,
+                   laplacian_matrix=None):
     convert = GlycanCompositionSolutionRecord.from_chromatogram
     observed_compositions = [
         convert(o) for o in observed_compositions if _has_glycan_composition(o)]
@@ -399,7 +408,8 @@ def smooth_network(network, observed_compositions, threshold_step=0.5, apex_thre
         observed_compositions, network,
         belongingness_matrix=belongingness_matrix,
         observation_aggregator=observation_aggregator,
-        belongingness_normalization=belongingness_normalization)
+        belongingness_normalization=belongingness_normalization,
+        laplacian_matrix=laplacian_matrix)
     log_handle.log("... Begin Model Fitting")
     if model_state is None:
         reduction = model.find_threshold_and_lambda(
@@ -104,14 +104,19 @@ def scale_network(network, maximum):
 
 
 class BlockLaplacian(object):
-    def __init__(self, network=None, threshold=0.0001, regularize=1.0):
+    def __init__(self, network=None, threshold=0.0001, regularize=1.0, laplacian=None):
         self.regularize = regularize
         self.threshold = threshold
         if network is not None:
-            self._build_from_network(network)
+            self._build_from_network(network, laplacian)
 
-    def _build_from_network(self, network):
-        structure_matrix = weighted_laplacian_matrix(network)
+    def _build_from_network(self, network, laplacian=None):
+        # A precomputed weighted Laplacian may be re-used so long as the network's topology
+        # has not changed since it was computed.
+        if laplacian is not None and laplacian.shape[0] == len(network):
+            structure_matrix = laplacian
+        else:
+            structure_matrix = weighted_laplacian_matrix(network)
         structure_matrix = structure_matrix + (np.eye(
             structure_matrix.shape[0]) * self.regularize)
         observed_indices, missing_indices = network_indices(network, self.threshold)
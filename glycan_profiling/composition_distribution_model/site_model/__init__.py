@@ -1,4 +1,5 @@
-from .glycosite_model import GlycanPriorRecord, GlycosylationSiteModel, glycan_composition_cache
+from .glycosite_model import (
+    GlycanPriorRecord, GlycosylationSiteModel, GlycosylationSiteModelStreamWriter, glycan_composition_cache)
 from .glycoprotein_model import GlycoproteinSiteSpecificGlycomeModel, ReversedProteinSiteReflectionGlycoproteinSiteSpecificGlycomeModel
 from .glycoproteome_model import GlycoproteomeModel, SubstringGlycoproteomeModel, GlycoproteomePriorAnnotator
 from .builder import GlycosylationSiteModelBuilder, GlycoproteinSiteModelBuildingWorkflow
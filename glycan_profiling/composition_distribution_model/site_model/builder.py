@@ -1,5 +1,7 @@
+import os
 import time
 import json
+import tempfile
 
 from collections import defaultdict, deque, namedtuple
 
@@ -13,6 +15,11 @@ try:
 except ImportError:
     from queue import Empty as QueueEmptyException
 
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
 from threading import RLock, Condition, Thread
 
 import numpy as np
@@ -25,13 +32,14 @@ from glycan_profiling.database import (
 
 
 from glycan_profiling.database.composition_network import NeighborhoodWalker, make_n_glycan_neighborhoods
+from glycan_profiling.database.composition_network import dump as dump_network, load as load_network
 from glycan_profiling.composition_distribution_model import (
     smooth_network, display_table, VariableObservationAggregation,
-    GlycanCompositionSolutionRecord, GlycomeModel)
+    GlycanCompositionSolutionRecord, GlycomeModel, weighted_laplacian_matrix)
 from glycan_profiling.models import GeneralScorer, get_feature
 
 
-from .glycosite_model import GlycanPriorRecord, GlycosylationSiteModel
+from .glycosite_model import GlycanPriorRecord, GlycosylationSiteModel, GlycosylationSiteModelStreamWriter
 from .glycoprotein_model import ProteinStub
 
 _default_chromatogram_scorer = GeneralScorer.clone()
@@ -47,6 +55,10 @@ def _truncate_name(name, limit=30):
 
 EmptySite = namedtuple("EmptySite", ("position", "protein_name"))
 
+# A compact, array-based form of a list of :class:`GlycanCompositionSolutionRecord` for a single
+# site where each glycan composition is replaced by its node index in the glycan network.
+SiteObservations = namedtuple("SiteObservations", ("node_indices", "scores", "total_signals"))
+
 
 class GlycosylationSiteModelBuilder(TaskBase):
     _timeout_per_unit = 300
@@ -54,7 +66,7 @@ class GlycosylationSiteModelBuilder(TaskBase):
     def __init__(self, glycan_graph, chromatogram_scorer=None, belongingness_matrix=None,
                  unobserved_penalty_scale=None, lambda_limit=0.2,
                  require_multiple_observations=True,
-                 observation_aggregator=None, n_threads=1):
+                 observation_aggregator=None, n_threads=1, laplacian_matrix=None):
         if observation_aggregator is None:
             observation_aggregator = VariableObservationAggregation
         if chromatogram_scorer is None:
@@ -76,6 +88,12 @@ class GlycosylationSiteModelBuilder(TaskBase):
         if self.belongingness_matrix is None:
             self.belongingness_matrix = self.build_belongingness_matrix()
 
+        # The weighted Laplacian depends only upon the network topology, so it can be computed once
+        # and shared by every site model fit.
+        if laplacian_matrix is None:
+            laplacian_matrix = weighted_laplacian_matrix(self.network)
+        self.laplacian_matrix = laplacian_matrix
+
         self.site_models = []
         self.n_threads = n_threads
         self._lock = RLock()
@@ -92,6 +110,101 @@ class GlycosylationSiteModelBuilder(TaskBase):
         belongingness_matrix = neighborhood_walker.build_belongingness_matrix()
         return belongingness_matrix
 
+    def save_shared_state(self, file_obj):
+        """Write the glycan network, the belongingness matrix and the weighted Laplacian
+        to `file_obj` so that they may be loaded once by each worker process instead
+        of being copied with every work item.
+
+        Parameters
+        ----------
+        file_obj : file-like or str
+            The file to write to.
+
+        See Also
+        --------
+        :meth:`from_shared_state`
+        """
+        network_buffer = StringIO()
+        dump_network(self.network, network_buffer)
+        np.savez(
+            file_obj,
+            network=np.array(network_buffer.getvalue()),
+            belongingness_matrix=self.belongingness_matrix,
+            laplacian_matrix=self.laplacian_matrix)
+
+    @classmethod
+    def from_shared_state(cls, file_obj, **kwargs):
+        """Create a new builder from the state written by :meth:`save_shared_state`.
+
+        Parameters
+        ----------
+        file_obj : file-like or str
+            The file to read from.
+        **kwargs
+            Forwarded to the constructor.
+
+        Returns
+        -------
+        :class:`GlycosylationSiteModelBuilder`
+        """
+        with np.load(file_obj) as state:
+            network, _neighborhoods = load_network(StringIO(str(state['network'][()])))
+            belongingness_matrix = state['belongingness_matrix']
+            laplacian_matrix = state['laplacian_matrix']
+        return cls(
+            network, belongingness_matrix=belongingness_matrix,
+            laplacian_matrix=laplacian_matrix, **kwargs)
+
+    def pack_observations(self, records):
+        """Convert a list of :class:`GlycanCompositionSolutionRecord` into a :class:`SiteObservations`
+        keyed by network node index.
+
+        Records whose glycan composition is not in :attr:`network` cannot contribute to the
+        model and are omitted.
+
+        Parameters
+        ----------
+        records : list of :class:`GlycanCompositionSolutionRecord`
+
+        Returns
+        -------
+        :class:`SiteObservations`
+        """
+        node_indices = []
+        scores = []
+        total_signals = []
+        for rec in records:
+            try:
+                node = self.network[rec.glycan_composition]
+            except (KeyError, IndexError):
+                continue
+            node_indices.append(node.index)
+            scores.append(rec.score)
+            total_signals.append(rec.total_signal)
+        return SiteObservations(
+            np.array(node_indices, dtype=np.int64),
+            np.array(scores, dtype=np.float64),
+            np.array(total_signals, dtype=np.float64))
+
+    def unpack_observations(self, observations):
+        """The inverse of :meth:`pack_observations`.
+
+        Parameters
+        ----------
+        observations : :class:`SiteObservations`
+
+        Returns
+        -------
+        list of :class:`GlycanCompositionSolutionRecord`
+        """
+        nodes = self.network.nodes
+        return [
+            GlycanCompositionSolutionRecord(nodes[i].glycan_composition, score, total_signal)
+            for i, score, total_signal in zip(
+                observations.node_indices.tolist(), observations.scores.tolist(),
+                observations.total_signals.tolist())
+        ]
+
     def _transform_glycopeptide(self, glycopeptide, evaluate_chromatograms=False):
         gp = glycopeptide
         if evaluate_chromatograms:
@@ -224,7 +337,8 @@ class GlycosylationSiteModelBuilder(TaskBase):
             self.network, learnable_cases,
             belongingness_matrix=self.belongingness_matrix,
             observation_aggregator=VariableObservationAggregation,
-            annotate_network=False)
+            annotate_network=False,
+            laplacian_matrix=self.laplacian_matrix)
         if params is None:
             self.log("Skipping Site %d of %s" %
                      (site, _truncate_name(glycoprotein.name)))
@@ -266,12 +380,21 @@ class GlycosylationSiteModelBuilder(TaskBase):
 
 
 class GlycositeModelBuildingProcess(Process):
+    """A worker process which fits :class:`GlycosylationSiteModel` instances for
+    each site it receives.
+
+    The glycan network, belongingness matrix and Laplacian are loaded once from
+    :attr:`shared_state_path` when the process starts, so work items only carry
+    the :class:`SiteObservations` for a single site.
+    """
     process_name = "glycosylation-site-modeler"
 
-    def __init__(self, builder, input_queue, output_queue, producer_done_event, output_done_event, log_handler):
+    def __init__(self, shared_state_path, builder_options, input_queue, output_queue, producer_done_event,
+                 output_done_event, log_handler):
         Process.__init__(self)
-        self.builder = builder
-        builder.log = self.log
+        self.shared_state_path = shared_state_path
+        self.builder_options = builder_options
+        self.builder = None
         self.input_queue = input_queue
         self.output_queue = output_queue
         self.producer_done_event = producer_done_event
@@ -310,7 +433,13 @@ class GlycositeModelBuildingProcess(Process):
         if self.verbose:
             self.log_handler("DEBUG::%s" % message)
 
+    def load_builder(self):
+        self.builder = GlycosylationSiteModelBuilder.from_shared_state(
+            self.shared_state_path, **self.builder_options)
+        self.builder.log = self.log
+
     def handle_item(self, observations, site, glycoprotein):
+        observations = self.builder.unpack_observations(observations)
         model = self.builder.fit_site_model(observations, site, glycoprotein)
         if model is None:
             model = EmptySite(site, glycoprotein.name)
@@ -364,6 +493,7 @@ class GlycositeModelBuildingProcess(Process):
         TaskBase.log_to_stdout()
         self.output_done_event.clear()
         try:
+            self.load_builder()
             self.task()
         except Exception:
             import traceback
@@ -478,16 +608,23 @@ class GlycoproteinSiteModelBuildingWorkflowBase(TaskBase):
     def _fit_glycoprotein_site_models(self, glycoproteins, builder):
         raise NotImplementedError()
 
-    def _init_builder(self, network, belongingness_matrix):
-        builder = GlycosylationSiteModelBuilder(
-            network, belongingness_matrix=belongingness_matrix,
+    def _builder_options(self):
+        return dict(
             unobserved_penalty_scale=self.unobserved_penalty_scale,
             lambda_limit=self.lambda_limit,
             require_multiple_observations=self.require_multiple_observations,
-            observation_aggregator=self.observation_aggregator,
-            n_threads=self.n_threads)
+            observation_aggregator=self.observation_aggregator)
+
+    def _init_builder(self, network, belongingness_matrix):
+        builder = GlycosylationSiteModelBuilder(
+            network, belongingness_matrix=belongingness_matrix,
+            n_threads=self.n_threads, **self._builder_options())
         return builder
 
+    def _save_models(self, builder):
+        if self.output_path is not None:
+            builder.save_models(self.output_path)
+
     def run(self):
         self.log("Building Belongingness Matrix")
         network, belongingness_matrix = self.make_glycan_network()
@@ -504,8 +641,7 @@ class GlycoproteinSiteModelBuildingWorkflowBase(TaskBase):
         self._fit_glycoprotein_site_models(glycoproteins, builder)
 
         self.log("Saving Models")
-        if self.output_path is not None:
-            builder.save_models(self.output_path)
+        self._save_models(builder)
 
 
 class ThreadedGlycoproteinSiteModelBuildingWorkflow(GlycoproteinSiteModelBuildingWorkflowBase):
@@ -628,10 +764,36 @@ class MultiprocessingGlycoproteinSiteModelBuildingWorkflow(GlycoproteinSiteModel
         self.workers = []
         self._has_remote_error = False
         self.ipc_manager = self.ipc_logger()
+        self.shared_state_path = None
+        self.model_writer = None
 
     def prepare_glycoprotein_for_dispatch(self, glycoprotein, builder):
         prepared = builder.prepare_glycoprotein(glycoprotein)
-        return prepared
+        return [
+            (builder.pack_observations(records), site, protein_stub)
+            for records, site, protein_stub in prepared
+        ]
+
+    def write_shared_state(self, builder):
+        fd, self.shared_state_path = tempfile.mkstemp(suffix='.npz', prefix='site-model-state-')
+        with os.fdopen(fd, 'wb') as fh:
+            builder.save_shared_state(fh)
+
+    def remove_shared_state(self):
+        if self.shared_state_path is not None and os.path.exists(self.shared_state_path):
+            os.remove(self.shared_state_path)
+        self.shared_state_path = None
+
+    def _emit_site_model(self, site_model):
+        if self.model_writer is not None:
+            self.model_writer.write(site_model)
+        else:
+            self.builder.site_models.append(site_model)
+
+    def _save_models(self, builder):
+        if self.model_writer is not None:
+            self.log("... Wrote %d Site Models" % (self.model_writer.count, ))
+            self.model_writer.close()
 
     def feed_queue(self, glycoproteins, builder):
         n = len(glycoproteins)
@@ -652,20 +814,22 @@ class MultiprocessingGlycoproteinSiteModelBuildingWorkflow(GlycoproteinSiteModel
         for glycoprotein in glycoproteins:
             prepared = self.prepare_glycoprotein_for_dispatch(
                 glycoprotein, builder)
-            for records, site, protein_stub in prepared:
+            for observations, site, protein_stub in prepared:
                 key = (protein_stub.name, site)
                 if key in seen:
                     continue
                 else:
                     seen[key] = -1
+                    records = builder.unpack_observations(observations)
                     model = builder.fit_site_model(records, site, protein_stub)
                     if model is not None:
-                        self.builder.site_models.append(model)
+                        self._emit_site_model(model)
 
     def make_workers(self):
         for _i in range(self.n_workers):
             worker = GlycositeModelBuildingProcess(
-                self.builder, self.input_queue, self.output_queue,
+                self.shared_state_path, self._builder_options(),
+                self.input_queue, self.output_queue,
                 producer_done_event=self.input_done_event,
                 output_done_event=Event(),
                 log_handler=self.ipc_manager.sender())
@@ -704,6 +868,10 @@ class MultiprocessingGlycoproteinSiteModelBuildingWorkflow(GlycoproteinSiteModel
 
     def _fit_glycoprotein_site_models(self, glycoproteins, builder):
         self.builder = builder
+        # Fitted models are written out as they arrive rather than accumulated in memory.
+        if self.output_path is not None:
+            self.model_writer = GlycosylationSiteModelStreamWriter(self.output_path)
+        self.write_shared_state(builder)
         feeder_thread = Thread(target=self.feed_queue, args=(glycoproteins, builder))
         feeder_thread.daemon = True
         feeder_thread.start()
@@ -732,7 +900,7 @@ class MultiprocessingGlycoproteinSiteModelBuildingWorkflow(GlycoproteinSiteModel
                     self.log(
                         "...... Processed %d sites (%0.2f%%)" % (i, i * 100. / n_sites))
                 if not isinstance(site_model, EmptySite):
-                    self.builder.site_models.append(site_model)
+                    self._emit_site_model(site_model)
             except QueueEmptyException:
                 if len(seen) == n_sites:
                     has_work = False
@@ -775,6 +943,7 @@ class MultiprocessingGlycoproteinSiteModelBuildingWorkflow(GlycoproteinSiteModel
         self.clear_pool()
         self.ipc_manager.stop()
         feeder_thread.join()
+        self.remove_shared_state()
         dispatcher_end = time.time()
         self.log("... Dispatcher Finished (%0.3g sec.)" %
                  (dispatcher_end - start_time))
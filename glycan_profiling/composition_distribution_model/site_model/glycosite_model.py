@@ -146,3 +146,45 @@ class GlycosylationSiteModel(object):
     def dump(cls, instances, fh):
         site_dicts = [d.to_dict() for d in instances]
         json.dump(site_dicts, fh)
+
+
+class GlycosylationSiteModelStreamWriter(object):
+    """Incrementally writes :class:`GlycosylationSiteModel` instances to a JSON file
+    as they are produced, in the same format as :meth:`GlycosylationSiteModel.dump`,
+    without holding them all in memory.
+
+    Attributes
+    ----------
+    handle : file-like
+        The file being written to
+    count : int
+        The number of site models written so far
+    """
+
+    def __init__(self, handle):
+        if not hasattr(handle, 'write'):
+            handle = open(handle, 'wt')
+        self.handle = handle
+        self.count = 0
+        self.handle.write("[")
+
+    def write(self, site_model):
+        if self.count:
+            self.handle.write(",\n")
+        json.dump(site_model.to_dict(), self.handle)
+        self.count += 1
+
+    def flush(self):
+        self.handle.flush()
+
+    def close(self):
+        if self.handle.closed:
+            return
+        self.handle.write("]")
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -3,4 +3,5 @@ from .mass_collection import (
 
 from .disk_backed_database import (
     GlycopeptideDiskBackedStructureDatabase,
+    ImplicitGlycopeptideDiskBackedStructureDatabase,
     GlycanCompositionDiskBackedStructureDatabase)
@@ -1,11 +1,13 @@
 from .analysis_migration import (
     GlycanCompositionChromatogramAnalysisSerializer,
     GlycopeptideMSMSAnalysisSerializer,
-    DynamicGlycopeptideMSMSAnalysisSerializer)
+    DynamicGlycopeptideMSMSAnalysisSerializer,
+    ImplicitGlycopeptideMSMSAnalysisSerializer)
 
 
 __all__ = [
     "GlycopeptideMSMSAnalysisSerializer",
     "DynamicGlycopeptideMSMSAnalysisSerializer",
+    "ImplicitGlycopeptideMSMSAnalysisSerializer",
     "GlycanCompositionChromatogramAnalysisSerializer"
 ]
@@ -651,3 +651,25 @@ class DynamicGlycopeptideMSMSAnalysisSerializer(GlycopeptideMSMSAnalysisSerializ
         self._glycopeptide_hypothesis_migrator.migrate_glycopeptide(inst)
         self._glycopeptide_hypothesis_migrator.commit()
         return self._glycopeptide_hypothesis_migrator.glycopeptide_id_map[glycopeptide.id]
+
+
+class ImplicitGlycopeptideMSMSAnalysisSerializer(GlycopeptideMSMSAnalysisSerializer):
+    """A :class:`GlycopeptideMSMSAnalysisSerializer` for searches against an
+    :class:`~.ImplicitGlycopeptideDiskBackedStructureDatabase`, whose glycopeptides do
+    not have rows of their own and must be materialized before they can be copied.
+    """
+
+    def _get_glycan_combination_for_glycopeptide(self, glycopeptide_id):
+        return self.glycopeptide_db.split_id(glycopeptide_id)[1]
+
+    def _get_peptide_id_for_glycopeptide(self, glycopeptide_id):
+        return self.glycopeptide_db.get_glycopeptide_components(glycopeptide_id)[0]
+
+    def fetch_glycopeptides(self, glycopeptide_ids):
+        return [self.glycopeptide_db.materialize_glycopeptide(i) for i in glycopeptide_ids]
+
+    def _migrate_single_glycopeptide(self, glycopeptide):
+        inst = self.glycopeptide_db.materialize_glycopeptide(glycopeptide.id)
+        self._glycopeptide_hypothesis_migrator.migrate_glycopeptide(inst)
+        self._glycopeptide_hypothesis_migrator.commit()
+        return self._glycopeptide_hypothesis_migrator.glycopeptide_id_map[glycopeptide.id]
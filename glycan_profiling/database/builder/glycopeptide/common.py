@@ -16,10 +16,12 @@ from glypy.structure.glycan_composition import FrozenGlycanComposition
 
 from glycan_profiling.serialize import DatabaseBoundOperation, func
 from glycan_profiling.serialize.hypothesis import GlycopeptideHypothesis
-from glycan_profiling.serialize.hypothesis.peptide import Glycopeptide, Peptide, Protein
+from glycan_profiling.serialize.hypothesis.peptide import (
+    Glycopeptide, Peptide, Protein, GlycopeptideSiteCombination)
 from glycan_profiling.serialize.hypothesis.glycan import (
     GlycanCombination, GlycanClass, GlycanComposition,
-    GlycanTypes, GlycanCombinationGlycanComposition)
+    GlycanTypes, GlycanCombinationGlycanComposition,
+    GlycanCombinationPartition)
 from glycan_profiling.serialize.utils import toggle_indices
 from glycan_profiling.task import TaskBase
 
@@ -109,6 +111,28 @@ class GlycopeptideHypothesisSerializerBase(DatabaseBoundOperation, HypothesisSer
         })
         return count
 
+    def build_implicit_cross_product(self):
+        """Describe the glycopeptides of this hypothesis with :class:`~.GlycopeptideSiteCombination`
+        and :class:`~.GlycanCombinationPartition` rows instead of creating a :class:`~.Glycopeptide`
+        for each one.
+
+        The hypothesis is marked with the ``implicit_cross_product`` parameter so that
+        it will be searched with a :class:`~.ImplicitGlycopeptideDiskBackedStructureDatabase`.
+
+        Returns
+        -------
+        int
+            The number of glycopeptides the hypothesis implies
+        """
+        builder = ImplicitCrossProductBuilder(self.session, self.hypothesis_id)
+        count = builder.run()
+        self.log("Generated %d implicit glycopeptides" % count)
+        self.set_parameters({
+            "database_size": count,
+            "implicit_cross_product": True,
+        })
+        return count
+
     def _sql_analyze_database(self):
         self.log("Analyzing Indices")
         self._analyze_database()
@@ -129,6 +153,16 @@ class GlycopeptideHypothesisDestroyer(DatabaseBoundOperation, TaskBase):
             synchronize_session=False)
         self.session.commit()
 
+    def delete_implicit_cross_product(self):
+        self.log("Delete Implicit Cross Product")
+        self.session.query(GlycopeptideSiteCombination).filter(
+            GlycopeptideSiteCombination.hypothesis_id == self.hypothesis_id).delete(
+            synchronize_session=False)
+        self.session.query(GlycanCombinationPartition).filter(
+            GlycanCombinationPartition.hypothesis_id == self.hypothesis_id).delete(
+            synchronize_session=False)
+        self.session.commit()
+
     def delete_peptides(self):
         self.log("Delete Peptides")
         q = self.session.query(Protein.id).filter(Protein.hypothesis_id == self.hypothesis_id)
@@ -152,6 +186,7 @@ class GlycopeptideHypothesisDestroyer(DatabaseBoundOperation, TaskBase):
 
     def run(self):
         self.delete_glycopeptides()
+        self.delete_implicit_cross_product()
         self.delete_peptides()
         self.delete_protein()
         self.delete_hypothesis()
@@ -235,6 +270,168 @@ def limiting_combinations(iterable, n, limit=100):
             break
 
 
+def unoccupied_sites(sequence, sites):
+    """Select those positions in `sites` which do not already carry a
+    modification in `sequence`.
+
+    Parameters
+    ----------
+    sequence : :class:`~.PeptideSequence`
+    sites : :class:`Iterable` of int
+
+    Returns
+    -------
+    set
+    """
+    sites = set(sites)
+    for site in list(sites):
+        if sequence[site][1]:
+            sites.remove(site)
+    return sites
+
+
+class ImplicitCrossProductBuilder(TaskBase):
+    """Populates the :class:`~.GlycanCombinationPartition` and :class:`~.GlycopeptideSiteCombination`
+    tables of a hypothesis, which together imply the same glycopeptides
+    :class:`PeptideGlycosylator` would create, without storing each of them.
+
+    The number of rows written is proportional to the number of peptides plus the number
+    of glycan combinations rather than their product.
+
+    Attributes
+    ----------
+    session : :class:`sqlalchemy.orm.Session`
+    hypothesis_id : int
+    site_combination_limit : int
+        The maximum number of site combinations to enumerate for each peptide, glycan type
+        and glycan count, matching the limit used by :class:`PeptideGlycosylator`
+    chunk_size : int
+        The number of rows to accumulate before each bulk insert
+    """
+
+    glycan_types = [
+        (GlycanTypes.n_glycan, "n_glycosylation_sites"),
+        (GlycanTypes.o_glycan, "o_glycosylation_sites"),
+        (GlycanTypes.gag_linker, "gagylation_sites"),
+    ]
+
+    def __init__(self, session, hypothesis_id, site_combination_limit=100, chunk_size=5000):
+        self.session = session
+        self.hypothesis_id = hypothesis_id
+        self.hypothesis = self.session.query(GlycopeptideHypothesis).get(hypothesis_id)
+        self.site_combination_limit = site_combination_limit
+        self.chunk_size = chunk_size
+        self.partition_sizes = Counter()
+
+    def build_glycan_partitions(self):
+        """Record which glycan types each glycan combination may be attached as.
+
+        A combination of `n` glycans may occupy `n` sites of a glycan type only if each
+        of its members belongs to that glycan class.
+
+        Returns
+        -------
+        :class:`collections.Counter`
+            The number of glycan combinations for each glycan type and count
+        """
+        composition_class_map = composition_to_structure_class_map(
+            self.session, self.hypothesis.glycan_hypothesis_id)
+        combination_class_map = combination_structure_class_map(
+            self.session, self.hypothesis_id, composition_class_map)
+        water = Composition("H2O").mass
+        acc = []
+        partition_sizes = Counter()
+        combinations = self.session.query(
+            GlycanCombination.id, GlycanCombination.calculated_mass, GlycanCombination.count).filter(
+            GlycanCombination.hypothesis_id == self.hypothesis_id)
+        for combination_id, calculated_mass, count in combinations:
+            component_classes = combination_class_map[combination_id]
+            if not component_classes:
+                continue
+            glycan_types = set(component_classes[0]).intersection(*component_classes[1:])
+            for glycan_type, _ in self.glycan_types:
+                if glycan_type not in glycan_types:
+                    continue
+                partition_sizes[glycan_type, count] += 1
+                acc.append(dict(
+                    glycan_combination_id=combination_id,
+                    hypothesis_id=self.hypothesis_id,
+                    glycan_type=glycan_type,
+                    count=count,
+                    dehydrated_mass=calculated_mass - count * water))
+                if len(acc) > self.chunk_size:
+                    self.session.bulk_insert_mappings(GlycanCombinationPartition, acc)
+                    acc = []
+        self.session.bulk_insert_mappings(GlycanCombinationPartition, acc)
+        self.session.commit()
+        self.partition_sizes = partition_sizes
+        return partition_sizes
+
+    def handle_peptide(self, peptide):
+        """Enumerate the ways glycans may be placed on `peptide`'s unoccupied sites, for each
+        glycan type and count with at least one glycan combination to place.
+
+        Parameters
+        ----------
+        peptide : :class:`~.Peptide`
+
+        Yields
+        ------
+        dict
+        """
+        obj = None
+        for glycan_type, site_attr in self.glycan_types:
+            sites = getattr(peptide, site_attr)
+            if not sites:
+                continue
+            if obj is None:
+                obj = peptide.convert()
+            sites = unoccupied_sites(obj, sites)
+            for i in range(1, len(sites) + 1):
+                if not self.partition_sizes[glycan_type, i]:
+                    continue
+                for j, site_set in enumerate(limiting_combinations(sites, i, self.site_combination_limit)):
+                    yield dict(
+                        peptide_id=peptide.id,
+                        hypothesis_id=self.hypothesis_id,
+                        glycan_type=glycan_type,
+                        count=i,
+                        site_combination_index=j,
+                        sites=','.join(map(str, site_set)),
+                        peptide_mass=peptide.calculated_mass)
+
+    def build_site_combinations(self):
+        """Write the :class:`~.GlycopeptideSiteCombination` rows for every peptide
+        in the hypothesis.
+
+        Returns
+        -------
+        int
+            The number of glycopeptides implied by the site combinations and the glycan
+            partitions
+        """
+        total = 0
+        acc = []
+        peptides = self.session.query(Peptide).filter(
+            Peptide.hypothesis_id == self.hypothesis_id).yield_per(self.chunk_size)
+        for peptide in peptides:
+            for site_combination in self.handle_peptide(peptide):
+                total += self.partition_sizes[site_combination['glycan_type'], site_combination['count']]
+                acc.append(site_combination)
+            if len(acc) > self.chunk_size:
+                self.session.bulk_insert_mappings(GlycopeptideSiteCombination, acc)
+                acc = []
+        self.session.bulk_insert_mappings(GlycopeptideSiteCombination, acc)
+        self.session.commit()
+        return total
+
+    def run(self):
+        self.log("... Partitioning Glycan Combinations")
+        self.build_glycan_partitions()
+        self.log("... Enumerating Glycosylation Site Combinations")
+        return self.build_site_combinations()
+
+
 class GlycanCombinationRecord(object):
     __slots__ = [
         'id', 'calculated_mass', 'formula', 'count', 'glycan_composition_string',
@@ -99,6 +99,9 @@ class MzIdentMLGlycopeptideHypothesisSerializer(GlycopeptideHypothesisSerializer
         if self.full_cross_product:
             self.log("Building Glycopeptides")
             self.glycosylate_peptides()
+        else:
+            self.log("Building Implicit Glycopeptides")
+            self.build_implicit_cross_product()
         self._sql_analyze_database()
         if self.full_cross_product:
             self._count_produced_glycopeptides()
@@ -17,6 +17,7 @@ from .proteomics.peptide_permutation import (
     ProteinDigestor,
     MultipleProcessProteinDigestor,
     UniprotProteinAnnotator)
+from .proteomics.digest_cache import ProteinDigestCache, unpack_peptide
 from .proteomics.remove_duplicate_peptides import DeduplicatePeptides
 
 from .proteomics.fasta import ProteinFastaFileParser
@@ -32,7 +33,7 @@ class FastaGlycopeptideHypothesisSerializer(GlycopeptideHypothesisSerializerBase
                  protease='trypsin', constant_modifications=None, variable_modifications=None,
                  max_missed_cleavages=2, max_glycosylation_events=1, semispecific=False,
                  max_variable_modifications=None, full_cross_product=True,
-                 peptide_length_range=(5, 60)):
+                 peptide_length_range=(5, 60), digest_cache=None):
         GlycopeptideHypothesisSerializerBase.__init__(
             self, connection, hypothesis_name, glycan_hypothesis_id, full_cross_product)
         self.fasta_file = fasta_file
@@ -44,6 +45,7 @@ class FastaGlycopeptideHypothesisSerializer(GlycopeptideHypothesisSerializerBase
         self.semispecific = semispecific
         self.max_variable_modifications = max_variable_modifications
         self.peptide_length_range = peptide_length_range or (5, 60)
+        self.digest_cache = digest_cache
 
         params = {
             "fasta_file": fasta_file,
@@ -87,27 +89,30 @@ class FastaGlycopeptideHypothesisSerializer(GlycopeptideHypothesisSerializerBase
             self.max_missed_cleavages, min_length=self.peptide_length_range[0],
             max_length=self.peptide_length_range[1], semispecific=self.semispecific,
             require_glycosylation_sites=True)
+        digest_cache = ProteinDigestCache(self.digest_cache, digestor)
         i = 0
         j = 0
         protein_ids = self.protein_ids()
         n = len(protein_ids)
-        interval = min(n / 10., 100000)
+        interval = max(int(min(n / 10., 100000)), 1)
         acc = []
         for protein_id in protein_ids:
             i += 1
             protein = self.query(Protein).get(protein_id)
             if i % interval == 0:
                 self.log("... %0.3f%% Complete (%d/%d). %d Peptides Produced." % (i * 100. / n, i, n, j))
-            for peptide in digestor.process_protein(protein):
-                acc.append(peptide)
+            for record in digest_cache.digest(protein):
+                acc.append(unpack_peptide(record, protein_id, self.hypothesis_id))
                 j += 1
                 if len(acc) > 100000:
-                    self.session.bulk_save_objects(acc)
+                    self.session.bulk_insert_mappings(Peptide, acc)
                     self.session.commit()
                     acc = []
-        self.session.bulk_save_objects(acc)
+        self.session.bulk_insert_mappings(Peptide, acc)
         self.session.commit()
         acc = []
+        if digest_cache.enabled:
+            self.log("... Digest cache: %d hits, %d misses" % (digest_cache.hits, digest_cache.misses))
 
     def split_proteins(self):
         annotator = UniprotProteinAnnotator(
@@ -146,6 +151,9 @@ class FastaGlycopeptideHypothesisSerializer(GlycopeptideHypothesisSerializerBase
         if self.full_cross_product:
             self.log("Building Glycopeptides")
             self.glycosylate_peptides()
+        else:
+            self.log("Building Implicit Glycopeptides")
+            self.build_implicit_cross_product()
         self._sql_analyze_database()
         if self.full_cross_product:
             self._count_produced_glycopeptides()
@@ -157,12 +165,13 @@ class MultipleProcessFastaGlycopeptideHypothesisSerializer(FastaGlycopeptideHypo
                  protease='trypsin', constant_modifications=None, variable_modifications=None,
                  max_missed_cleavages=2, max_glycosylation_events=1, semispecific=False,
                  max_variable_modifications=None, full_cross_product=True, peptide_length_range=(5, 60),
-                 n_processes=4):
+                 n_processes=4, digest_cache=None):
         super(MultipleProcessFastaGlycopeptideHypothesisSerializer, self).__init__(
             fasta_file, connection, glycan_hypothesis_id, hypothesis_name,
             protease, constant_modifications, variable_modifications,
             max_missed_cleavages, max_glycosylation_events, semispecific,
-            max_variable_modifications, full_cross_product, peptide_length_range)
+            max_variable_modifications, full_cross_product, peptide_length_range,
+            digest_cache)
         self.n_processes = n_processes
 
     def digest_proteins(self):
@@ -174,7 +183,8 @@ class MultipleProcessFastaGlycopeptideHypothesisSerializer(FastaGlycopeptideHypo
             self._original_connection,
             self.hypothesis_id,
             self.protein_ids(),
-            digestor, n_processes=self.n_processes)
+            digestor, n_processes=self.n_processes,
+            digest_cache=self.digest_cache)
         task.run()
         n_peptides = self.query(func.count(Peptide.id)).filter(
             Peptide.hypothesis_id == self.hypothesis_id).scalar()
@@ -0,0 +1,247 @@
+'''A content-addressed on-disk cache of protein digests, so that rebuilding
+a hypothesis from the same proteome with the same digestion and modification
+rules can skip re-digesting and re-permuting every protein.
+
+Each protein's digest is stored as a list of :class:`PeptideRecord` tuples,
+keyed by a hash of the protein's sequence and glycosylation sites and of the
+parameters of the :class:`~.ProteinDigestor` that produced it.
+'''
+import os
+import gzip
+import hashlib
+import tempfile
+
+from collections import namedtuple
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+PeptideRecord = namedtuple("PeptideRecord", [
+    "base_peptide_sequence", "modified_peptide_sequence", "count_missed_cleavages",
+    "count_variable_modifications", "sequence_length", "start_position", "end_position",
+    "calculated_mass", "formula", "count_glycosylation_sites", "n_glycosylation_sites",
+    "o_glycosylation_sites", "gagylation_sites"])
+
+
+def pack_peptide(peptide):
+    """Convert a :class:`~.Peptide` produced by :meth:`ProteinDigestor.process_protein`
+    into a :class:`PeptideRecord`, dropping all protein and hypothesis specific
+    information.
+
+    Parameters
+    ----------
+    peptide : :class:`~.Peptide`
+
+    Returns
+    -------
+    :class:`PeptideRecord`
+    """
+    return PeptideRecord(
+        peptide.base_peptide_sequence, peptide.modified_peptide_sequence,
+        peptide.count_missed_cleavages, peptide.count_variable_modifications,
+        peptide.sequence_length, peptide.start_position, peptide.end_position,
+        peptide.calculated_mass, peptide.formula, peptide.count_glycosylation_sites,
+        list(peptide.n_glycosylation_sites), list(peptide.o_glycosylation_sites),
+        list(peptide.gagylation_sites))
+
+
+def unpack_peptide(record, protein_id, hypothesis_id):
+    """Convert a :class:`PeptideRecord` into a mapping suitable for
+    :meth:`Session.bulk_insert_mappings` for :class:`~.Peptide`.
+
+    Parameters
+    ----------
+    record : :class:`PeptideRecord`
+    protein_id : int
+    hypothesis_id : int
+
+    Returns
+    -------
+    dict
+    """
+    mapping = record._asdict()
+    mapping['protein_id'] = protein_id
+    mapping['hypothesis_id'] = hypothesis_id
+    mapping['peptide_score'] = 0
+    mapping['peptide_score_type'] = 'null_score'
+    return mapping
+
+
+def _modification_rule_key(rule):
+    return "%s:%0.6f:%s" % (rule.name, rule.mass, ','.join(sorted(map(str, rule.targets))))
+
+
+def digestor_fingerprint(digestor):
+    """Compute a string which uniquely describes the peptides a :class:`~.ProteinDigestor`
+    would produce for a given protein.
+
+    Parameters
+    ----------
+    digestor : :class:`~.ProteinDigestor`
+
+    Returns
+    -------
+    str
+    """
+    parts = [
+        repr(digestor.protease),
+        "constant=%s" % ';'.join(sorted(map(_modification_rule_key, digestor.constant_modifications))),
+        "variable=%s" % ';'.join(sorted(map(_modification_rule_key, digestor.variable_modifications))),
+        "max_missed_cleavages=%r" % (digestor.max_missed_cleavages, ),
+        "length=%r-%r" % (digestor.min_length, digestor.max_length),
+        "semispecific=%r" % (bool(digestor.semispecific), ),
+        "max_variable_modifications=%r" % (digestor.peptide_permuter.max_variable_modifications, ),
+        "require_glycosylation_sites=%r" % (bool(digestor.require_glycosylation_sites), ),
+    ]
+    return '\n'.join(parts)
+
+
+class ProteinDigestCache(object):
+    """Caches the :class:`PeptideRecord` lists :class:`~.ProteinDigestor` produces for
+    each protein in a directory, one compressed file per distinct protein and digestor
+    configuration.
+
+    Entries are written to a temporary file and then renamed into place, so several
+    processes may share the same cache directory.
+
+    If :attr:`path` is :const:`None`, nothing is stored and every protein is digested.
+
+    Attributes
+    ----------
+    path : str
+        The directory holding the cache entries
+    digestor : :class:`~.ProteinDigestor`
+        The digestor to produce missing entries with
+    fingerprint : str
+        The digest of the digestor's configuration, mixed into every key
+    hits : int
+        The number of proteins whose digest was read from the cache
+    misses : int
+        The number of proteins which had to be digested
+    """
+
+    def __init__(self, path, digestor):
+        self.path = path
+        self.digestor = digestor
+        self.fingerprint = hashlib.sha1(
+            digestor_fingerprint(digestor).encode('utf8')).hexdigest()
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None and not os.path.exists(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                # Another process may have created it concurrently
+                if not os.path.isdir(self.path):
+                    raise
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def key(self, protein):
+        """Compute the cache key for `protein` from its sequence and glycosylation
+        sites, and the digestor's configuration.
+
+        Parameters
+        ----------
+        protein : :class:`~.Protein`
+
+        Returns
+        -------
+        str
+        """
+        hasher = hashlib.sha1()
+        hasher.update(self.fingerprint.encode('utf8'))
+        hasher.update(str(protein.protein_sequence).encode('utf8'))
+        for sites in (protein.n_glycan_sequon_sites, protein.o_glycan_sequon_sites,
+                      protein.glycosaminoglycan_sequon_sites):
+            hasher.update((',%s;' % ','.join(map(str, sites))).encode('utf8'))
+        return hasher.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key + '.pkl.gz')
+
+    def load(self, key):
+        """Read the :class:`PeptideRecord` list stored under `key`, if there is one.
+
+        Parameters
+        ----------
+        key : str
+
+        Returns
+        -------
+        list or :const:`None`
+        """
+        if not self.enabled:
+            return None
+        try:
+            with gzip.open(self._entry_path(key), 'rb') as fh:
+                return [PeptideRecord(*rec) for rec in pickle.load(fh)]
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def save(self, key, records):
+        """Store the :class:`PeptideRecord` list `records` under `key`.
+
+        Parameters
+        ----------
+        key : str
+        records : list
+        """
+        if not self.enabled:
+            return
+        path = self._entry_path(key)
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as fh:
+                    # Store plain tuples so the entries do not depend on this module's layout
+                    pickle.dump([tuple(rec) for rec in records], fh, -1)
+            try:
+                os.replace(temp_path, path)
+            except AttributeError:
+                os.rename(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def digest(self, protein):
+        """Get the :class:`PeptideRecord` list for `protein`, reading it from the cache
+        or digesting the protein and caching the result.
+
+        Parameters
+        ----------
+        protein : :class:`~.Protein`
+
+        Returns
+        -------
+        list of :class:`PeptideRecord`
+        """
+        key = None
+        if self.enabled:
+            key = self.key(protein)
+            records = self.load(key)
+            if records is not None:
+                self.hits += 1
+                return records
+        self.misses += 1
+        records = [pack_peptide(peptide) for peptide in self.digestor.process_protein(protein)]
+        if key is not None:
+            self.save(key, records)
+        return records
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({self.path!r}, hits={self.hits}, misses={self.misses})".format(
+            self=self)
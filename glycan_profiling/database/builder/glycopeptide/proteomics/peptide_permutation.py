@@ -10,6 +10,7 @@ from ms_deisotope.peak_dependency_network.intervals import Interval, IntervalTre
 from glycopeptidepy import enzyme
 from .utils import slurp
 from .uniprot import (uniprot, get_uniprot_accession, UniprotProteinDownloader, Empty)
+from .digest_cache import ProteinDigestCache, unpack_peptide
 
 from glypy.composition import formula
 from glycopeptidepy.structure import sequence, modification, residue
@@ -336,24 +337,28 @@ digest = ProteinDigestor.digest_protein
 class ProteinDigestingProcess(Process):
     process_name = "protein-digest-worker"
 
-    def __init__(self, connection, hypothesis_id, input_queue, digestor, done_event=None,
-                 chunk_size=5000, message_handler=None):
+    def __init__(self, connection, hypothesis_id, input_queue, output_queue, digest_cache,
+                 done_event=None, chunk_size=5000, message_handler=None):
         Process.__init__(self)
         self.connection = connection
         self.input_queue = input_queue
+        self.output_queue = output_queue
         self.hypothesis_id = hypothesis_id
         self.done_event = done_event
-        self.digestor = digestor
+        self.digest_cache = digest_cache
         self.chunk_size = chunk_size
         self.message_handler = message_handler
 
+    def send_records(self, protein_id, records):
+        for i in range(0, len(records), self.chunk_size):
+            self.output_queue.put((protein_id, records[i:i + self.chunk_size]))
+
     def task(self):
         database = DatabaseBoundOperation(self.connection)
         session = database.session
         has_work = True
 
-        digestor = self.digestor
-        acc = []
+        digest_cache = self.digest_cache
         if self.message_handler is None:
             self.message_handler = lambda x: None
         while has_work:
@@ -367,7 +372,6 @@ class ProteinDigestingProcess(Process):
                     has_work = False
                 continue
             proteins = slurp(session, Protein, work_items, flatten=False)
-            acc = []
 
             threshold_size = 3000
 
@@ -375,27 +379,79 @@ class ProteinDigestingProcess(Process):
                 size = len(protein.protein_sequence)
                 if size > threshold_size:
                     self.message_handler("...... Started digesting %s (%d)" % (protein.name, size))
-                i = 0
-                for peptide in digestor.process_protein(protein):
-                    acc.append(peptide)
-                    i += 1
-                    if len(acc) > self.chunk_size:
-                        session.bulk_save_objects(acc)
-                        session.commit()
-                        acc = []
-                    if i % 10000 == 0:
-                        self.message_handler(
-                            "...... Digested %d peptides from %r (%d)" % (
-                                i, protein.name, size))
+                records = digest_cache.digest(protein)
+                self.send_records(protein.id, records)
                 if size > threshold_size:
-                    self.message_handler("...... Finished digesting %s (%d)" % (protein.name, size))
-            session.bulk_save_objects(acc)
-            session.commit()
-            acc = []
+                    self.message_handler("...... Finished digesting %s (%d), %d peptides" % (
+                        protein.name, size, len(records)))
+            # Release the read transaction so it does not block the writer
+            session.rollback()
+        if digest_cache.enabled:
+            self.message_handler("...... Digest cache: %d hits, %d misses" % (
+                digest_cache.hits, digest_cache.misses))
+        self.output_queue.put(None)
+
+    def run(self):
+        new_name = getattr(self, 'process_name', None)
+        if new_name is not None:
+            TaskBase().try_set_process_name(new_name)
+        self.task()
+
+
+class PeptideBulkWriterProcess(Process):
+    """Receives packed peptide records from :class:`ProteinDigestingProcess` workers
+    and writes them to the database through a single session.
+
+    Each message on :attr:`input_queue` is a ``(protein_id, records)`` pair, or
+    :const:`None` when a producer has finished. The process stops after every
+    producer has finished, or once :attr:`done_event` is set and the queue is empty.
+    """
+    process_name = "peptide-writer"
+
+    def __init__(self, connection, hypothesis_id, input_queue, n_producers, done_event=None,
+                 chunk_size=50000, message_handler=None):
+        Process.__init__(self)
+        self.connection = connection
+        self.hypothesis_id = hypothesis_id
+        self.input_queue = input_queue
+        self.n_producers = n_producers
+        self.done_event = done_event
+        self.chunk_size = chunk_size
+        self.message_handler = message_handler
+
+    def task(self):
+        database = DatabaseBoundOperation(self.connection)
+        session = database.session
+        hypothesis_id = self.hypothesis_id
+        if self.message_handler is None:
+            self.message_handler = lambda x: None
+
+        n_finished = 0
+        n_written = 0
+        acc = []
+        while n_finished < self.n_producers:
+            try:
+                item = self.input_queue.get(timeout=5)
+            except Exception:
+                if self.done_event is not None and self.done_event.is_set():
+                    break
+                continue
+            if item is None:
+                n_finished += 1
+                continue
+            protein_id, records = item
+            acc.extend(unpack_peptide(rec, protein_id, hypothesis_id) for rec in records)
+            if len(acc) > self.chunk_size:
+                session.bulk_insert_mappings(Peptide, acc)
+                session.commit()
+                n_written += len(acc)
+                acc = []
         if acc:
-            session.bulk_save_objects(acc)
+            session.bulk_insert_mappings(Peptide, acc)
             session.commit()
+            n_written += len(acc)
             acc = []
+        self.message_handler("...... Wrote %d peptides" % (n_written, ))
 
     def run(self):
         new_name = getattr(self, 'process_name', None)
@@ -405,21 +461,38 @@ class ProteinDigestingProcess(Process):
 
 
 class MultipleProcessProteinDigestor(TaskBase):
-    def __init__(self, connection, hypothesis_id, protein_ids, digestor, n_processes=4):
+    """Digests proteins in parallel worker processes, which send their packed peptides
+    to a single :class:`PeptideBulkWriterProcess`.
+
+    If `digest_cache` is given, either as a :class:`~.ProteinDigestCache` or a directory
+    path, workers will re-use digests cached by previous runs.
+    """
+
+    def __init__(self, connection, hypothesis_id, protein_ids, digestor, n_processes=4,
+                 digest_cache=None):
         self.connection = connection
         self.hypothesis_id = hypothesis_id
         self.protein_ids = protein_ids
         self.digestor = digestor
         self.n_processes = n_processes
+        if not isinstance(digest_cache, ProteinDigestCache):
+            digest_cache = ProteinDigestCache(digest_cache, digestor)
+        self.digest_cache = digest_cache
 
     def run(self):
         logger = self.ipc_logger()
         input_queue = Queue(2 * self.n_processes)
+        output_queue = Queue(4 * self.n_processes)
         done_event = Event()
+        writer_done_event = Event()
+        writer = PeptideBulkWriterProcess(
+            self.connection, self.hypothesis_id, output_queue, self.n_processes,
+            done_event=writer_done_event, message_handler=logger.sender())
+        writer.start()
         processes = [
             ProteinDigestingProcess(
-                self.connection, self.hypothesis_id, input_queue,
-                self.digestor, done_event=done_event,
+                self.connection, self.hypothesis_id, input_queue, output_queue,
+                self.digest_cache, done_event=done_event,
                 message_handler=logger.sender()) for i in range(
                 self.n_processes)
         ]
@@ -448,6 +521,8 @@ class MultipleProcessProteinDigestor(TaskBase):
         done_event.set()
         for process in processes:
             process.join()
+        writer_done_event.set()
+        writer.join()
         logger.stop()
 
 
@@ -8,13 +8,21 @@ except ImportError:
 import logging
 
 
-from sqlalchemy import select, join
+from sqlalchemy import select, join, and_
+
+from glypy import Composition
+from glypy.composition import formula
+from glypy.structure.glycan_composition import FrozenGlycanComposition
+
+from glycopeptidepy.structure.sequence import (
+    PeptideSequence, _n_glycosylation, _o_glycosylation, _gag_linker_glycosylation)
 
 from glycan_profiling.serialize import (
     GlycanComposition, Glycopeptide, Peptide,
     func, GlycopeptideHypothesis, GlycanHypothesis,
     DatabaseBoundOperation, GlycanClass, GlycanTypes,
-    GlycanCompositionToClass)
+    GlycanCompositionToClass, GlycanCombination,
+    GlycopeptideSiteCombination, GlycanCombinationPartition)
 
 from .mass_collection import SearchableMassCollection, NeutralMassDatabase
 from .intervals import (
@@ -26,6 +34,7 @@ from glycan_profiling.structure.structure_loader import (
     CachingPeptideParser,
     GlycopeptideDatabaseRecord)
 from .composition_network import CompositionGraph, n_glycan_distance
+from glycan_profiling.structure.utils import LRUDict
 
 
 logger = logging.getLogger("glycresoft.database")
@@ -445,6 +454,233 @@ class GlycopeptideDiskBackedStructureDatabase(DeclarativeDiskBackedDatabase):
         return selectable.where(Glycopeptide.__table__.c.hypothesis_id == self.hypothesis_id)
 
 
+_site_combination_table = GlycopeptideSiteCombination.__table__
+_glycan_partition_table = GlycanCombinationPartition.__table__
+
+# The number of bits of an implicit glycopeptide's id which hold the
+# glycan combination id. The remaining high bits hold the site combination id.
+IMPLICIT_ID_SHIFT = 32
+_IMPLICIT_ID_MASK = (1 << IMPLICIT_ID_SHIFT) - 1
+
+
+class ImplicitGlycopeptideDiskBackedStructureDatabase(GlycopeptideDiskBackedStructureDatabase):
+    """A :class:`GlycopeptideDiskBackedStructureDatabase` over a hypothesis which stores its
+    glycopeptides implicitly, as :class:`~.GlycopeptideSiteCombination` and
+    :class:`~.GlycanCombinationPartition` rows rather than :class:`~.Glycopeptide` rows.
+
+    Glycopeptide records are produced by joining the two tables at query time. Each one
+    is given an integer id that packs its site combination and glycan combination ids
+    together, see :meth:`make_id` and :meth:`split_id`.
+    """
+    selectable = join(
+        join(_site_combination_table, Peptide.__table__,
+             _site_combination_table.c.peptide_id == Peptide.__table__.c.id),
+        join(_glycan_partition_table, GlycanCombination.__table__,
+             _glycan_partition_table.c.glycan_combination_id == GlycanCombination.__table__.c.id),
+        and_(_glycan_partition_table.c.hypothesis_id == _site_combination_table.c.hypothesis_id,
+             _glycan_partition_table.c.glycan_type == _site_combination_table.c.glycan_type,
+             _glycan_partition_table.c.count == _site_combination_table.c.count))
+    mass_field = (_site_combination_table.c.peptide_mass + _glycan_partition_table.c.dehydrated_mass)
+    fields = [
+        _site_combination_table.c.id.label("site_combination_id"),
+        _glycan_partition_table.c.glycan_combination_id,
+        mass_field.label("calculated_mass"),
+        Peptide.__table__.c.id.label("peptide_id"),
+        Peptide.__table__.c.modified_peptide_sequence,
+        Peptide.__table__.c.formula.label("peptide_formula"),
+        _site_combination_table.c.glycan_type,
+        _site_combination_table.c.sites,
+        GlycanCombination.__table__.c.composition,
+        GlycanCombination.__table__.c.count,
+        GlycanCombination.__table__.c.formula.label("glycan_formula"),
+        Peptide.__table__.c.protein_id,
+        Peptide.__table__.c.start_position,
+        Peptide.__table__.c.end_position,
+        Peptide.__table__.c.calculated_mass.label("peptide_mass"),
+        _site_combination_table.c.hypothesis_id,
+    ]
+    identity_field = _site_combination_table.c.id
+
+    glycosylation_modifications = {
+        GlycanTypes.n_glycan: _n_glycosylation.name,
+        GlycanTypes.o_glycan: _o_glycosylation.name,
+        GlycanTypes.gag_linker: _gag_linker_glycosylation.name,
+    }
+
+    def __init__(self, connection, hypothesis_id=1, cache_size=DEFAULT_CACHE_SIZE,
+                 loading_interval=DEFAULT_LOADING_INTERVAL,
+                 threshold_cache_total_count=DEFAULT_THRESHOLD_CACHE_TOTAL_COUNT):
+        super(ImplicitGlycopeptideDiskBackedStructureDatabase, self).__init__(
+            connection, hypothesis_id, cache_size, loading_interval,
+            threshold_cache_total_count)
+        self._peptide_cache = LRUDict(maxsize=2 ** 12)
+        self._glycan_cache = LRUDict(maxsize=2 ** 14)
+
+    @classmethod
+    def is_implicit(cls, hypothesis):
+        """Check whether `hypothesis` stores its glycopeptides implicitly.
+
+        Parameters
+        ----------
+        hypothesis : :class:`~.GlycopeptideHypothesis`
+
+        Returns
+        -------
+        bool
+        """
+        return bool((hypothesis.parameters or {}).get("implicit_cross_product", False))
+
+    @staticmethod
+    def make_id(site_combination_id, glycan_combination_id):
+        return (int(site_combination_id) << IMPLICIT_ID_SHIFT) | int(glycan_combination_id)
+
+    @staticmethod
+    def split_id(id):
+        """Unpack an implicit glycopeptide id into its site combination and
+        glycan combination ids.
+
+        Parameters
+        ----------
+        id : int
+
+        Returns
+        -------
+        site_combination_id : int
+        glycan_combination_id : int
+        """
+        id = int(id)
+        return id >> IMPLICIT_ID_SHIFT, id & _IMPLICIT_ID_MASK
+
+    def _limit_to_hypothesis(self, selectable):
+        return selectable.where(_site_combination_table.c.hypothesis_id == self.hypothesis_id)
+
+    def _get_peptide(self, peptide_id, modified_peptide_sequence):
+        try:
+            return self._peptide_cache[peptide_id]
+        except KeyError:
+            peptide = self._peptide_cache[peptide_id] = PeptideSequence(modified_peptide_sequence)
+            return peptide
+
+    def _get_glycan(self, glycan_combination_id, composition, count):
+        try:
+            return self._glycan_cache[glycan_combination_id]
+        except KeyError:
+            glycan = FrozenGlycanComposition.parse(composition)
+            glycan.id = glycan_combination_id
+            glycan.count = count
+            self._glycan_cache[glycan_combination_id] = glycan
+            return glycan
+
+    def glycopeptide_sequence(self, row):
+        """Write out the glycopeptide sequence described by a row of the site
+        combination and glycan partition join.
+
+        Parameters
+        ----------
+        row : :class:`sqlalchemy.engine.RowProxy`
+
+        Returns
+        -------
+        str
+        """
+        sequence = self._get_peptide(row.peptide_id, row.modified_peptide_sequence).clone()
+        modification = self.glycosylation_modifications[row.glycan_type]
+        for site in row.sites.split(","):
+            sequence.add_modification(int(site), modification)
+        sequence.glycan = self._get_glycan(row.glycan_combination_id, row.composition, row.count)
+        return str(sequence)
+
+    def _make_record(self, row):
+        if isinstance(row, GlycopeptideDatabaseRecord):
+            return row
+        return GlycopeptideDatabaseRecord(
+            self.make_id(row.site_combination_id, row.glycan_combination_id),
+            row.calculated_mass,
+            self.glycopeptide_sequence(row),
+            row.protein_id,
+            row.start_position,
+            row.end_position,
+            row.peptide_mass,
+            row.hypothesis_id)
+
+    def _convert(self, bundle):
+        return super(ImplicitGlycopeptideDiskBackedStructureDatabase, self)._convert(
+            self._make_record(bundle))
+
+    def _search_mass_interval(self, start, end):
+        conn = self.session.connection()
+        # Bound the peptide mass for each glycan partition so the site combination's
+        # mass search index can be used, rather than filtering on the sum of both masses.
+        peptide_mass = _site_combination_table.c.peptide_mass
+        glycan_mass = _glycan_partition_table.c.dehydrated_mass
+        stmt = self._limit_to_hypothesis(
+            select(self._get_record_properties()).select_from(self.selectable)).where(
+            peptide_mass.between(start - glycan_mass, end - glycan_mass))
+        return [self._make_record(row) for row in conn.execute(stmt)]
+
+    def _get_row(self, id):
+        site_combination_id, glycan_combination_id = self.split_id(id)
+        return self.session.execute(select(self._get_record_properties()).select_from(
+            self.selectable).where(
+            and_(_site_combination_table.c.id == site_combination_id,
+                 _glycan_partition_table.c.glycan_combination_id == glycan_combination_id))).first()
+
+    def get_record(self, id):
+        row = self._get_row(id)
+        if row is None:
+            return None
+        return self._make_record(row)
+
+    def materialize_glycopeptide(self, id):
+        """Build a transient :class:`~.Glycopeptide` ORM instance for the implicit glycopeptide
+        `id`, for copying into another hypothesis. The instance is not added to any session.
+
+        Parameters
+        ----------
+        id : int
+
+        Returns
+        -------
+        :class:`~.Glycopeptide`
+        """
+        row = self._get_row(id)
+        if row is None:
+            raise KeyError(id)
+        composition = Composition(str(row.peptide_formula)) + Composition(
+            str(row.glycan_formula)) - Composition("H2O") * row.count
+        return Glycopeptide(
+            id=self.make_id(row.site_combination_id, row.glycan_combination_id),
+            calculated_mass=row.calculated_mass,
+            formula=formula(composition),
+            glycopeptide_sequence=self.glycopeptide_sequence(row),
+            peptide_id=row.peptide_id,
+            protein_id=row.protein_id,
+            hypothesis_id=row.hypothesis_id,
+            glycan_combination_id=row.glycan_combination_id)
+
+    def get_all_records(self):
+        return [self._make_record(row) for row in super(
+            ImplicitGlycopeptideDiskBackedStructureDatabase, self).get_all_records()]
+
+    def get_glycopeptide_components(self, id):
+        """Look up the peptide and glycan combination an implicit glycopeptide
+        is made from.
+
+        Parameters
+        ----------
+        id : int
+
+        Returns
+        -------
+        peptide_id : int
+        glycan_combination_id : int
+        """
+        site_combination_id, glycan_combination_id = self.split_id(id)
+        peptide_id = self.session.query(GlycopeptideSiteCombination.peptide_id).filter(
+            GlycopeptideSiteCombination.id == site_combination_id).scalar()
+        return peptide_id, glycan_combination_id
+
+
 class InMemoryPeptideStructureDatabase(NeutralMassDatabase):
     def __init__(self, records, source_database=None, sort=True):
         super(InMemoryPeptideStructureDatabase, self).__init__(records, sort=sort)
@@ -10,7 +10,8 @@ from .csv_format import (
     SimpleScoredChromatogramCSVSerializer)
 
 from .xml import (
-    MzIdentMLSerializer)
+    MzIdentMLSerializer,
+    StreamingMzIdentMLSerializer)
 
 from .report import (
     GlycanChromatogramReportCreator,
@@ -20,3 +21,8 @@ from .annotate_spectra import SpectrumAnnotatorExport
 
 
 from .text_format import TrainingMGFExporter
+
+from .columnar import (
+    GlycopeptideSpectrumMatchColumnarExporter,
+    IdentifiedGlycopeptideColumnarExporter,
+    read_columnar_directory)
@@ -1,7 +1,9 @@
 import os
+import time
 import logging
 import string
 import platform
+import multiprocessing
 
 from glycan_profiling import serialize
 from glycan_profiling.serialize import (
@@ -39,14 +41,148 @@ def format_filename(s):
     return filename
 
 
+def resolve_tandem_scoring_model(analysis):
+    """Get the MS/MS scoring model an analysis was searched with, so that spectra are
+    annotated with the same fragment matches that were scored, falling back to
+    :obj:`CoverageWeightedBinomialModelTree` when it was not recorded.
+
+    Parameters
+    ----------
+    analysis : :class:`~.serialize.Analysis`
+
+    Returns
+    -------
+    object
+        A scoring model with an ``evaluate`` method
+    """
+    model = analysis.parameters.get("tandem_scoring_model")
+    if model is None or not hasattr(model, "evaluate"):
+        model = CoverageWeightedBinomialModelTree
+    return model
+
+
+class SpectrumAnnotationRenderer(DatabaseBoundOperation):
+    """Renders the annotated spectrum of each :class:`~.GlycopeptideSpectrumMatch` it is
+    given to a PDF, using its own database connection and scan loader so that one
+    instance can live in each worker process.
+
+    Matches are re-evaluated with the analysis's own scoring model, fragment error
+    tolerance and each match's stored mass shift, reproducing the annotations the
+    search scored.
+    """
+
+    def __init__(self, database_connection, analysis_id, output_path, mzml_path, mpl_style=None):
+        DatabaseBoundOperation.__init__(self, database_connection)
+        self.analysis_id = analysis_id
+        self.output_path = output_path
+        self.mzml_path = mzml_path
+        self.mpl_style = mpl_style or {}
+        self.analysis = self.session.query(serialize.Analysis).get(self.analysis_id)
+        self.scoring_model = resolve_tandem_scoring_model(self.analysis)
+        self.error_tolerance = self.analysis.parameters.get("fragment_error_tolerance", 2e-5)
+        self.scan_loader = ProcessedMzMLDeserializer(self.mzml_path)
+
+    def _mass_shift_for(self, gpsm):
+        try:
+            mass_shift = gpsm.mass_shift
+        except Exception:
+            mass_shift = None
+        if mass_shift is None or mass_shift.name == Unmodified.name:
+            return Unmodified
+        return mass_shift.convert()
+
+    def evaluate(self, gpsm, scan):
+        return self.scoring_model.evaluate(
+            scan, gpsm.structure.convert(), error_tolerance=self.error_tolerance,
+            mass_shift=self._mass_shift_for(gpsm))
+
+    def render(self, gpsm):
+        """Render one spectrum match.
+
+        Parameters
+        ----------
+        gpsm : :class:`~.GlycopeptideSpectrumMatch`
+
+        Returns
+        -------
+        str
+            The path the figure was written to
+        """
+        scan = self.scan_loader.get_scan_by_id(gpsm.scan.scan_id)
+        match = self.evaluate(gpsm, scan)
+        with style.context(self.mpl_style):
+            fig = figure()
+            grid = plt.GridSpec(nrows=5, ncols=1)
+            ax1 = fig.add_subplot(grid[1, 0])
+            ax2 = fig.add_subplot(grid[2:, 0])
+            ax3 = fig.add_subplot(grid[0, 0])
+            ax3.text(0, 0.5, (
+                str(match.target) + '\n' + scan.id +
+                '\nscore=%0.3f    q value=%0.3g' % (gpsm.score, gpsm.q_value)), va='center')
+            ax3.axis('off')
+            match.plot(ax=ax2)
+            glycopeptide_match_logo(match, ax=ax1)
+            fname = format_filename("%s_%s.pdf" % (scan.id, match.target))
+            path = os.path.join(self.output_path, fname)
+            abspath = os.path.abspath(path)
+            if len(abspath) > 259 and platform.system().lower() == 'windows':
+                abspath = '\\\\?\\' + abspath
+            fig.savefig(abspath, bbox_inches='tight')
+            plt.close(fig)
+        return path
+
+    def render_chunk(self, gpsm_ids):
+        """Render each spectrum match in `gpsm_ids`, loading them in one query.
+
+        Parameters
+        ----------
+        gpsm_ids : list of int
+
+        Returns
+        -------
+        list of str
+            The paths of the figures that were written
+        """
+        gpsms = self.query(GlycopeptideSpectrumMatch).join(
+            GlycopeptideSpectrumMatch.scan).filter(
+            GlycopeptideSpectrumMatch.id.in_(gpsm_ids)).order_by(
+            MSScan.index).all()
+        paths = [self.render(gpsm) for gpsm in gpsms]
+        # Release the chunk's rows so a long-running worker does not accumulate them
+        self.session.expunge_all()
+        return paths
+
+
+_worker_renderer = None
+
+
+def _initialize_worker(database_connection, analysis_id, output_path, mzml_path, mpl_style):
+    global _worker_renderer
+    _worker_renderer = SpectrumAnnotationRenderer(
+        database_connection, analysis_id, output_path, mzml_path, mpl_style)
+
+
+def _render_chunk_in_worker(gpsm_ids):
+    return _worker_renderer.render_chunk(gpsm_ids)
+
+
 class SpectrumAnnotatorExport(TaskBase, DatabaseBoundOperation):
-    def __init__(self, database_connection, analysis_id, output_path, mzml_path=None):
+    """Writes an annotated spectrum PDF for every glycopeptide spectrum match of an analysis.
+
+    Spectrum match ids are sent in chunks of :attr:`chunk_size` to a pool of
+    :attr:`n_processes` workers, each with its own :class:`SpectrumAnnotationRenderer`.
+    When :attr:`n_processes` is 1, spectra are rendered in this process.
+    """
+
+    def __init__(self, database_connection, analysis_id, output_path, mzml_path=None,
+                 n_processes=1, chunk_size=50):
         DatabaseBoundOperation.__init__(self, database_connection)
         self.analysis_id = analysis_id
         self.mzml_path = mzml_path
         self.output_path = output_path
         self.analysis = self.session.query(serialize.Analysis).get(self.analysis_id)
-        self.scan_loader = None
+        self.n_processes = n_processes
+        self.chunk_size = chunk_size
         self._mpl_style = {
             'figure.facecolor': 'white',
             'figure.edgecolor': 'white',
@@ -55,11 +191,10 @@ class SpectrumAnnotatorExport(TaskBase, DatabaseBoundOperation):
             'figure.subplot.bottom': .125
         }
 
-    def _make_scan_loader(self):
+    def _resolve_mzml_path(self):
         if self.mzml_path is not None:
             if not os.path.exists(self.mzml_path):
                 raise IOError("No such file {}".format(self.mzml_path))
-            self.scan_loader = ProcessedMzMLDeserializer(self.mzml_path)
         else:
             self.mzml_path = self.analysis.parameters['sample_path']
             if not os.path.exists(self.mzml_path):
@@ -67,46 +202,58 @@ class SpectrumAnnotatorExport(TaskBase, DatabaseBoundOperation):
                     "No such file {}. If {} was relocated, you may need to explicily pass the"
                     " corrected file path.").format(
                     self.mzml_path,
-                    self.database_connection._original_connection))
-            self.scan_loader = ProcessedMzMLDeserializer(self.mzml_path)
-        return self.scan_loader
+                    self._original_connection))
+        return self.mzml_path
 
-    def _load_spectrum_matches(self):
-        query = self.query(GlycopeptideSpectrumMatch).join(
+    def _load_spectrum_match_ids(self):
+        query = self.query(GlycopeptideSpectrumMatch.id).join(
             GlycopeptideSpectrumMatch.scan).filter(
             GlycopeptideSpectrumMatch.analysis_id == self.analysis_id).order_by(
             MSScan.index)
-        return query.all()
+        return [i for i, in query]
+
+    def _chunks(self, gpsm_ids):
+        return [gpsm_ids[i:i + self.chunk_size] for i in range(0, len(gpsm_ids), self.chunk_size)]
+
+    def _renderer_args(self):
+        return (self._original_connection, self.analysis_id, self.output_path,
+                self.mzml_path, self._mpl_style)
+
+    def _render_serial(self, chunks):
+        renderer = SpectrumAnnotationRenderer(*self._renderer_args())
+        for chunk in chunks:
+            yield renderer.render_chunk(chunk)
+
+    def _render_parallel(self, chunks):
+        pool = multiprocessing.Pool(
+            self.n_processes, _initialize_worker, self._renderer_args())
+        try:
+            for paths in pool.imap_unordered(_render_chunk_in_worker, chunks):
+                yield paths
+        finally:
+            pool.terminate()
+            pool.join()
 
     def run(self):
-        scan_loader = self._make_scan_loader()
-        gpsms = self._load_spectrum_matches()
+        self._resolve_mzml_path()
+        gpsm_ids = self._load_spectrum_match_ids()
         if not os.path.exists(self.output_path):
             os.makedirs(self.output_path)
-        n = len(gpsms)
+        n = len(gpsm_ids)
         self.log("%d Spectrum Matches" % (n,))
-        for i, gpsm in enumerate(gpsms):
-            scan = scan_loader.get_scan_by_id(gpsm.scan.scan_id)
-            gpep = gpsm.structure.convert()
-            if i % 10 == 0:
-                self.log("... %0.2f%%: %s @ %s" % (((i + 1) / float(n) * 100.0), gpep, scan.id))
-            with style.context(self._mpl_style):
-                fig = figure()
-                grid = plt.GridSpec(nrows=5, ncols=1)
-                ax1 = fig.add_subplot(grid[1, 0])
-                ax2 = fig.add_subplot(grid[2:, 0])
-                ax3 = fig.add_subplot(grid[0, 0])
-                match = CoverageWeightedBinomialModelTree.evaluate(scan, gpep)
-                ax3.text(0, 0.5, (
-                    str(match.target) + '\n' + scan.id +
-                    '\nscore=%0.3f    q value=%0.3g' % (gpsm.score, gpsm.q_value)), va='center')
-                ax3.axis('off')
-                match.plot(ax=ax2)
-                glycopeptide_match_logo(match, ax=ax1)
-                fname = format_filename("%s_%s.pdf" % (scan.id, gpep))
-                path = os.path.join(self.output_path, fname)
-                abspath = os.path.abspath(path)
-                if len(abspath) > 259 and platform.system().lower() == 'windows':
-                    abspath = '\\\\?\\' + abspath
-                fig.savefig(abspath, bbox_inches='tight')
-                plt.close(fig)
+        chunks = self._chunks(gpsm_ids)
+        if self.n_processes > 1 and len(chunks) > 1:
+            self.log("... Rendering With %d Processes" % (self.n_processes, ))
+            results = self._render_parallel(chunks)
+        else:
+            results = self._render_serial(chunks)
+        start = time.time()
+        i = 0
+        for paths in results:
+            i += len(paths)
+            elapsed = time.time() - start
+            rate = i / elapsed if elapsed > 0 else 0.0
+            self.log("... %0.2f%% (%d/%d) Spectra Annotated, %0.2f/s" % (
+                i * 100.0 / n, i, n, rate))
+        self.log("%d Spectra Annotated in %0.2f Seconds" % (i, time.time() - start))
+        return i
@@ -0,0 +1,437 @@
+'''Set-based exporters which read flat rows describing an analysis's identifications
+directly from the database in chunks and write them to CSV or columnar files, without
+reconstructing any of the ORM object graphs the per-object serializers of
+:mod:`~.csv_format` work with.
+'''
+import csv
+import os
+import json
+
+from collections import OrderedDict
+from io import TextIOWrapper
+
+import numpy as np
+
+from sqlalchemy import select, func, literal, Boolean, Integer, Numeric
+
+from glycan_profiling.task import TaskBase
+from glycan_profiling.serialize import (
+    Protein, Peptide, Glycopeptide, MSScan, PrecursorInformation,
+    CompoundMassShift, Chromatogram, ChromatogramSolution,
+    IdentifiedGlycopeptide, GlycopeptideSpectrumMatch,
+    GlycopeptideSpectrumSolutionSet)
+from glycan_profiling.serialize.tandem import GlycopeptideSpectrumMatchScoreSet
+
+try:
+    import pyarrow
+    from pyarrow import parquet
+except ImportError:
+    pyarrow = None
+    parquet = None
+
+
+class CSVChunkWriter(object):
+    """Writes chunks of rows to a binary stream as delimited text, preceded by a
+    header row.
+
+    Attributes
+    ----------
+    outstream : file-like
+    columns : list
+        The names of the columns being written
+    """
+
+    def __init__(self, outstream, columns, delimiter=','):
+        try:
+            is_binary = 'b' in outstream.mode
+        except AttributeError:
+            is_binary = True
+        if is_binary:
+            try:
+                outstream = TextIOWrapper(outstream, 'utf8', newline="")
+            except AttributeError:
+                # must be Py2
+                pass
+        self.outstream = outstream
+        self.columns = columns
+        self.writer = csv.writer(self.outstream, delimiter=delimiter)
+        self.writer.writerow(columns)
+
+    def write_chunk(self, rows):
+        self.writer.writerows(rows)
+        self.outstream.flush()
+
+    def close(self):
+        self.outstream.flush()
+
+
+class ColumnarDirectoryWriter(object):
+    """Writes chunks of rows to a directory with one file per column, appending each
+    chunk as it arrives. Numeric columns are stored as raw little-endian arrays which
+    can be memory mapped, with missing values as NaN, and text columns as newline-delimited
+    UTF-8. A ``schema.json`` file records the type and file of each column and the number
+    of rows.
+
+    Attributes
+    ----------
+    path : str
+        The directory to write to
+    columns : list
+        The names of the columns being written
+    dtypes : list
+        The type of each column, either ``"<f8"``, ``"|b1"`` or ``"str"``
+    """
+
+    def __init__(self, path, columns, dtypes):
+        self.path = path
+        self.columns = columns
+        self.dtypes = dtypes
+        self.row_count = 0
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.handles = [
+            open(os.path.join(self.path, self._file_name(name, dtype)), 'wb')
+            for name, dtype in zip(columns, dtypes)]
+
+    @staticmethod
+    def _file_name(name, dtype):
+        return name + ('.txt' if dtype == 'str' else '.bin')
+
+    def _write_values(self, handle, dtype, values):
+        if dtype == 'str':
+            handle.write(u''.join(
+                (u'' if v is None else (u"%s" % (v, )).replace(u'\n', u' ')) + u'\n'
+                for v in values).encode('utf8'))
+        elif dtype == '|b1':
+            handle.write(np.array([bool(v) for v in values], dtype=dtype).tobytes())
+        else:
+            handle.write(np.array([np.nan if v is None else v for v in values], dtype=dtype).tobytes())
+
+    def write_chunk(self, rows):
+        if not rows:
+            return
+        for handle, dtype, values in zip(self.handles, self.dtypes, zip(*rows)):
+            self._write_values(handle, dtype, values)
+        self.row_count += len(rows)
+
+    def close(self):
+        for handle in self.handles:
+            handle.close()
+        schema = {
+            "row_count": self.row_count,
+            "columns": [
+                {"name": name, "dtype": dtype, "file": self._file_name(name, dtype)}
+                for name, dtype in zip(self.columns, self.dtypes)
+            ]
+        }
+        with open(os.path.join(self.path, "schema.json"), 'wt') as fh:
+            json.dump(schema, fh, indent=2, sort_keys=True)
+
+
+def read_columnar_directory(path, columns=None):
+    """Read the columns written by :class:`ColumnarDirectoryWriter` to `path`.
+
+    Parameters
+    ----------
+    path : str
+    columns : list, optional
+        The names of the columns to read, defaulting to all of them
+
+    Returns
+    -------
+    :class:`~.OrderedDict`
+        A mapping from column name to :class:`np.ndarray` for numeric columns,
+        memory mapped, or list of str for text columns
+    """
+    with open(os.path.join(path, "schema.json"), 'rt') as fh:
+        schema = json.load(fh)
+    result = OrderedDict()
+    for spec in schema['columns']:
+        if columns is not None and spec['name'] not in columns:
+            continue
+        file_path = os.path.join(path, spec['file'])
+        if spec['dtype'] == 'str':
+            with open(file_path, 'rb') as fh:
+                result[spec['name']] = fh.read().decode('utf8').split('\n')[:schema['row_count']]
+        elif schema['row_count'] == 0:
+            result[spec['name']] = np.zeros(0, dtype=spec['dtype'])
+        else:
+            result[spec['name']] = np.memmap(file_path, dtype=spec['dtype'], mode='r')
+    return result
+
+
+class ParquetChunkWriter(object):
+    """Writes each chunk of rows as a row group of a Parquet file.
+
+    Requires :mod:`pyarrow`.
+
+    Attributes
+    ----------
+    path : str
+    columns : list
+        The names of the columns being written
+    """
+
+    def __init__(self, path, columns):
+        if pyarrow is None:
+            raise ImportError("Writing Parquet files requires pyarrow")
+        self.path = path
+        self.columns = columns
+        self.writer = None
+
+    def write_chunk(self, rows):
+        if not rows:
+            return
+        table = pyarrow.Table.from_arrays(
+            [pyarrow.array(list(values)) for values in zip(*rows)], names=self.columns)
+        if self.writer is None:
+            self.writer = parquet.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class SQLColumnarExporterBase(TaskBase):
+    """Streams the rows of a single SQL query over an analysis's tables to a chunk writer.
+
+    Subclasses define :meth:`column_expressions`, the SQL expression of each column
+    that may be exported, and :meth:`select_from`, the join they are drawn from.
+
+    Attributes
+    ----------
+    session : :class:`~.Session`
+    analysis_id : int
+    columns : list
+        The names of the columns to export, in order
+    chunk_size : int
+        The number of rows to fetch and write at a time
+    """
+
+    def __init__(self, session, analysis_id, columns=None, chunk_size=5000):
+        self.session = session
+        self.analysis_id = analysis_id
+        available = self.column_expressions()
+        if columns is None:
+            columns = list(available.keys())
+        else:
+            missing = [c for c in columns if c not in available]
+            if missing:
+                raise ValueError("Unknown columns %r, expected some of %r" % (
+                    missing, list(available.keys())))
+        self.columns = list(columns)
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def column_names(cls):
+        return list(cls.column_expressions().keys())
+
+    def column_dtypes(self):
+        """The storage type of each exported column for :class:`ColumnarDirectoryWriter`,
+        derived from the SQL type of its expression.
+
+        Returns
+        -------
+        list of str
+        """
+        available = self.column_expressions()
+        dtypes = []
+        for name in self.columns:
+            sql_type = available[name].type
+            if isinstance(sql_type, Boolean):
+                dtypes.append('|b1')
+            elif isinstance(sql_type, (Integer, Numeric)):
+                dtypes.append('<f8')
+            else:
+                dtypes.append('str')
+        return dtypes
+
+    @classmethod
+    def column_expressions(cls):
+        raise NotImplementedError()
+
+    def select_from(self):
+        raise NotImplementedError()
+
+    def where(self):
+        raise NotImplementedError()
+
+    def build_query(self):
+        available = self.column_expressions()
+        query = select([available[c].label(c) for c in self.columns]).select_from(
+            self.select_from()).where(self.where())
+        return query
+
+    def iterchunks(self):
+        """Execute the query and yield its rows in chunks of :attr:`chunk_size`.
+
+        Yields
+        ------
+        list of tuple
+        """
+        connection = self.session.connection().execution_options(stream_results=True)
+        result = connection.execute(self.build_query())
+        try:
+            while True:
+                chunk = result.fetchmany(self.chunk_size)
+                if not chunk:
+                    break
+                yield [tuple(row) for row in chunk]
+        finally:
+            result.close()
+
+    def run(self, writer):
+        """Write every row to `writer`, then close it.
+
+        Parameters
+        ----------
+        writer : :class:`CSVChunkWriter`, :class:`ColumnarDirectoryWriter` or :class:`ParquetChunkWriter`
+
+        Returns
+        -------
+        int
+            The number of rows written
+        """
+        n = 0
+        for chunk in self.iterchunks():
+            writer.write_chunk(chunk)
+            n += len(chunk)
+            self.log("... Wrote %d Rows" % (n, ))
+        writer.close()
+        return n
+
+
+def _mass_accuracy(calculated_mass, observed_mass):
+    return (calculated_mass - observed_mass) / observed_mass
+
+
+class GlycopeptideSpectrumMatchColumnarExporter(SQLColumnarExporterBase):
+    """Exports one row per :class:`~.GlycopeptideSpectrumMatch` of an analysis, with the
+    same leading columns as :class:`~.GlycopeptideSpectrumMatchAnalysisCSVSerializer`
+    followed by the match's decoy and best match flags and multi-part scores.
+    """
+
+    @classmethod
+    def column_expressions(cls):
+        gpsm = GlycopeptideSpectrumMatch
+        score_set = GlycopeptideSpectrumMatchScoreSet
+        return OrderedDict([
+            ("glycopeptide", Glycopeptide.glycopeptide_sequence),
+            ("neutral_mass", PrecursorInformation.neutral_mass),
+            ("mass_accuracy", _mass_accuracy(Glycopeptide.calculated_mass, PrecursorInformation.neutral_mass)),
+            ("mass_shift_name", func.coalesce(CompoundMassShift.name, literal("Unmodified"))),
+            ("scan_id", MSScan.scan_id),
+            ("scan_time", MSScan.scan_time),
+            ("charge", PrecursorInformation.charge),
+            ("ms2_score", gpsm.score),
+            ("q_value", gpsm.q_value),
+            ("precursor_abundance", PrecursorInformation.intensity),
+            ("peptide_start", Peptide.start_position),
+            ("peptide_end", Peptide.end_position),
+            ("protein_name", Protein.name),
+            ("is_decoy", gpsm.is_decoy),
+            ("is_best_match", gpsm.is_best_match),
+            ("glycopeptide_score", score_set.glycopeptide_score),
+            ("peptide_score", score_set.peptide_score),
+            ("glycan_score", score_set.glycan_score),
+            ("glycan_coverage", score_set.glycan_coverage),
+            ("total_q_value", score_set.total_q_value),
+            ("peptide_q_value", score_set.peptide_q_value),
+            ("glycan_q_value", score_set.glycan_q_value),
+            ("glycopeptide_q_value", score_set.glycopeptide_q_value),
+        ])
+
+    def select_from(self):
+        gpsm = GlycopeptideSpectrumMatch
+        return gpsm.__table__.join(
+            Glycopeptide.__table__, gpsm.structure_id == Glycopeptide.id).join(
+            Peptide.__table__, Glycopeptide.peptide_id == Peptide.id).join(
+            Protein.__table__, Peptide.protein_id == Protein.id).join(
+            MSScan.__table__, gpsm.scan_id == MSScan.id).outerjoin(
+            PrecursorInformation.__table__, PrecursorInformation.product_id == MSScan.id).outerjoin(
+            CompoundMassShift.__table__, gpsm.mass_shift_id == CompoundMassShift.id).outerjoin(
+            GlycopeptideSpectrumMatchScoreSet.__table__,
+            GlycopeptideSpectrumMatchScoreSet.id == gpsm.id)
+
+    def where(self):
+        return GlycopeptideSpectrumMatch.analysis_id == self.analysis_id
+
+    def build_query(self):
+        query = super(GlycopeptideSpectrumMatchColumnarExporter, self).build_query()
+        return query.order_by(GlycopeptideSpectrumMatch.scan_id)
+
+
+class IdentifiedGlycopeptideColumnarExporter(SQLColumnarExporterBase):
+    """Exports one row per :class:`~.IdentifiedGlycopeptide` of an analysis.
+
+    Only the columns of :class:`~.GlycopeptideLCMSMSAnalysisCSVSerializer` which are stored
+    as database columns are available. The total signal, apex time, charge states and mass
+    shifts are derived from the chromatogram's peaks, and require the object export.
+    """
+
+    @classmethod
+    def column_expressions(cls):
+        idgp = IdentifiedGlycopeptide
+        msms_count = select([func.count(GlycopeptideSpectrumSolutionSet.id)]).where(
+            GlycopeptideSpectrumSolutionSet.cluster_id == idgp.spectrum_cluster_id).as_scalar()
+        return OrderedDict([
+            ("glycopeptide", Glycopeptide.glycopeptide_sequence),
+            ("neutral_mass", Chromatogram.neutral_mass),
+            ("mass_accuracy", _mass_accuracy(Glycopeptide.calculated_mass, Chromatogram.neutral_mass)),
+            ("ms1_score", idgp.ms1_score),
+            ("ms2_score", idgp.ms2_score),
+            ("q_value", idgp.q_value),
+            ("start_time", Chromatogram.start_time),
+            ("end_time", Chromatogram.end_time),
+            ("msms_count", msms_count),
+            ("peptide_start", Peptide.start_position),
+            ("peptide_end", Peptide.end_position),
+            ("protein_name", Protein.name),
+            ("ambiguous_id", idgp.ambiguous_id),
+        ])
+
+    def select_from(self):
+        idgp = IdentifiedGlycopeptide
+        return idgp.__table__.join(
+            Glycopeptide.__table__, idgp.structure_id == Glycopeptide.id).join(
+            Peptide.__table__, Glycopeptide.peptide_id == Peptide.id).join(
+            Protein.__table__, Peptide.protein_id == Protein.id).outerjoin(
+            ChromatogramSolution.__table__, idgp.chromatogram_solution_id == ChromatogramSolution.id).outerjoin(
+            Chromatogram.__table__, ChromatogramSolution.chromatogram_id == Chromatogram.id)
+
+    def where(self):
+        return IdentifiedGlycopeptide.analysis_id == self.analysis_id
+
+    def build_query(self):
+        query = super(IdentifiedGlycopeptideColumnarExporter, self).build_query()
+        return query.order_by(IdentifiedGlycopeptide.id)
+
+
+def make_chunk_writer(format, output_path, exporter, outstream=None):
+    """Create a chunk writer for `exporter`'s columns in one of the formats ``csv``,
+    ``columnar`` or ``parquet``.
+
+    Parameters
+    ----------
+    format : str
+    output_path : str
+        The file or directory to write to. May be :const:`None` for ``csv``
+        if `outstream` is given
+    exporter : :class:`SQLColumnarExporterBase`
+    outstream : file-like, optional
+        A binary stream to write CSV to instead of `output_path`
+
+    Returns
+    -------
+    object
+    """
+    if format == 'csv':
+        if outstream is None:
+            outstream = open(output_path, 'wb')
+        return CSVChunkWriter(outstream, exporter.columns)
+    elif format == 'columnar':
+        return ColumnarDirectoryWriter(output_path, exporter.columns, exporter.column_dtypes())
+    elif format == 'parquet':
+        return ParquetChunkWriter(output_path, exporter.columns)
+    raise ValueError("Unknown export format %r" % (format, ))
@@ -1,9 +1,13 @@
-import urllib
+import os
+import json
+import base64
+import hashlib
 import logging
 
 from io import BytesIO
 
 from six import string_types as basestring
+from six.moves.urllib.parse import quote
 
 from matplotlib.axes import Axes
 from matplotlib import pyplot as plt
@@ -38,10 +42,10 @@ def render_plot(figure, **kwargs):
     if isinstance(figure, Axes):
         figure = figure.get_figure()
     if "height" in kwargs:
-        figure.set_figheight(kwargs["height"])
+        figure.set_figheight(kwargs.pop("height"))
     if "width" in kwargs:
-        figure.set_figwidth(kwargs['width'])
-    if kwargs.get("bbox_inches") != 'tight' or kwargs.get("patchless"):
+        figure.set_figwidth(kwargs.pop('width'))
+    if kwargs.get("bbox_inches") != 'tight' or kwargs.pop("patchless", False):
         figure.patch.set_alpha(0)
         figure.axes[0].patch.set_alpha(0)
     data_buffer = BytesIO()
@@ -62,15 +66,18 @@ def png_plot(figure, img_width=None, img_height=None, xattrs=None, **kwargs):
         xml_attributes['width'] = img_width
     if img_height is not None:
         xml_attributes['height'] = img_height
+    # Options that only apply to SVG output are not accepted by the PNG writer
+    kwargs.pop("svg_width", None)
+    kwargs.pop("xml_transform", None)
     data_buffer = render_plot(figure, format='png', **kwargs)
     return "<img %s src='data:image/png;base64,%s'>" % (
         xmlattrs(**xml_attributes),
-        urllib.quote(data_buffer.getvalue().encode("base64")))
+        quote(base64.b64encode(data_buffer.getvalue()).decode('ascii')))
 
 
 def svguri_plot(figure, **kwargs):
     svg_string = svg_plot(figure, **kwargs)
-    return "<img src='data:image/svg+xml;utf-8,%s'>" % urllib.quote(svg_string)
+    return "<img src='data:image/svg+xml;utf-8,%s'>" % quote(svg_string)
 
 
 def _strip_style(root):
@@ -87,7 +94,7 @@ def svg_plot(figure, svg_width=None, xml_transform=None, **kwargs):
         root.attrib["width"] = svg_width
     if xml_transform is not None:
         root = xml_transform(root)
-    return etree.tostring(root)
+    return etree.tostring(root, encoding='unicode')
 
 
 def rgbpack(color):
@@ -178,6 +185,110 @@ def n_per_row(sequence, n=60):
     return '<br>'.join(row_buffer)
 
 
+class RenderedFragmentCache(object):
+    """An on-disk cache of rendered report fragments, keyed by a hash of the content
+    they were rendered from, so that regenerating a report only renders figures whose
+    inputs have changed.
+
+    Entries are JSON-serializable values stored one per file under :attr:`directory`.
+    When :attr:`directory` is :const:`None`, nothing is cached.
+
+    Attributes
+    ----------
+    directory : str
+        The directory entries are stored in
+    hits : int
+        The number of lookups served from the cache
+    misses : int
+        The number of lookups which had to be rendered
+    """
+    version = 1
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        if directory is not None and not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Another worker may have created it first
+                if not os.path.isdir(directory):
+                    raise
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    def key(self, kind, *parts):
+        """Build the key for a fragment of type `kind` rendered from `parts`.
+
+        Parameters
+        ----------
+        kind : str
+            The kind of fragment, so that different figures of the same
+            content do not collide
+        *parts
+            Values whose :func:`repr` identifies the rendered content
+
+        Returns
+        -------
+        str
+        """
+        hasher = hashlib.sha1()
+        hasher.update(("%d:%s:%r" % (self.version, kind, parts)).encode('utf8'))
+        return "%s-%s" % (kind, hasher.hexdigest())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(key), 'rb') as handle:
+                return json.loads(handle.read().decode('utf8'))
+        except (IOError, OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        # Write to a file private to this process and rename it so concurrent
+        # workers never read a partially written entry
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temp_path, 'wb') as handle:
+            handle.write(json.dumps(value).encode('utf8'))
+        try:
+            os.rename(temp_path, path)
+        except OSError:
+            os.remove(temp_path)
+
+    def fetch(self, key, render):
+        """Get the fragment stored under `key`, calling `render` to create and
+        store it if it is not present.
+
+        Parameters
+        ----------
+        key : str
+        render : callable
+            Called with no arguments, returning a JSON-serializable value
+
+        Returns
+        -------
+        object
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = render()
+        self.put(key, value)
+        return value
+
+
 class ReportCreatorBase(TaskBase):
     def __init__(self, database_connection, analysis_id, stream=None):
         self.database_connection = DatabaseBoundOperation(database_connection)
@@ -1,5 +1,7 @@
 import os
+import hashlib
 import textwrap
+import multiprocessing
 
 from collections import OrderedDict
 
@@ -24,7 +26,7 @@ from glycan_profiling.tandem.glycopeptide.scoring import CoverageWeightedBinomia
 from glycan_profiling.plotting.entity_bar_chart import (
     AggregatedAbundanceArtist, BundledGlycanComposition)
 from glycan_profiling.output.report.base import (
-    svguri_plot, png_plot, ReportCreatorBase)
+    svguri_plot, png_plot, ReportCreatorBase, RenderedFragmentCache)
 
 from ms_deisotope.output.mzml import ProcessedMzMLDeserializer
 
@@ -49,30 +51,40 @@ def scale_fix_xml_transform(root):
 
 
 class IdentifiedGlycopeptideDescriberBase(object):
-    def __init__(self, database_path, analysis_id, mzml_path=None):
+    def __init__(self, database_path, analysis_id, mzml_path=None, cache_directory=None):
         self.database_connection = DatabaseBoundOperation(database_path)
         self.analysis_id = analysis_id
         self.analysis = self.session.query(serialize.Analysis).get(self.analysis_id)
         self.mzml_path = mzml_path
         self.scan_loader = None
+        self.figure_cache = RenderedFragmentCache(cache_directory)
         self._make_scan_loader()
 
-    def spectrum_match_info(self, glycopeptide):
-        spectrum_match_ref = glycopeptide.best_spectrum_match
-        scan_id = spectrum_match_ref.scan.scan_id
-        scan = self.scan_loader.get_scan_by_id(scan_id)
+    def _mzml_identity(self):
+        try:
+            stat = os.stat(self.mzml_path)
+            return (os.path.abspath(self.mzml_path), stat.st_size, stat.st_mtime)
+        except (OSError, TypeError):
+            return (self.mzml_path, )
+
+    def _mass_shift_for(self, spectrum_match_ref):
         try:
             mass_shift = spectrum_match_ref.mass_shift
         except Exception:
             mass_shift = Unmodified
+        if mass_shift is None:
+            mass_shift = Unmodified
         if mass_shift.name != Unmodified.name:
             mass_shift = mass_shift.convert()
         else:
             mass_shift = Unmodified
+        return mass_shift
 
+    def render_spectrum_match(self, scan_id, structure, mass_shift):
+        scan = self.scan_loader.get_scan_by_id(scan_id)
         match = CoverageWeightedBinomialScorer.evaluate(
             scan,
-            glycopeptide.structure.convert(),
+            structure,
             error_tolerance=self.analysis.parameters["fragment_error_tolerance"],
             mass_shift=mass_shift)
         specmatch_artist = TidySpectrumMatchAnnotator(match, ax=figax())
@@ -110,7 +122,62 @@ class IdentifiedGlycopeptideDescriberBase(object):
         return dict(
             spectrum_plot=spectrum_plot, logo_plot=logo_plot,
             precursor_mass_accuracy=match.precursor_mass_accuracy(),
-            spectrum_match=match)
+            scan_time=scan.scan_time)
+
+    def spectrum_match_info(self, glycopeptide):
+        """Render the annotated best spectrum match and the chromatogram of `glycopeptide`.
+
+        Each figure is looked up in :attr:`figure_cache` by the content it depends on
+        before it is rendered.
+
+        Parameters
+        ----------
+        glycopeptide : :class:`~.serialize.IdentifiedGlycopeptide`
+
+        Returns
+        -------
+        dict
+            The rendered fragments and match summary values, all picklable so the
+            description can be returned from a worker process
+        """
+        spectrum_match_ref = glycopeptide.best_spectrum_match
+        scan_id = spectrum_match_ref.scan.scan_id
+        mass_shift = self._mass_shift_for(spectrum_match_ref)
+        structure = glycopeptide.structure.convert()
+        key = self.figure_cache.key(
+            "spectrum-match", self._mzml_identity(), scan_id, str(structure), mass_shift.name,
+            self.analysis.parameters["fragment_error_tolerance"])
+        info = dict(self.figure_cache.fetch(
+            key, lambda: self.render_spectrum_match(scan_id, structure, mass_shift)))
+        info['scan_id'] = scan_id
+        info['mass_shift_name'] = mass_shift.name
+        info['chromatogram_plot'] = self.cached_chromatogram_plot(glycopeptide)
+        return info
+
+    def chromatogram_plot(self, glycopeptide):
+        ax = figax()
+        try:
+            SmoothingChromatogramArtist(
+                glycopeptide, ax=ax, label_peaks=False,
+                colorizer=lambda x: "#48afd0").draw(legend=False)
+            ax.set_xlabel("Time (Minutes)", fontsize=16)
+            ax.set_ylabel("Relative Abundance", fontsize=16)
+            return png_plot(ax, bbox_inches='tight', img_height='100%')
+        except ValueError:
+            return "<div style='text-align:center;'>No Chromatogram Found</div>"
+
+    def cached_chromatogram_plot(self, glycopeptide):
+        signature = None
+        if glycopeptide.chromatogram is not None:
+            try:
+                time, intensity = glycopeptide.chromatogram.as_arrays()
+                signature = hashlib.sha1(
+                    time.tobytes() + b":" + intensity.tobytes()).hexdigest()
+            except (ValueError, IndexError):
+                # An empty or missing chromatogram is rendered as a placeholder
+                pass
+        key = self.figure_cache.key("chromatogram", str(glycopeptide.structure), signature)
+        return self.figure_cache.fetch(key, lambda: self.chromatogram_plot(glycopeptide))
 
     def _make_scan_loader(self):
         if self.mzml_path is not None:
@@ -130,18 +197,48 @@ class IdentifiedGlycopeptideDescriberBase(object):
 
 class IdentifiedGlycopeptideDescriberWorker(IdentifiedGlycopeptideDescriberBase):
 
+    @property
+    def session(self):
+        return self.database_connection.session
+
     def __call__(self, glycopeptide_id):
         glycopeptide = self._glycopeptide_from_id(glycopeptide_id)
-        return self.spectrum_match_info(glycopeptide)
+        info = self.spectrum_match_info(glycopeptide)
+        # Release the loaded rows so a long-running worker does not accumulate them
+        self.session.expunge_all()
+        return glycopeptide_id, info
 
     def _glycopeptide_from_id(self, glycopeptide_id):
         return self.database_connection.query(
             IdentifiedGlycopeptide).get(glycopeptide_id)
 
 
+_worker_describer = None
+
+
+def _initialize_describer(database_path, analysis_id, mzml_path, cache_directory):
+    global _worker_describer
+    _worker_describer = IdentifiedGlycopeptideDescriberWorker(
+        database_path, analysis_id, mzml_path, cache_directory)
+
+
+def _describe_in_worker(glycopeptide_id):
+    return _worker_describer(glycopeptide_id)
+
+
 class GlycopeptideDatabaseSearchReportCreator(ReportCreatorBase, IdentifiedGlycopeptideDescriberBase):
+    """Renders an HTML report of the glycopeptides identified by an analysis.
+
+    The spectrum match and chromatogram figures of each glycopeptide are rendered
+    by a pool of :attr:`n_processes` :class:`IdentifiedGlycopeptideDescriberWorker`
+    processes ahead of the template reaching them, and are collected by glycopeptide
+    id. When :attr:`cache_directory` is set, every rendered figure is stored there
+    keyed by a hash of its content, so regenerating the report, for instance with a
+    different threshold, only renders figures it has not seen before.
+    """
+
     def __init__(self, database_path, analysis_id, stream=None, threshold=5,
-                 mzml_path=None):
+                 mzml_path=None, n_processes=1, cache_directory=None):
         super(GlycopeptideDatabaseSearchReportCreator, self).__init__(
             database_path, analysis_id, stream)
         self.set_template_loader(os.path.dirname(__file__))
@@ -149,16 +246,72 @@ class GlycopeptideDatabaseSearchReportCreator(ReportCreatorBase, IdentifiedGlyco
         self.scan_loader = None
         self.threshold = threshold
         self.use_dynamic_display_mode = 0
+        self.n_processes = n_processes
+        self.cache_directory = cache_directory
+        self.figure_cache = RenderedFragmentCache(cache_directory)
         self.analysis = self.session.query(serialize.Analysis).get(self.analysis_id)
         self._resolve_hypothesis_id()
         self._build_protein_index()
         self._make_scan_loader()
         self._glycopeptide_counter = 0
+        self._worker_pool = None
+        self._pending_descriptions = None
+        self._descriptions = {}
         if len(self.protein_index) > 10:
             self.use_dynamic_display_mode = 1
 
     def _spawn(self):
-        return IdentifiedGlycopeptideDescriberWorker(self.database_connection, self.analysis_id, self.mzml_path)
+        return IdentifiedGlycopeptideDescriberWorker(
+            self.database_connection._original_connection, self.analysis_id, self.mzml_path,
+            self.cache_directory)
+
+    def _identified_glycopeptide_ids(self):
+        query = self.session.query(IdentifiedGlycopeptide.id).join(Glycopeptide).filter(
+            IdentifiedGlycopeptide.analysis_id == self.analysis_id,
+            Glycopeptide.hypothesis_id == self.hypothesis_id,
+            IdentifiedGlycopeptide.ms2_score > self.threshold).order_by(
+            Glycopeptide.protein_id, IdentifiedGlycopeptide.id)
+        return [i for i, in query]
+
+    def start_workers(self):
+        """Start rendering the figures of every reported glycopeptide in a pool of
+        worker processes, if more than one process was requested.
+        """
+        if self.n_processes <= 1:
+            return
+        glycopeptide_ids = self._identified_glycopeptide_ids()
+        if len(glycopeptide_ids) < 2:
+            return
+        self.status_update("Rendering %d Glycopeptides With %d Processes" % (
+            len(glycopeptide_ids), self.n_processes))
+        self._worker_pool = multiprocessing.Pool(
+            self.n_processes, _initialize_describer, (
+                self.database_connection._original_connection, self.analysis_id,
+                self.mzml_path, self.cache_directory))
+        self._pending_descriptions = self._worker_pool.imap_unordered(
+            _describe_in_worker, glycopeptide_ids, 4)
+
+    def stop_workers(self):
+        if self._worker_pool is not None:
+            self._worker_pool.terminate()
+            self._worker_pool.join()
+            self._worker_pool = None
+        self._pending_descriptions = None
+        self._descriptions.clear()
+
+    def spectrum_match_info(self, glycopeptide):
+        if self._pending_descriptions is not None:
+            # Collect finished descriptions until this glycopeptide's has arrived
+            while glycopeptide.id not in self._descriptions:
+                try:
+                    glycopeptide_id, info = next(self._pending_descriptions)
+                except StopIteration:
+                    break
+                self._descriptions[glycopeptide_id] = info
+            info = self._descriptions.pop(glycopeptide.id, None)
+            if info is not None:
+                return info
+        return super(GlycopeptideDatabaseSearchReportCreator, self).spectrum_match_info(glycopeptide)
 
     def _resolve_hypothesis_id(self):
         self.hypothesis_id = self.analysis.hypothesis_id
@@ -216,7 +369,23 @@ class GlycopeptideDatabaseSearchReportCreator(ReportCreatorBase, IdentifiedGlyco
                     protein.name, i, n, (i / n * 100)))
             yield i, glycoprotein
 
+    def _glycoprotein_signature(self, glycoprotein):
+        return (glycoprotein.name, tuple(sorted(
+            (str(gp.structure), gp.ms2_score, gp.q_value, gp.total_signal)
+            for gp in glycoprotein.identified_glycopeptides)))
+
     def site_specific_abundance_plots(self, glycoprotein):
+        key = self.figure_cache.key("site-abundance", self._glycoprotein_signature(glycoprotein))
+        glycosylation_types = {
+            glyco_type.name: glyco_type for glyco_type in glycoprotein.glycosylation_types}
+        rendered = self.figure_cache.fetch(key, lambda: [
+            [site, glyco_type.name, plot]
+            for (site, glyco_type), plot in self._render_site_specific_abundance_plots(
+                glycoprotein).items()])
+        return OrderedDict(
+            ((site, glycosylation_types[glyco_type]), plot) for site, glyco_type, plot in rendered)
+
+    def _render_site_specific_abundance_plots(self, glycoprotein):
         axes = OrderedDict()
         for glyco_type in glycoprotein.glycosylation_types:
             for site in sorted(glycoprotein.glycosylation_sites_for(glyco_type)):
@@ -234,24 +403,18 @@ class GlycopeptideDatabaseSearchReportCreator(ReportCreatorBase, IdentifiedGlyco
         return axes
 
     def draw_glycoforms(self, glycoprotein):
+        key = self.figure_cache.key("glycoforms", self._glycoprotein_signature(glycoprotein))
+        return self.figure_cache.fetch(key, lambda: self._render_glycoforms(glycoprotein))
+
+    def _render_glycoforms(self, glycoprotein):
         ax = figax()
         layout = GlycoformLayout(glycoprotein, glycoprotein.identified_glycopeptides, ax=ax)
         layout.draw()
         svg = layout.to_svg(scale=2.0, height_padding_scale=1.1)
+        if isinstance(svg, bytes):
+            svg = svg.decode('utf8')
         return svg
 
-    def chromatogram_plot(self, glycopeptide):
-        ax = figax()
-        try:
-            SmoothingChromatogramArtist(
-                glycopeptide, ax=ax, label_peaks=False,
-                colorizer=lambda x: "#48afd0").draw(legend=False)
-            ax.set_xlabel("Time (Minutes)", fontsize=16)
-            ax.set_ylabel("Relative Abundance", fontsize=16)
-            return png_plot(ax, bbox_inches='tight', img_height='100%')
-        except ValueError:
-            return "<div style='text-align:center;'>No Chromatogram Found</div>"
-
     def track_entry(self, glycopeptide):
         self._glycopeptide_counter += 1
         if self._glycopeptide_counter % 15 == 0:
@@ -280,3 +443,13 @@ class GlycopeptideDatabaseSearchReportCreator(ReportCreatorBase, IdentifiedGlyco
             use_dynamic_display_mode=self.use_dynamic_display_mode)
 
         return template_stream
+
+    def run(self):
+        self.start_workers()
+        try:
+            super(GlycopeptideDatabaseSearchReportCreator, self).run()
+        finally:
+            self.stop_workers()
+        if self.figure_cache.enabled:
+            self.status_update("Figure Cache: %d Reused, %d Rendered" % (
+                self.figure_cache.hits, self.figure_cache.misses))
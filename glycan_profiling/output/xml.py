@@ -2,6 +2,8 @@ import os
 import re
 import bisect
 
+from itertools import chain
+
 from collections import defaultdict, OrderedDict, namedtuple, deque
 
 from brainpy import mass_charge_ratio
@@ -365,11 +367,15 @@ class MzMLExporter(task.TaskBase):
         for chromatogram, members in by_chromatogram.items():
             if chromatogram is None:
                 continue
-            self.enqueue_chromatogram(chromatogram, i, params=[
-                {"name": "GlycReSoft:profile score", "value": members[0].ms1_score},
-                {"name": "GlycReSoft:assigned entity", "value": str(members[0].structure)}
-            ])
+            self.enqueue_identified_chromatogram(chromatogram, i, members)
             i += 1
+        return i
+
+    def enqueue_identified_chromatogram(self, chromatogram, chromatogram_id, members):
+        self.enqueue_chromatogram(chromatogram, chromatogram_id, params=[
+            {"name": "GlycReSoft:profile score", "value": members[0].ms1_score},
+            {"name": "GlycReSoft:assigned entity", "value": str(members[0].structure)}
+        ])
 
     def enqueue_chromatogram(self, chromatogram, chromatogram_id, params=None):
         if params is None:
@@ -431,10 +437,15 @@ def glycosylation_type_to_term(glycosylation_type):
 
 
 class MzIdentMLSerializer(task.TaskBase):
+    spectrum_identification_list_id = 1
+
     def __init__(self, outfile, glycopeptide_list, analysis, database_handle,
                  q_value_threshold=0.05, ms2_score_threshold=0,
                  export_mzml=True, source_mzml_path=None,
-                 output_mzml_path=None, embed_protein_sequences=True):
+                 output_mzml_path=None, embed_protein_sequences=True,
+                 gnome_resolver=None):
+        if gnome_resolver is None:
+            gnome_resolver = GNOmeResolver()
         self.outfile = outfile
         self.database_handle = database_handle
         self._glycopeptide_list = glycopeptide_list
@@ -448,7 +459,7 @@ class MzIdentMLSerializer(task.TaskBase):
         self.source_mzml_path = source_mzml_path
         self.output_mzml_path = output_mzml_path
         self.embed_protein_sequences = embed_protein_sequences
-        self.gnome_resolver = GNOmeResolver()
+        self.gnome_resolver = gnome_resolver
 
     @property
     def glycopeptide_list(self):
@@ -598,7 +609,7 @@ class MzIdentMLSerializer(task.TaskBase):
                     spectrum_identifications.append(d)
         self.scan_ids = seen_scans
         self._spectrum_identification_list = {
-            "id": 1,
+            "id": self.spectrum_identification_list_id,
             "identification_results": spectrum_identifications
         }
 
@@ -711,21 +722,32 @@ class MzIdentMLSerializer(task.TaskBase):
         spec['additional_search_params'] = [components.CVParam(**x) for x in spec['additional_search_params']]
         return spec
 
-    def run(self):
-        f = MzIdentMLWriter(self.outfile, vocabularies=[
-            components.CV(
-                id='GNO', uri="http://purl.obolibrary.org/obo/gno.obo", full_name='GNO'),
-        ])
-        self.log("Loading Spectra Data")
-        spectra_data = self.spectra_data()
-        self.log("Loading Search Database")
-        search_database = self.search_database()
-        self.log("Building Protocol")
-        protocol = self.protocol()
-        source_file = self.source_file()
+    def write_sequence_collection(self, f):
+        for prot in self._proteins:
+            f.write_db_sequence(**prot)
+        for pep in self._peptides:
+            f.write_peptide(**pep)
+        for pe in self._peptide_evidence:
+            f.write_peptide_evidence(**pe)
+
+    def write_spectrum_identification_results(self, f):
+        for result_ in self._spectrum_identification_list['identification_results']:
+            result = dict(result_)
+            identifications = result.pop("identifications")
+            result = f.spectrum_identification_result(**result)
+            with result:
+                for item in identifications:
+                    f.write_spectrum_identification_item(**item)
+
+    def extract_chromatograms(self, exporter):
+        exporter.extract_chromatograms_from_identified_glycopeptides(
+            self.glycopeptide_list)
+
+    def prepare(self):
         self.extract_peptides()
         self.extract_spectrum_identifications()
 
+    def export_spectra(self, spectra_data):
         had_specified_mzml_path = self.source_mzml_path is None
         if self.source_mzml_path is None:
             self.source_mzml_path = spectra_data['location']
@@ -753,12 +775,25 @@ class MzIdentMLSerializer(task.TaskBase):
                 self.log("... Exporting Spectra")
                 exporter.begin(scan_bunches)
                 self.log("... Exporting Chromatograms")
-                exporter.extract_chromatograms_from_identified_glycopeptides(
-                    self.glycopeptide_list)
+                self.extract_chromatograms(exporter)
                 self.log("... Finalizing mzML")
                 exporter.complete()
             self.log("mzML Export Finished")
 
+    def run(self):
+        f = MzIdentMLWriter(self.outfile, vocabularies=[
+            components.CV(
+                id='GNO', uri="http://purl.obolibrary.org/obo/gno.obo", full_name='GNO'),
+        ])
+        self.log("Loading Spectra Data")
+        spectra_data = self.spectra_data()
+        self.log("Loading Search Database")
+        search_database = self.search_database()
+        self.log("Building Protocol")
+        protocol = self.protocol()
+        source_file = self.source_file()
+        self.prepare()
+
         analysis = [[spectra_data['id']], [search_database['id']]]
 
         with f:
@@ -767,15 +802,10 @@ class MzIdentMLSerializer(task.TaskBase):
 
             f.register("SpectraData", spectra_data['id'])
             f.register("SearchDatabase", search_database['id'])
-            f.register("SpectrumIdentificationList", self._spectrum_identification_list['id'])
+            f.register("SpectrumIdentificationList", self.spectrum_identification_list_id)
 
             with f.sequence_collection():
-                for prot in self._proteins:
-                    f.write_db_sequence(**prot)
-                for pep in self._peptides:
-                    f.write_peptide(**pep)
-                for pe in self._peptide_evidence:
-                    f.write_peptide_evidence(**pe)
+                self.write_sequence_collection(f)
 
             with f.analysis_protocol_collection():
                 f.spectrum_identification_protocol(**protocol)
@@ -786,13 +816,176 @@ class MzIdentMLSerializer(task.TaskBase):
             with f.element("DataCollection"):
                 f.inputs(source_file, search_database, spectra_data)
                 with f.element("AnalysisData"):
-                    with f.spectrum_identification_list(id=self._spectrum_identification_list['id']):
-                        for result_ in self._spectrum_identification_list['identification_results']:
-                            result = dict(result_)
-                            identifications = result.pop("identifications")
-                            result = f.spectrum_identification_result(**result)
-                            with result:
-                                for item in identifications:
-                                    f.write_spectrum_identification_item(**item)
+                    with f.spectrum_identification_list(id=self.spectrum_identification_list_id):
+                        self.write_spectrum_identification_results(f)
 
         f.outfile.close()
+
+        # The spectra to export are only known once the spectrum identifications
+        # have been extracted, which the streaming serializer does while writing
+        self.export_spectra(spectra_data)
+
+
+def _chunked(sequence, chunk_size):
+    for i in range(0, len(sequence), chunk_size):
+        yield sequence[i:i + chunk_size]
+
+
+class StreamingMzIdentMLSerializer(MzIdentMLSerializer):
+    """An :class:`MzIdentMLSerializer` which does not hold the identified glycopeptides
+    or their spectrum matches in memory.
+
+    A pre-pass collects only the ids of the accepted structures, proteins, clusters
+    and solution sets with set-based queries. Each section is then written while
+    its rows are loaded from the database in chunks of :attr:`chunk_size`, so memory
+    use is bounded by the chunk size rather than by the size of the analysis.
+
+    Attributes
+    ----------
+    chunk_size : int
+        The number of rows to load from the database at a time
+    """
+
+    def __init__(self, outfile, analysis, database_handle,
+                 q_value_threshold=0.05, ms2_score_threshold=0,
+                 export_mzml=True, source_mzml_path=None,
+                 output_mzml_path=None, embed_protein_sequences=True,
+                 gnome_resolver=None, chunk_size=500):
+        super(StreamingMzIdentMLSerializer, self).__init__(
+            outfile, None, analysis, database_handle,
+            q_value_threshold=q_value_threshold,
+            ms2_score_threshold=ms2_score_threshold,
+            export_mzml=export_mzml, source_mzml_path=source_mzml_path,
+            output_mzml_path=output_mzml_path,
+            embed_protein_sequences=embed_protein_sequences,
+            gnome_resolver=gnome_resolver)
+        self.chunk_size = chunk_size
+        self.analysis_id = analysis.id
+        self.structure_ids = []
+        self.peptide_ids = []
+        self.protein_ids = []
+        self.solution_set_ids = []
+
+    @property
+    def glycopeptide_list(self):
+        raise TypeError("%s does not load the identified glycopeptide list" % (
+            self.__class__.__name__, ))
+
+    @property
+    def session(self):
+        return self.database_handle.session
+
+    def _load_chunks(self, model, ids):
+        for chunk in _chunked(ids, self.chunk_size):
+            by_id = {
+                inst.id: inst for inst in self.session.query(model).filter(model.id.in_(chunk))
+            }
+            yield [by_id[i] for i in chunk]
+
+    def collect_references(self):
+        """Collect the ids of every entity that will be written, without loading the
+        entities themselves.
+        """
+        session = self.session
+        identified = serialize.IdentifiedGlycopeptide
+        glycopeptide = serialize.Glycopeptide
+        solution_set = serialize.GlycopeptideSpectrumSolutionSet
+
+        self.log("Collecting References")
+        sequence_rows = session.query(
+            glycopeptide.id, glycopeptide.glycopeptide_sequence, glycopeptide.protein_id).join(
+            identified, identified.structure_id == glycopeptide.id).filter(
+            identified.analysis_id == self.analysis_id).order_by(identified.id)
+        structure_ids = []
+        seen_structures = set()
+        protein_ids = set()
+        for structure_id, sequence, protein_id in sequence_rows:
+            if structure_id in seen_structures:
+                continue
+            seen_structures.add(structure_id)
+            structure_ids.append(structure_id)
+            protein_ids.add(protein_id)
+            # Matches SequenceIdTracker.convert, which maps each sequence to the first
+            # structure seen with it
+            self._id_tracker.mapping.setdefault(sequence, structure_id)
+        self.structure_ids = structure_ids
+        peptide_ids = set(self._id_tracker.mapping.values())
+        self.peptide_ids = [i for i in structure_ids if i in peptide_ids]
+        self.protein_ids = sorted(protein_ids)
+
+        cluster_ids = session.query(identified.spectrum_cluster_id).filter(
+            identified.analysis_id == self.analysis_id)
+        solution_set_rows = session.query(solution_set.id, solution_set.scan_id).filter(
+            solution_set.cluster_id.in_(cluster_ids)).order_by(
+            solution_set.scan_id, solution_set.id)
+        solution_set_ids = []
+        seen_scans = set()
+        for solution_set_id, scan_id in solution_set_rows:
+            if scan_id in seen_scans:
+                continue
+            seen_scans.add(scan_id)
+            solution_set_ids.append(solution_set_id)
+        self.solution_set_ids = solution_set_ids
+        self.log("... %d Structures, %d Proteins, %d Spectra" % (
+            len(self.structure_ids), len(self.protein_ids), len(self.solution_set_ids)))
+
+    def prepare(self):
+        self.collect_references()
+
+    def write_sequence_collection(self, f):
+        self.log("Writing Proteins")
+        for chunk in self._load_chunks(serialize.Protein, self.protein_ids):
+            for prot in chunk:
+                f.write_db_sequence(**convert_to_protein_dict(prot, self.embed_protein_sequences))
+        self.log("Writing Peptides")
+        for chunk in self._load_chunks(serialize.Glycopeptide, self.peptide_ids):
+            for gp in chunk:
+                f.write_peptide(**self.convert_to_peptide_dict(gp, self._id_tracker))
+        self.log("Writing PeptideEvidence")
+        for chunk in self._load_chunks(serialize.Glycopeptide, self.structure_ids):
+            for gp in chunk:
+                f.write_peptide_evidence(**convert_to_peptide_evidence_dict(gp, self._id_tracker))
+
+    def write_spectrum_identification_results(self, f):
+        self.log("Writing SpectrumIdentificationResults")
+        accepted_solution_ids = set(self.structure_ids)
+        scan_ids = set()
+        n = 0
+        for chunk in self._load_chunks(serialize.GlycopeptideSpectrumSolutionSet, self.solution_set_ids):
+            for solution in chunk:
+                if solution.best_solution().q_value > self.q_value_threshold:
+                    continue
+                if solution.score < self.ms2_score_threshold:
+                    continue
+                result = convert_to_spectrum_identification_dict(
+                    solution, seen=accepted_solution_ids,
+                    id_tracker=self._id_tracker)
+                identifications = result.pop("identifications")
+                if not identifications:
+                    continue
+                scan_ids.add(result['spectrum_id'])
+                with f.spectrum_identification_result(**result):
+                    for item in identifications:
+                        f.write_spectrum_identification_item(**item)
+                n += 1
+            self.log("... Wrote %d SpectrumIdentificationResults" % (n, ))
+        self.scan_ids = scan_ids
+
+    def extract_chromatograms(self, exporter):
+        identified = serialize.IdentifiedGlycopeptide
+        rows = self.session.query(identified.id, identified.chromatogram_solution_id).filter(
+            identified.analysis_id == self.analysis_id,
+            identified.chromatogram_solution_id != None).order_by(  # noqa: E711
+            identified.chromatogram_solution_id, identified.id)
+        groups = OrderedDict()
+        for identified_id, chromatogram_solution_id in rows:
+            groups.setdefault(chromatogram_solution_id, []).append(identified_id)
+        chromatogram_id = 0
+        for chunk in _chunked(list(groups.values()), self.chunk_size):
+            members = chain.from_iterable(
+                self._load_chunks(identified, [i for group in chunk for i in group]))
+            for group in chunk:
+                group_members = [next(members) for _ in group]
+                exporter.enqueue_identified_chromatogram(
+                    group_members[0].chromatogram.chromatogram, chromatogram_id, group_members)
+                chromatogram_id += 1
@@ -26,12 +26,14 @@ from glycopeptidepy.utils.collectiontools import descending_combination_counter
 
 from glycan_profiling.database.disk_backed_database import (
     GlycanCompositionDiskBackedStructureDatabase,
-    GlycopeptideDiskBackedStructureDatabase)
+    GlycopeptideDiskBackedStructureDatabase,
+    ImplicitGlycopeptideDiskBackedStructureDatabase)
 
 from glycan_profiling.database.analysis import (
     GlycanCompositionChromatogramAnalysisSerializer,
     DynamicGlycopeptideMSMSAnalysisSerializer,
-    GlycopeptideMSMSAnalysisSerializer)
+    GlycopeptideMSMSAnalysisSerializer,
+    ImplicitGlycopeptideMSMSAnalysisSerializer)
 
 from glycan_profiling.serialize import (
     DatabaseScanDeserializer, AnalysisSerializer,
@@ -63,6 +65,7 @@ from glycan_profiling.structure.structure_loader import (
 from glycan_profiling.tandem import chromatogram_mapping
 from glycan_profiling.tandem.target_decoy import TargetDecoySet
 from glycan_profiling.tandem.temp_store import TempFileManager
+from glycan_profiling.tandem.oxonium_index import OxoniumIndex, OxoniumTriage
 
 from glycan_profiling.tandem.spectrum_match.solution_set import QValueRetentionStrategy
 
@@ -693,7 +696,7 @@ class GlycopeptideLCMSMSAnalyzer(TaskBase):
                  oxonium_threshold=0.05, scan_transformer=None, mass_shifts=None, n_processes=5,
                  spectrum_batch_size=1000, use_peptide_mass_filter=False, maximum_mass=float('inf'),
                  probing_range_for_missing_precursors=3, trust_precursor_fits=True,
-                 permute_decoy_glycans=False, rare_signatures=False):
+                 permute_decoy_glycans=False, rare_signatures=False, oxonium_triage_threshold=None):
         if tandem_scoring_model is None:
             tandem_scoring_model = CoverageWeightedBinomialScorer
         if peak_shape_scoring_model is None:
@@ -733,14 +736,21 @@ class GlycopeptideLCMSMSAnalyzer(TaskBase):
         self.fdr_estimator = None
         self.permute_decoy_glycans = permute_decoy_glycans
         self.rare_signatures = rare_signatures
+        self.oxonium_triage_threshold = oxonium_triage_threshold
 
     def make_peak_loader(self):
         peak_loader = DatabaseScanDeserializer(
             self.database_connection, sample_run_id=self.sample_run_id)
         return peak_loader
 
+    def _make_glycopeptide_database(self, connection, hypothesis_id):
+        database = GlycopeptideDiskBackedStructureDatabase(connection, hypothesis_id)
+        if ImplicitGlycopeptideDiskBackedStructureDatabase.is_implicit(database.hypothesis):
+            database = ImplicitGlycopeptideDiskBackedStructureDatabase(connection, hypothesis_id)
+        return database
+
     def make_database(self):
-        database = GlycopeptideDiskBackedStructureDatabase(
+        database = self._make_glycopeptide_database(
             self.database_connection, self.hypothesis_id)
         return database
 
@@ -778,6 +788,32 @@ class GlycopeptideLCMSMSAnalyzer(TaskBase):
         msms_scans = [o.product for o in prec_info if o.neutral_mass is not None]
         return msms_scans
 
+    def load_oxonium_index(self, peak_loader):
+        return None
+
+    def triage_msms(self, msms_scans, peak_loader):
+        """Remove MS/MS scans whose oxonium ion ratio is below :attr:`oxonium_triage_threshold`
+        before any are mapped to structures, if an :class:`~.OxoniumIndex` is available.
+
+        Parameters
+        ----------
+        msms_scans : list
+        peak_loader : :class:`~.RandomAccessScanSource`
+
+        Returns
+        -------
+        list
+        """
+        if self.oxonium_triage_threshold is None:
+            return msms_scans
+        oxonium_index = self.load_oxonium_index(peak_loader)
+        if oxonium_index is None:
+            self.log("No oxonium ion index is available, skipping oxonium triage")
+            return msms_scans
+        triage = OxoniumTriage(oxonium_index, self.oxonium_triage_threshold)
+        kept, _rejected = triage.triage(msms_scans)
+        return kept
+
     def make_search_engine(self, msms_scans, database, peak_loader):
         searcher = GlycopeptideDatabaseSearchIdentifier(
             [scan for scan in msms_scans
@@ -923,6 +959,7 @@ class GlycopeptideLCMSMSAnalyzer(TaskBase):
         self.log("Loading MS/MS")
 
         msms_scans = self.load_msms(peak_loader)
+        msms_scans = self.triage_msms(msms_scans, peak_loader)
 
         # Traditional LC-MS/MS Database Search
         searcher = self.make_search_engine(msms_scans, database, peak_loader)
@@ -1025,7 +1062,8 @@ class MzMLGlycopeptideLCMSMSAnalyzer(GlycopeptideLCMSMSAnalyzer):
                  oxonium_threshold=0.05, scan_transformer=None, mass_shifts=None,
                  n_processes=5, spectrum_batch_size=1000, use_peptide_mass_filter=False,
                  maximum_mass=float('inf'), probing_range_for_missing_precursors=3,
-                 trust_precursor_fits=True, permute_decoy_glycans=False, rare_signatures=False):
+                 trust_precursor_fits=True, permute_decoy_glycans=False, rare_signatures=False,
+                 oxonium_triage_threshold=None):
         super(MzMLGlycopeptideLCMSMSAnalyzer, self).__init__(
             database_connection,
             hypothesis_id, -1,
@@ -1038,7 +1076,7 @@ class MzMLGlycopeptideLCMSMSAnalyzer(GlycopeptideLCMSMSAnalyzer):
             use_peptide_mass_filter, maximum_mass,
             probing_range_for_missing_precursors=probing_range_for_missing_precursors,
             trust_precursor_fits=trust_precursor_fits, permute_decoy_glycans=permute_decoy_glycans,
-            rare_signatures=rare_signatures)
+            rare_signatures=rare_signatures, oxonium_triage_threshold=oxonium_triage_threshold)
         self.sample_path = sample_path
         self.output_path = output_path
 
@@ -1059,6 +1097,21 @@ class MzMLGlycopeptideLCMSMSAnalyzer(GlycopeptideLCMSMSAnalyzer):
         msms_scans = [ScanStub(o, peak_loader) for o in prec_info if o.neutral_mass is not None]
         return msms_scans
 
+    def load_oxonium_index(self, peak_loader):
+        oxonium_index = OxoniumIndex.for_file(self.sample_path)
+        if oxonium_index is not None:
+            return oxonium_index
+        self.log("Oxonium ion index missing. Rebuilding.")
+        # Use a separate reader so the shared reader's iterator is left untouched
+        reader = ProcessedMzMLDeserializer(self.sample_path)
+        reader.make_iterator(grouped=False)
+        oxonium_index = OxoniumIndex.build(reader, error_tolerance=self.msn_mass_error_tolerance)
+        try:
+            oxonium_index.save(OxoniumIndex.index_file_name(self.sample_path))
+        except (IOError, OSError) as e:
+            self.log("Could not save the oxonium ion index: %r" % (e, ))
+        return oxonium_index
+
     def _build_analysis_saved_parameters(self, identified_glycopeptides, unassigned_chromatograms,
                                          chromatogram_extractor, database):
         return {
@@ -1088,7 +1141,11 @@ class MzMLGlycopeptideLCMSMSAnalyzer(GlycopeptideLCMSMSAnalyzer):
 
     def make_analysis_serializer(self, output_path, analysis_name, sample_run, identified_glycopeptides,
                                  unassigned_chromatograms, database, chromatogram_extractor):
-        return GlycopeptideMSMSAnalysisSerializer(
+        if isinstance(database, ImplicitGlycopeptideDiskBackedStructureDatabase):
+            serializer_type = ImplicitGlycopeptideMSMSAnalysisSerializer
+        else:
+            serializer_type = GlycopeptideMSMSAnalysisSerializer
+        return serializer_type(
             output_path, analysis_name, sample_run, identified_glycopeptides,
             unassigned_chromatograms, database, chromatogram_extractor)
 
@@ -1135,7 +1192,7 @@ class MzMLComparisonGlycopeptideLCMSMSAnalyzer(MzMLGlycopeptideLCMSMSAnalyzer):
                  n_processes=5, spectrum_batch_size=1000, use_peptide_mass_filter=False,
                  maximum_mass=float('inf'), use_decoy_correction_threshold=None,
                  probing_range_for_missing_precursors=3, trust_precursor_fits=True,
-                 permute_decoy_glycans=False, rare_signatures=False):
+                 permute_decoy_glycans=False, rare_signatures=False, oxonium_triage_threshold=None):
         if use_decoy_correction_threshold is None:
             use_decoy_correction_threshold = 0.33
         if tandem_scoring_model == CoverageWeightedBinomialScorer:
@@ -1149,7 +1206,7 @@ class MzMLComparisonGlycopeptideLCMSMSAnalyzer(MzMLGlycopeptideLCMSMSAnalyzer):
             n_processes, spectrum_batch_size, use_peptide_mass_filter,
             maximum_mass, probing_range_for_missing_precursors,
             trust_precursor_fits, permute_decoy_glycans=permute_decoy_glycans,
-            rare_signatures=rare_signatures)
+            rare_signatures=rare_signatures, oxonium_triage_threshold=oxonium_triage_threshold)
         self.decoy_database_connection = decoy_database_connection
         self.use_decoy_correction_threshold = use_decoy_correction_threshold
 
@@ -1171,7 +1228,7 @@ class MzMLComparisonGlycopeptideLCMSMSAnalyzer(MzMLGlycopeptideLCMSMSAnalyzer):
         return searcher
 
     def make_decoy_database(self):
-        database = GlycopeptideDiskBackedStructureDatabase(
+        database = self._make_glycopeptide_database(
             self.decoy_database_connection, self.hypothesis_id)
         return database
 
@@ -1217,7 +1274,8 @@ class MultipartGlycopeptideLCMSMSAnalyzer(MzMLGlycopeptideLCMSMSAnalyzer):
                  maximum_mass=float('inf'), probing_range_for_missing_precursors=3,
                  trust_precursor_fits=True, use_memory_database=True,
                  fdr_estimation_strategy=None, glycosylation_site_models_path=None,
-                 permute_decoy_glycans=False, fragile_fucose=True, rare_signatures=False):
+                 permute_decoy_glycans=False, fragile_fucose=True, rare_signatures=False,
+                 oxonium_triage_threshold=None):
         if tandem_scoring_model == CoverageWeightedBinomialScorer:
             tandem_scoring_model = CoverageWeightedBinomialModelTree
         if fdr_estimation_strategy is None:
@@ -1233,7 +1291,7 @@ class MultipartGlycopeptideLCMSMSAnalyzer(MzMLGlycopeptideLCMSMSAnalyzer):
             trust_precursor_fits,
             # The multipart scoring algorithm automatically implies permute_decoy_glycan
             # fragment masses.
-            permute_decoy_glycans=True)
+            permute_decoy_glycans=True, oxonium_triage_threshold=oxonium_triage_threshold)
         self.fragile_fucose = fragile_fucose
         self.rare_signatures = rare_signatures
         self.glycan_score_threshold = glycan_score_threshold
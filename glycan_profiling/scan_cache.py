@@ -16,6 +16,7 @@ from ms_deisotope.output.mzml import MzMLScanSerializer
 
 
 from glycan_profiling.task import log_handle
+from glycan_profiling.tandem.oxonium_index import OxoniumIndex, OxoniumIndexBuilder
 
 
 DONE = b'---NO-MORE---'
@@ -35,8 +36,12 @@ class ScanCacheHandlerBase(object):
     def save_bunch(self, precursor, products):
         raise NotImplementedError()
 
+    def index_bunch(self, precursor, products):
+        pass
+
     def save(self):
         if self.current_precursor is not None or self.current_products:
+            self.index_bunch(self.current_precursor, self.current_products)
             self.save_bunch(
                 self.current_precursor, self.current_products)
             self.reset()
@@ -97,6 +102,8 @@ class MzMLScanCacheHandler(ScanCacheHandlerBase):
         self.serializer = MzMLScanSerializer(
             self.handle, n_spectra, sample_name=sample_name,
             deconvoluted=deconvoluted)
+        # Signature ions are only meaningful on deconvoluted peak lists
+        self.oxonium_index = OxoniumIndexBuilder() if deconvoluted else None
 
     def _get_sample_run(self):
         return self.serializer.sample_run
@@ -173,9 +180,25 @@ class MzMLScanCacheHandler(ScanCacheHandlerBase):
         inst.serializer.writer.param("32-bit float")
         return inst
 
+    def index_bunch(self, precursor, products):
+        if self.oxonium_index is None:
+            return
+        for product in products:
+            if product.ms_level > 1:
+                self.oxonium_index.add(product)
+
     def save_bunch(self, precursor, products):
         self.serializer.save_scan_bunch(ScanBunch(precursor, products))
 
+    def write_oxonium_index(self):
+        if self.oxonium_index is None:
+            return
+        index_path = OxoniumIndex.index_file_name(self.path)
+        try:
+            self.oxonium_index.build().save(index_path)
+        except (IOError, OSError) as e:
+            log_handle.error("An error occurred while writing the oxonium ion index", e)
+
     def complete(self):
         self.save()
         self.serializer.complete()
@@ -187,6 +210,7 @@ class MzMLScanCacheHandler(ScanCacheHandlerBase):
         except Exception:
             import traceback
             traceback.print_exc()
+        self.write_oxonium_index()
 
 
 class ThreadedMzMLScanCacheHandler(MzMLScanCacheHandler):
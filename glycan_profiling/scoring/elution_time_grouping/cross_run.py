@@ -4,6 +4,8 @@ from collections import defaultdict
 
 import numpy as np
 
+from six import string_types as basestring
+
 try:
     from matplotlib import pyplot as plt
 except ImportError:
@@ -76,8 +78,37 @@ class ReplicatedAbundanceWeightedPeptideFactorElutionTimeFitter(AbundanceWeighte
             samples.update(case.keys())
         return result, sorted(samples)
 
+    def _peptide_offset(self):
+        return len(self._replicate_to_indicator)
+
+    def _subset_columns(self, model, indices):
+        p = len(self._replicate_to_indicator)
+        changed = super(ReplicatedAbundanceWeightedPeptideFactorElutionTimeFitter, self)._subset_columns(
+            model, indices)
+        present = set(self._get_replicate_key(c) for c in model.chromatograms)
+        if present == set(self._replicate_to_indicator):
+            model._replicate_to_indicator = defaultdict(
+                make_counter(p), self._replicate_to_indicator)
+            return changed
+        # The reference level's column is always omitted, so if the reference replicate
+        # is not present, the first present replicate becomes the new reference.
+        reference_sample = self.reference_sample
+        if reference_sample not in present:
+            reference_sample = sorted(present)[0]
+        ordered = [reference_sample] + [
+            key for key, _ in sorted(self._replicate_to_indicator.items(), key=lambda x: x[1])
+            if key in present and key != reference_sample]
+        columns = [np.zeros(len(model.chromatograms))] + [
+            model.data[:, self._replicate_to_indicator[key]] for key in ordered[1:]]
+        model.reference_sample = reference_sample
+        model.replicate_names = sorted(present)
+        model._replicate_to_indicator = defaultdict(
+            make_counter(len(ordered)), {key: i for i, key in enumerate(ordered)})
+        model.data = np.hstack([np.vstack(columns).T, model.data[:, p:]])
+        return True
+
     def _get_replicate_key(self, chromatogram):
-        if isinstance(self.replicate_key_attr, (str, unicode)):
+        if isinstance(self.replicate_key_attr, basestring):
             return getattr(chromatogram, self.replicate_key_attr)
         elif callable(self.replicate_key_attr):
             return self.replicate_key_attr(chromatogram)
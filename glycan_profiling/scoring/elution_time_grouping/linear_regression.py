@@ -1,7 +1,6 @@
 '''The barebone-essentials of weighted ordinary least squares and
 a RANSAC-wrapper of it.
 '''
-import random
 from collections import namedtuple
 
 import numpy as np
@@ -10,15 +9,44 @@ from scipy import stats
 
 WLSSolution = namedtuple("WLSSolution", [
     'yhat', 'parameters', 'data', 'weights', 'residuals',
-    'projection_matrix', 'rss', 'press', 'R2'])
+    'projection_matrix', 'rss', 'press', 'R2', 'leverage', 'normal_matrix'])
 
 '''A structured container for :func:`weighted_linear_regression_fit`
 output.
+
+The weights are stored as a vector, the diagonal of the weight matrix.
+:attr:`projection_matrix` is only populated on request because it is
+quadratic in the number of observations. :attr:`leverage` holds its diagonal
+and :attr:`normal_matrix` holds :math:`X^TWX`, which may be re-used to update
+the fit when observations are removed.
 '''
 
 SMALL_ERROR = 1e-5
 
 
+def weight_vector(w, n=None):
+    """Coerce a weight specification into a vector of per-observation weights.
+
+    Parameters
+    ----------
+    w : :class:`np.ndarray` or None
+        Either a vector of weights, or a diagonal weight matrix. If :const:`None`,
+        all observations are given unit weight.
+    n : int, optional
+        The number of observations, required when `w` is :const:`None`.
+
+    Returns
+    -------
+    :class:`np.ndarray`
+    """
+    if w is None:
+        return np.ones(n)
+    w = np.asarray(w, dtype=float)
+    if w.ndim == 2:
+        return np.diag(w).copy()
+    return w
+
+
 def prepare_arrays_for_linear_fit(x, y, w=None):
     """Prepare data for estimating parameter values using the
     weighted ordinary least squares method implemented in :func:`weighted_linear_regerssion_fit`
@@ -31,8 +59,8 @@ def prepare_arrays_for_linear_fit(x, y, w=None):
     y : :class:`np.ndarray`
         The response variable, should have the same outer dimension as x
     w : :class:`np.ndarray`, optional
-        The optional weight matrix. If omitted, the identity matrix of appropriate
-        shape will be returned.
+        The optional weight vector or diagonal weight matrix. If omitted, every
+        observation will be given unit weight.
 
     Returns
     -------
@@ -41,18 +69,55 @@ def prepare_arrays_for_linear_fit(x, y, w=None):
     y : :class:`np.ndarray`
         The response variable.
     w : :class:`np.ndarray`
-        The weight matrix of X
+        The weight vector of X
     """
     X = np.vstack((np.ones(len(x)), np.array(x))).T
     Y = np.array(y)
-    if w is None:
-        W = np.eye(Y.shape[0])
-    else:
-        W = np.array(w)
+    W = weight_vector(w, Y.shape[0])
     return X, Y, W
 
 
-def weighted_linear_regression_fit(x, y, w=None, prepare=False):
+def normal_matrix(x, w):
+    """Compute :math:`X^TWX` without forming the weight matrix.
+
+    Parameters
+    ----------
+    x : :class:`np.ndarray`
+        The design matrix
+    w : :class:`np.ndarray`
+        The weight vector
+
+    Returns
+    -------
+    :class:`np.ndarray`
+    """
+    return (x * w[:, None]).T.dot(x)
+
+
+def downdate_normal_matrix(xtwx, x_removed, w_removed):
+    """Remove the contribution of a set of observations from a previously
+    computed normal matrix, as returned by :func:`normal_matrix`.
+
+    This is much cheaper than re-computing the normal matrix when only a small
+    fraction of the observations are removed.
+
+    Parameters
+    ----------
+    xtwx : :class:`np.ndarray`
+        The normal matrix of the full data set
+    x_removed : :class:`np.ndarray`
+        The rows of the design matrix being removed
+    w_removed : :class:`np.ndarray`
+        The weights of the rows being removed
+
+    Returns
+    -------
+    :class:`np.ndarray`
+    """
+    return xtwx - normal_matrix(x_removed, w_removed)
+
+
+def weighted_linear_regression_fit(x, y, w=None, prepare=False, xtwx=None, include_projection_matrix=False):
     """Fit a linear model using weighted least squares.
 
     Parameters
@@ -62,9 +127,15 @@ def weighted_linear_regression_fit(x, y, w=None, prepare=False):
     y : :class:`np.ndarray`
         The response variable, should have the same outer dimension as x
     w : :class:`np.ndarray`, optional
-        The optional weight matrix
+        The optional weight vector or diagonal weight matrix
     prepare : bool, optional
         Whether or not to pass the parameters through :func:`prepare_arrays_for_linear_fit`
+    xtwx : :class:`np.ndarray`, optional
+        A pre-computed normal matrix for `x` and `w`, such as one produced by
+        :func:`downdate_normal_matrix`.
+    include_projection_matrix : bool, optional
+        Whether or not to compute the full hat matrix. This requires memory quadratic
+        in the number of observations, so it is off by default.
 
     Returns
     -------
@@ -72,39 +143,56 @@ def weighted_linear_regression_fit(x, y, w=None, prepare=False):
     """
     if prepare:
         x, y, w = prepare_arrays_for_linear_fit(x, y, w)
-    elif w is None:
-        w = np.eye(y.shape[0])
-    A = np.linalg.pinv(x.T.dot(w).dot(x)).dot(x.T.dot(w))
-    B = A.dot(y)
-    H = x.dot(A)
+    else:
+        w = weight_vector(w, y.shape[0])
+    if xtwx is None:
+        xtwx = normal_matrix(x, w)
+    xtwx_inv = np.linalg.pinv(xtwx)
+    B = xtwx_inv.dot(x.T.dot(w * y))
+    # The diagonal of the hat matrix X (X'WX)^-1 X'W
+    leverage = (x.dot(xtwx_inv) * x).sum(axis=1) * w
+    if include_projection_matrix:
+        H = x.dot(xtwx_inv).dot(x.T * w)
+    else:
+        H = None
     yhat = x.dot(B)
     residuals = (y - yhat)
-    leave_one_out_error = residuals / (1 - np.diag(H))
-    press = (np.diag(w) * leave_one_out_error * leave_one_out_error).sum()
-    rss = (np.diag(w) * residuals * residuals).sum()
+    leave_one_out_error = residuals / (1 - leverage)
+    press = (w * leave_one_out_error * leave_one_out_error).sum()
+    rss = (w * residuals * residuals).sum()
     tss = (y - y.mean())
-    tss = (np.diag(w) * tss * tss).sum()
+    tss = (w * tss * tss).sum()
     return WLSSolution(
         yhat, B, (x, y), w, residuals, H,
-        rss, press, 1 - (rss / (tss)))
+        rss, press, 1 - (rss / (tss)), leverage, xtwx)
+
+
+def _batched_weighted_fit(x, y, w, subsets):
+    # Solve the weighted least squares problem for each row of `subsets` at once.
+    X_sub = x[subsets]
+    y_sub = y[subsets]
+    w_sub = w[subsets]
+    XtW = np.transpose(X_sub * w_sub[:, :, None], (0, 2, 1))
+    xtwx_inv = np.linalg.pinv(np.matmul(XtW, X_sub))
+    xtwy = np.matmul(XtW, y_sub[:, :, None])
+    return np.matmul(xtwx_inv, xtwy)[:, :, 0]
 
 
-def ransac(x, y, w=None, max_trials=100):
+def ransac(x, y, w=None, max_trials=100, random_state=1, chunk_size=None):
     '''
     RANSAC Regression, inspired heavily by sklearn's
-    much more complex implementation
+    much more complex implementation.
+
+    All trials are fit and evaluated together as batched matrix operations,
+    in chunks of `chunk_size` trials to bound the memory used to hold the
+    residuals of every trial.
     '''
     X = x
     residual_threshold = np.median(np.abs(y - np.median(y)))
 
-    if w is None:
-        w = np.eye(y)
-
-    def loss(y_true, y_pred):
-        return np.abs(y_true - y_pred)
-
-    n_trials = 0
     n_samples = X.shape[0]
+    w = weight_vector(w, n_samples)
+
     min_samples = X.shape[1] * 5
     if min_samples > X.shape[0]:
         min_samples = X.shape[1] + 1
@@ -112,63 +200,53 @@ def ransac(x, y, w=None, max_trials=100):
     if min_samples > X.shape[0]:
         return weighted_linear_regression_fit(X, y, w)
 
-    sample_indices = np.arange(n_samples)
+    if chunk_size is None:
+        chunk_size = max(1, min(max_trials, int(2 ** 24 // max(n_samples, 1))))
 
-    rng = random.Random(1)
+    rng = np.random.RandomState(random_state)
+    subsets = np.array([
+        rng.choice(n_samples, min_samples, replace=False) for _ in range(max_trials)])
 
-    n_inliers_best = 1
+    n_inliers_best = 0
     score_best = -np.inf
-    X_inlier_best = None
-    y_inlier_best = None
-    w_inlier_best = None
-
-    while n_trials < max_trials:
-        n_trials += 1
-        subset_ix = rng.sample(sample_indices, min_samples)
-        X_subset = X[subset_ix]
-        y_subset = y[subset_ix]
-        w_subset = np.diag(np.diag(w)[subset_ix])
+    inlier_mask_best = None
 
-        # fit parameters on random subset of the data
-        fit = weighted_linear_regression_fit(X_subset, y_subset, w_subset)
+    for offset in range(0, max_trials, chunk_size):
+        chunk = subsets[offset:offset + chunk_size]
+        # fit parameters on random subsets of the data
+        parameters = _batched_weighted_fit(X, y, w, chunk)
 
         # compute goodness of fit for the fitted parameters with
         # the full dataset
-        yhat = np.dot(X, fit.parameters)
-        residuals_subset = loss(y, yhat)
-
-        # locate inliers based on residual threshold
-        inlier_subset_mask = residuals_subset < residual_threshold
-        n_inliers_subset = inlier_subset_mask.sum()
+        yhat = X.dot(parameters.T)
+        inlier_mask = np.abs(y[:, None] - yhat) < residual_threshold
+        n_inliers = inlier_mask.sum(axis=0)
 
         # determine the quality of the fitted parameters for
         # the inliers using R2
-        inlier_subset_ix = sample_indices[inlier_subset_mask]
-        X_inlier_subset = X[inlier_subset_ix]
-        y_inlier_subset = y[inlier_subset_ix]
-        w_inlier_subset = np.diag(np.diag(w)[inlier_subset_ix])
-        # w_inlier_best = 1
-
-        yhat_inlier_subset = X_inlier_subset.dot(fit.parameters)
-        rss = (w_inlier_subset * np.square(
-            y_inlier_subset - yhat_inlier_subset)).sum()
-        tss = (w_inlier_subset * np.square(
-            y_inlier_subset - y_inlier_subset.mean())).sum()
-
-        score_subset = 1 - (rss / tss)
-
-        # If the number of inliers chosen hasn't improved and the score hasn't
-        # improved, don't update the current best
-        if n_inliers_subset < n_inliers_best and score_subset < score_best:
-            continue
-
-        score_best = score_subset
-        X_inlier_best = X_inlier_subset
-        y_inlier_best = y_inlier_subset
-        w_inlier_best = w_inlier_subset
+        weighted_mask = inlier_mask * w[:, None]
+        inlier_total = weighted_mask.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            y_mean = (weighted_mask * y[:, None]).sum(axis=0) / inlier_total
+            rss = (weighted_mask * np.square(y[:, None] - yhat)).sum(axis=0)
+            tss = (weighted_mask * np.square(y[:, None] - y_mean)).sum(axis=0)
+            scores = 1 - (rss / tss)
+        scores = np.where(np.isfinite(scores), scores, -np.inf)
+
+        # Prefer the trial with the most inliers, breaking ties by score
+        i = np.lexsort((scores, n_inliers))[-1]
+        if n_inliers[i] > n_inliers_best or (
+                n_inliers[i] == n_inliers_best and scores[i] > score_best):
+            n_inliers_best = n_inliers[i]
+            score_best = scores[i]
+            inlier_mask_best = inlier_mask[:, i]
+
+    if inlier_mask_best is None or n_inliers_best <= X.shape[1]:
+        return weighted_linear_regression_fit(X, y, w)
 
     # fit the final best inlier set for the final parameters
-    return weighted_linear_regression_fit(X_inlier_best, y_inlier_best, w_inlier_best)
+    return weighted_linear_regression_fit(
+        X[inlier_mask_best], y[inlier_mask_best], w[inlier_mask_best])
 
 
 def prediction_interval(solution, x0, y0, alpha=0.05):
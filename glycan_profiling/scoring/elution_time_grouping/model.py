@@ -17,7 +17,9 @@ from glycan_profiling.scoring.base import (
     ScoringFeatureBase,)
 
 from .structure import _get_apex_time, GlycopeptideChromatogramProxy
-from .linear_regression import (ransac, weighted_linear_regression_fit, prediction_interval, SMALL_ERROR)
+from .linear_regression import (
+    ransac, weighted_linear_regression_fit, prediction_interval, SMALL_ERROR,
+    normal_matrix, downdate_normal_matrix)
 
 
 
@@ -29,7 +31,8 @@ class ElutionTimeFitter(ScoringFeatureBase):
         self.neutral_mass_array = None
         self.data = None
         self.apex_time_array = None
-        self.weight_matrix = None
+        self.weights = None
+        self._normal_matrix = None
         self.parameters = None
         self.residuals = None
         self.estimate = None
@@ -46,7 +49,8 @@ class ElutionTimeFitter(ScoringFeatureBase):
             self._get_apex_time(x) for x in self.chromatograms
         ])
 
-        self.weight_matrix = self.build_weight_matrix()
+        self.weights = self.build_weights()
+        self._normal_matrix = None
 
         self.parameters = None
         self.residuals = None
@@ -55,8 +59,84 @@ class ElutionTimeFitter(ScoringFeatureBase):
     def _get_apex_time(self, chromatogram):
         return _get_apex_time(chromatogram)
 
-    def build_weight_matrix(self):
-        return np.eye(len(self.chromatograms))
+    def build_weights(self):
+        """Build the vector of observation weights, the diagonal of the
+        weight matrix.
+
+        Returns
+        -------
+        :class:`np.ndarray`
+        """
+        return np.ones(len(self.chromatograms))
+
+    @property
+    def weight_matrix(self):
+        return np.diag(self.weights)
+
+    def _subset_columns(self, model, indices):
+        """Update the design matrix of `model`, a row subset of this model, to
+        remove columns that no longer describe any observation.
+
+        Parameters
+        ----------
+        model : :class:`ElutionTimeFitter`
+            The new model whose rows have already been subset
+        indices : :class:`np.ndarray`
+            The row indices of this model's observations retained by `model`
+
+        Returns
+        -------
+        bool :
+            Whether any columns were removed.
+        """
+        return False
+
+    def subset(self, indices):
+        """Create a new, unfitted model over a subset of this model's observations,
+        re-using the rows of the design matrix that have already been built instead of
+        re-building them from the chromatograms.
+
+        Weights are re-normalized over the subset. If this model has been fit, its normal
+        matrix is updated to remove the dropped observations rather than being re-computed
+        when that is cheaper.
+
+        Parameters
+        ----------
+        indices : :class:`np.ndarray`
+            The indices of the observations to keep, or a boolean mask over them.
+
+        Returns
+        -------
+        :class:`ElutionTimeFitter`
+        """
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        inst = self.__class__.__new__(self.__class__)
+        inst.__dict__.update(self.__dict__)
+        inst.chromatograms = [self.chromatograms[i] for i in indices]
+        inst.neutral_mass_array = self.neutral_mass_array[indices]
+        inst.apex_time_array = self.apex_time_array[indices]
+        inst.data = self.data[indices]
+        weights = self.weights[indices]
+        scale = weights.max() if len(weights) else 1.0
+        if scale == 0:
+            scale = 1.0
+        inst.weights = weights / scale
+        inst._normal_matrix = None
+        inst.parameters = None
+        inst.residuals = None
+        inst.estimate = None
+        inst.solution = None
+        inst.projection_matrix = None
+        columns_changed = self._subset_columns(inst, indices)
+        n_removed = len(self.chromatograms) - len(indices)
+        if self._normal_matrix is not None and not columns_changed and n_removed < len(indices):
+            removed = np.ones(len(self.chromatograms), dtype=bool)
+            removed[indices] = False
+            inst._normal_matrix = downdate_normal_matrix(
+                self._normal_matrix, self.data[removed], self.weights[removed]) / scale
+        return inst
 
     def _prepare_data_vector(self, chromatogram):
         return np.array([1, chromatogram.weighted_neutral_mass,])
@@ -73,18 +153,22 @@ class ElutionTimeFitter(ScoringFeatureBase):
     def _fit(self, resample=False):
         if resample:
             solution = ransac(self.data, self.apex_time_array,
-                              self.weight_matrix)
+                              self.weights)
             alt = weighted_linear_regression_fit(
-                self.data, self.apex_time_array, self.weight_matrix)
+                self.data, self.apex_time_array, self.weights,
+                xtwx=self._normal_matrix)
             if alt.R2 > solution.R2:
                 return alt
             return solution
         else:
             solution = weighted_linear_regression_fit(
-                self.data, self.apex_time_array, self.weight_matrix)
+                self.data, self.apex_time_array, self.weights,
+                xtwx=self._normal_matrix)
         return solution
 
     def fit(self, resample=False):
+        if self._normal_matrix is None:
+            self._normal_matrix = normal_matrix(self.data, self.weights)
         solution = self._fit(resample=resample)
         self.estimate = solution.yhat
         self.residuals = solution.residuals
@@ -97,10 +181,10 @@ class ElutionTimeFitter(ScoringFeatureBase):
     def rss(self):
         x = self.data
         y = self.apex_time_array
-        w = self.weight_matrix
+        w = self.weights
         yhat = x.dot(self.parameters)
         residuals = (y - yhat)
-        rss = (np.diag(w) * residuals * residuals).sum()
+        rss = (w * residuals * residuals).sum()
         return rss
 
     @property
@@ -108,8 +192,7 @@ class ElutionTimeFitter(ScoringFeatureBase):
         return self.rss / (len(self.apex_time_array) - len(self.parameters) - 1.0)
 
     def parameter_significance(self):
-        XtWX_inv = np.linalg.pinv(
-            (self.data.T.dot(self.weight_matrix).dot(self.data)))
+        XtWX_inv = np.linalg.pinv(normal_matrix(self.data, self.weights))
         # With unknown variance, use the mean squared error estimate
         sigma_params = np.sqrt(np.diag(self.mse * XtWX_inv))
         degrees_of_freedom = len(self.apex_time_array) - \
@@ -123,7 +206,7 @@ class ElutionTimeFitter(ScoringFeatureBase):
         X = self.data
         sigma_params = np.sqrt(
             np.diag((self.mse) * np.linalg.pinv(
-                X.T.dot(self.weight_matrix).dot(X))))
+                normal_matrix(X, self.weights))))
         degrees_of_freedom = len(self.apex_time_array) - \
             len(self.parameters) - 1
         iv = stats.t.interval((1 - alpha) / 2., degrees_of_freedom)
@@ -133,12 +216,12 @@ class ElutionTimeFitter(ScoringFeatureBase):
     def R2(self, adjust=True):
         x = self.data
         y = self.apex_time_array
-        w = self.weight_matrix
+        w = self.weights
         yhat = x.dot(self.parameters)
         residuals = (y - yhat)
-        rss = (np.diag(w) * residuals * residuals).sum()
+        rss = (w * residuals * residuals).sum()
         tss = (y - y.mean())
-        tss = (np.diag(w) * tss * tss).sum()
+        tss = (w * tss * tss).sum()
         n = len(y)
         k = len(self.parameters)
         if adjust:
@@ -176,6 +259,19 @@ class ElutionTimeFitter(ScoringFeatureBase):
             df=self._df(), scale=self.scale) * 2
         return max((score - SMALL_ERROR), SMALL_ERROR)
 
+    def training_scores(self):
+        """Compute :meth:`score` for every observation the model was fit
+        with at once, using the existing design matrix.
+
+        Returns
+        -------
+        :class:`np.ndarray`
+        """
+        residuals = self.apex_time_array - self.data.dot(self.parameters)
+        score = stats.t.sf(
+            np.abs(residuals), df=self._df(), scale=self.scale) * 2
+        return np.maximum(score - SMALL_ERROR, SMALL_ERROR)
+
     def plot(self, ax=None):
         if ax is None:
             _fig, ax = plt.subplots(1)
@@ -211,7 +307,7 @@ class ElutionTimeFitter(ScoringFeatureBase):
         sizes = list(map(len, column_labels))
         value_sizes = [max(map(len, col))
                        for col in [feature_names, parameter_values, signif, ci]]
-        sizes = map(max, zip(sizes, value_sizes))
+        sizes = list(map(max, zip(sizes, value_sizes)))
         table = [[formatter(v, sizes[i]) for i, v in enumerate(column_labels)]]
         for row in zip(feature_names, parameter_values, signif, ci):
             table.append([
@@ -229,10 +325,10 @@ class ElutionTimeFitter(ScoringFeatureBase):
 
 
 class AbundanceWeightedElutionTimeFitter(ElutionTimeFitter):
-    def build_weight_matrix(self):
-        W = np.eye(len(self.chromatograms)) * [
+    def build_weights(self):
+        W = np.array([
             np.log10(x.total_signal) for x in self.chromatograms
-        ]
+        ])
         W /= W.max()
         return W
 
@@ -334,10 +430,10 @@ class FactorElutionTimeFitter(ElutionTimeFitter):
 
 
 class AbundanceWeightedFactorElutionTimeFitter(FactorElutionTimeFitter):
-    def build_weight_matrix(self):
-        W = np.eye(len(self.chromatograms)) * [
+    def build_weights(self):
+        W = np.array([
             (x.total_signal) for x in self.chromatograms
-        ]
+        ], dtype=float)
         W /= W.max()
         return W
 
@@ -347,29 +443,55 @@ class PeptideFactorElutionTimeFitter(FactorElutionTimeFitter):
         if factors is None:
             factors = ['Hex', 'HexNAc', 'Fuc', 'Neu5Ac']
         self._peptide_to_indicator = defaultdict(make_counter(0))
+        # Parsing the peptide key is expensive, so compute it once per observation
+        self._peptide_keys = [self._get_peptide_key(obs) for obs in chromatograms]
         # Ensure that _peptide_to_indicator is properly initialized
-        for obs in chromatograms:
-            _ = self._peptide_to_indicator[self._get_peptide_key(obs)]
+        for key in self._peptide_keys:
+            _ = self._peptide_to_indicator[key]
         super(PeptideFactorElutionTimeFitter, self).__init__(
             chromatograms, list(factors), scale)
 
     def _get_peptide_key(self, chromatogram):
         return PeptideSequence(str(chromatogram.structure)).deglycosylate()
 
+    def _peptide_offset(self):
+        return 0
+
     def _prepare_data_matrix(self, mass_array):
         p = len(self._peptide_to_indicator)
         n = len(self.chromatograms)
-        peptides = np.zeros((p, n))
+        peptides = np.zeros((n, p))
         indicator = dict(self._peptide_to_indicator)
-        for i, c in enumerate(self.chromatograms):
-            try:
-                j = indicator[self._get_peptide_key(c)]
-                peptides[j, i] = 1
-            except KeyError:
-                pass
+        rows = []
+        columns = []
+        for i, key in enumerate(self._peptide_keys):
+            j = indicator.get(key)
+            if j is not None:
+                rows.append(i)
+                columns.append(j)
+        peptides[rows, columns] = 1
         # Omit the intercept, so that all peptide levels are used without inducing linear dependence.
-        return np.vstack([peptides, ] +
-                         [np.array([c.glycan_composition[f] for c in self.chromatograms]) for f in self.factors]).T
+        return np.hstack([peptides, ] + [
+            np.array([c.glycan_composition[f] for c in self.chromatograms]).reshape((-1, 1))
+            for f in self.factors])
+
+    def _subset_columns(self, model, indices):
+        model._peptide_keys = [self._peptide_keys[i] for i in indices]
+        offset = self._peptide_offset()
+        p = len(self._peptide_to_indicator)
+        block = model.data[:, offset:offset + p]
+        keep = block.any(axis=0)
+        if keep.all():
+            model._peptide_to_indicator = defaultdict(
+                make_counter(p), self._peptide_to_indicator)
+            return False
+        new_index = np.cumsum(keep) - 1
+        model._peptide_to_indicator = defaultdict(make_counter(int(keep.sum())), {
+            key: int(new_index[j]) for key, j in self._peptide_to_indicator.items() if keep[j]
+        })
+        model.data = np.hstack([
+            model.data[:, :offset], block[:, keep], model.data[:, offset + p:]])
+        return True
 
     def feature_names(self):
         names = []
@@ -397,26 +519,27 @@ class PeptideFactorElutionTimeFitter(FactorElutionTimeFitter):
 
 
 class AbundanceWeightedPeptideFactorElutionTimeFitter(PeptideFactorElutionTimeFitter):
-    def build_weight_matrix(self):
-        W = np.eye(len(self.chromatograms)) * [
+    def build_weights(self):
+        W = np.array([
             (x.total_signal) for x in self.chromatograms
-        ]
+        ], dtype=float)
         W /= W.max()
         return W
 
     def groupwise_R2(self, adjust=True):
         x = self.data
         y = self.apex_time_array
-        w = self.weight_matrix
+        w = self.weights
         yhat = x.dot(self.parameters)
         residuals = (y - yhat)
-        rss_u = (np.diag(w) * residuals * residuals)
+        rss_u = (w * residuals * residuals)
         tss = (y - y.mean())
-        tss_u = (np.diag(w) * tss * tss)
+        tss_u = (w * tss * tss)
 
+        offset = self._peptide_offset()
         mapping = {}
         for key, value in self._peptide_to_indicator.items():
-            mask = x[:, value] == 1
+            mask = x[:, value + offset] == 1
             rss = rss_u[mask].sum()
             tss = tss_u[mask].sum()
             n = len(y)
@@ -45,14 +45,16 @@ class GlycopeptideElutionTimeModeler(TaskBase):
         self.joint_model = None
         self.refit_filter = refit_filter
         self.by_peptide = defaultdict(list)
+        self.by_peptide_indices = defaultdict(list)
         self.peptide_specific_models = dict()
         self.delta_by_factor = dict()
         self._partition_by_sequence()
 
     def _partition_by_sequence(self):
-        for record in self.glycopeptide_chromatograms:
+        for i, record in enumerate(self.glycopeptide_chromatograms):
             key = glycopeptidepy.parse(str(record.structure)).deglycosylate()
             self.by_peptide[key].append(record)
+            self.by_peptide_indices[key].append(i)
 
     def _deltas_for(self, monosaccharide):
         deltas = []
@@ -81,18 +83,35 @@ class GlycopeptideElutionTimeModeler(TaskBase):
         model.fit()
         return model
 
+    def refit_model(self, model):
+        """Re-fit `model` using only those observations whose score under `model`
+        exceeds :attr:`refit_filter`, re-using its design matrix.
+
+        Parameters
+        ----------
+        model : :class:`~.ElutionTimeFitter`
+            The fitted model
+
+        Returns
+        -------
+        :class:`~.ElutionTimeFitter`
+        """
+        self.log("Filtering Training Data")
+        mask = model.training_scores() > self.refit_filter
+        self.log("Re-fitting After Filtering (%d/%d retained)" % (mask.sum(), len(mask)))
+        model = model.subset(mask)
+        model.fit()
+        return model
+
     def fit(self):
         self.log("Fitting Joint Model")
         model = self.fit_model(self.glycopeptide_chromatograms)
+        # The design matrix over all observations is re-used for each subsequent
+        # model instead of re-building it from the chromatograms.
+        base_model = model
         self.log("R^2: %0.3f, MSE: %0.3f" % (model.R2(), model.mse))
         if self.refit_filter != 0.0:
-            self.log("Filtering Training Data")
-            filtered_cases = [
-                case for case in self.glycopeptide_chromatograms
-                if model.score(case) > self.refit_filter
-            ]
-            self.log("Re-fitting After Filtering")
-            model = self.fit_model(filtered_cases)
+            model = self.refit_model(model)
             self.log("R^2: %0.3f, MSE: %0.3f" % (model.R2(), model.mse))
         self.log('\n' + model.summary())
         self.joint_model = model
@@ -111,21 +130,16 @@ class GlycopeptideElutionTimeModeler(TaskBase):
             if len(distinct_members) <= max(len(self.factors), self.minimum_observations_for_specific_model):
                 self.log("Too few distinct observations for %s" % (key, ))
                 continue
-            model = self.fit_model(members)
+            model = base_model.subset(self.by_peptide_indices[key])
+            model.fit()
             self.log("R^2: %0.3f, MSE: %0.3f" % (model.R2(), model.mse))
             if self.refit_filter != 0.0:
-                self.log("Filtering Training Data")
-                filtered_cases = [
-                    case for case in members
-                    if model.score(case) > self.refit_filter
-                ]
-                self.log("Re-fitting After Filtering")
-                model = self.fit_model(filtered_cases)
+                model = self.refit_model(model)
                 self.log("R^2: %0.3f, MSE: %0.3f" % (model.R2(), model.mse))
             self.log('\n' + model.summary())
             self.peptide_specific_models[key] = model
-            joint_perf = np.mean(map(self.joint_model.score, members))
-            spec_perf = np.mean(map(model.score, members))
+            joint_perf = np.mean(list(map(self.joint_model.score, members)))
+            spec_perf = np.mean(list(map(model.score, members)))
             self.log("Mean Peptide Model Score: %0.3f" % (spec_perf, ))
             self.log("Mean Joint Model Score:   %0.3f" % (joint_perf, ))
 
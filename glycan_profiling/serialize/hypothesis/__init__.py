@@ -3,10 +3,10 @@ from .hypothesis import GlycanHypothesis, GlycopeptideHypothesis
 from .glycan import (
     GlycanComposition, GlycanCombination, GlycanClass,
     GlycanStructure, GlycanTypes, GlycanCombinationGlycanComposition,
-    GlycanCompositionToClass, GlycanStructureToClass)
+    GlycanCompositionToClass, GlycanStructureToClass, GlycanCombinationPartition)
 
 from .peptide import (
-    Protein, Peptide, Glycopeptide, ProteinSite)
+    Protein, Peptide, Glycopeptide, ProteinSite, GlycopeptideSiteCombination)
 
 from .generic import (
     TemplateNumberStore as TemplateNumberStore,
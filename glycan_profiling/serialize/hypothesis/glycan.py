@@ -176,6 +176,35 @@ class GlycanCombination(GlycanBase, Base):
         return rep
 
 
+class GlycanCombinationPartition(Base):
+    """Records that every member of a :class:`GlycanCombination` may be attached
+    as a glycan of type `glycan_type`, so the combination may be placed on any
+    :class:`~.GlycopeptideSiteCombination` with that glycan type and count.
+    """
+    __tablename__ = "GlycanCombinationPartition"
+
+    id = Column(Integer, primary_key=True)
+    glycan_combination_id = Column(
+        Integer, ForeignKey(GlycanCombination.id, ondelete="CASCADE"), index=True)
+    hypothesis_id = Column(Integer, ForeignKey(
+        GlycopeptideHypothesis.id, ondelete="CASCADE"), index=True)
+
+    glycan_type = Column(String(32))
+    count = Column(Integer)
+    dehydrated_mass = Column(Numeric(12, 6, asdecimal=False))
+
+    glycan_combination = relationship(GlycanCombination)
+
+    def __repr__(self):
+        return "GlycanCombinationPartition({self.glycan_combination_id}, {self.glycan_type}, {self.count})".format(
+            self=self)
+
+    __table_args__ = (
+        Index("ix_GlycanCombinationPartition_partition_index",
+              "hypothesis_id", "glycan_type", "count"),
+    )
+
+
 class GlycanClass(Base):
     __tablename__ = 'GlycanClass'
 
@@ -439,3 +439,42 @@ class Glycopeptide(PeptideBase, Base):
         # Index("ix_Glycopeptide_mass_search_index_full", "calculated_mass", "hypothesis_id",
         #                                                 "peptide_id", "glycan_combination_id"),
     )
+
+
+class GlycopeptideSiteCombination(Base):
+    """One way to place `count` glycans of type `glycan_type` on the unoccupied
+    glycosylation sites of a :class:`Peptide`.
+
+    Together with :class:`~.GlycanCombinationPartition`, this table describes the
+    glycopeptides of a hypothesis without storing each one as a :class:`Glycopeptide`.
+    The glycopeptides are the join of the two tables on their hypothesis, glycan type
+    and glycan count, with mass ``peptide_mass + dehydrated_mass``.
+    """
+    __tablename__ = "GlycopeptideSiteCombination"
+
+    id = Column(Integer, primary_key=True)
+    peptide_id = Column(Integer, ForeignKey(Peptide.id, ondelete='CASCADE'), index=True)
+    hypothesis_id = Column(Integer, ForeignKey(
+        GlycopeptideHypothesis.id, ondelete="CASCADE"), index=True)
+
+    glycan_type = Column(String(32))
+    count = Column(Integer)
+    site_combination_index = Column(Integer)
+    # Comma-separated, zero-based positions of the glycosylated residues
+    sites = Column(String(128))
+    peptide_mass = Column(Numeric(12, 6, asdecimal=False))
+
+    peptide = relationship(Peptide)
+
+    @property
+    def site_list(self):
+        return [int(i) for i in self.sites.split(",")] if self.sites else []
+
+    def __repr__(self):
+        return ("GlycopeptideSiteCombination({self.peptide_id}, {self.glycan_type}, "
+                "{self.count}, [{self.sites}])").format(self=self)
+
+    __table_args__ = (
+        Index("ix_GlycopeptideSiteCombination_mass_search_index",
+              "hypothesis_id", "glycan_type", "count", "peptide_mass"),
+    )
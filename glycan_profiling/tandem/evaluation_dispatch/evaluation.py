@@ -22,8 +22,16 @@ class SpectrumEvaluatorBase(object):
         A mapping from mass shift name to :class:`~.MassShift`
     solution_map: Mapping
         A mapping from (scan id, mass shift name) to the packaged match.
+    evaluated_count: int
+        The number of spectrum-structure pairs which were fully scored
+    pruned_count: int
+        The number of spectrum-structure pairs skipped because their score's upper
+        bound was below the ``prune_below_score`` evaluation argument
     """
 
+    evaluated_count = 0
+    pruned_count = 0
+
     def fetch_scan(self, key):
         return self.scan_map[key]
 
@@ -59,9 +67,20 @@ class SpectrumEvaluatorBase(object):
         solution = self.evaluate(scan, structure, mass_shift=mass_shift,
                                  evaluation_context=evaluation_context,
                                  **self.evaluation_args)
+        if solution is None:
+            # The match could not reach the retention threshold, so it was never scored
+            self._count_evaluation(True)
+            return None
+        self._count_evaluation(False)
         self.solution_map[scan.id, mass_shift.name] = self.solution_packer(solution)
         return solution
 
+    def _count_evaluation(self, pruned):
+        if pruned:
+            self.pruned_count += 1
+        else:
+            self.evaluated_count += 1
+
     def construct_cache_subgroups(self, work_order):
         '''Build groups of structures which should be evaluated within the same context.
         The default implementation assumes each structure should get its own context.
@@ -110,16 +129,18 @@ class SpectrumEvaluatorBase(object):
             scan_specification = [
                 (self.fetch_scan(i), self.fetch_mass_shift(j)) for i, j in scan_specification]
             solution_target = None
-            solution = None
             for scan, mass_shift in scan_specification:
                 solution = self.handle_instance(
                     structure, scan, mass_shift, evaluation_context)
-                solution_target = solution.target
-            if solution is not None:
+                if solution is not None:
+                    solution_target = solution.target
+            if solution_target is not None:
                 try:
-                    solution.target.clear_caches()
+                    solution_target.clear_caches()
                 except AttributeError:
                     pass
+            else:
+                solution_target = structure
             packed = self.pack_output(solution_target)
             results.append(packed)
         return results
@@ -134,16 +155,18 @@ class SpectrumEvaluatorBase(object):
     def handle_item(self, structure, scan_specification):
         scan_specification = [(self.fetch_scan(i), self.fetch_mass_shift(j)) for i, j in scan_specification]
         solution_target = None
-        solution = None
         for scan, mass_shift in scan_specification:
             solution = self.handle_instance(structure, scan, mass_shift)
-            solution_target = solution.target
+            if solution is not None:
+                solution_target = solution.target
 
-        if solution is not None:
+        if solution_target is not None:
             try:
-                solution.target.clear_caches()
+                solution_target.clear_caches()
             except AttributeError:
                 pass
+        else:
+            solution_target = structure
         return self.pack_output(solution_target)
 
     def pack_output(self, target):
@@ -250,6 +273,9 @@ class SequentialIdentificationProcessor(TaskBase):
         elapsed = end_time - start_time
         self.log("... Identification Completed (%0.2f sec.): %d Solutions" %
                  (elapsed, self.solution_handler.counter, ))
+        if evaluator.pruned_count:
+            self.log("... Pruned %d of %d Matches Below The Score Threshold" % (
+                evaluator.pruned_count, evaluator.pruned_count + evaluator.evaluated_count))
         return self.scan_solution_map
 
     @property
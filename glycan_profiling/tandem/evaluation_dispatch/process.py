@@ -8,11 +8,12 @@ except ImportError:
     import pickle
 
 from collections import deque
-from threading import Thread
+from threading import Thread, RLock, local as thread_local
 
 import multiprocessing
 from multiprocessing import Process, Event, Manager, JoinableQueue
 from multiprocessing.managers import RemoteError
+from multiprocessing.pool import ThreadPool
 
 try:
     from Queue import Empty as QueueEmptyException
@@ -24,6 +25,7 @@ from glypy.utils import uid
 from glycan_profiling.task import TaskBase
 from glycan_profiling.chromatogram_tree import Unmodified
 from glycan_profiling.structure import LRUMapping
+from glycan_profiling.tandem.peak_index import ScanPeakIndex
 
 from .evaluation import SolutionHandler, LocalSpectrumEvaluator, SpectrumEvaluatorBase
 from .task import TaskQueueFeeder
@@ -33,6 +35,17 @@ from .utils import SentinelToken, ProcessDispatcherState
 debug_mode = bool(os.environ.get("GLYCRESOFTDEBUG"))
 
 
+class _NullLock(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_null_lock = _NullLock()
+
+
 class IdentificationProcessDispatcher(TaskBase):
     """Orchestrates distributing the spectrum match evaluation
     task across several processes.
@@ -501,11 +514,27 @@ class IdentificationProcessDispatcher(TaskBase):
 
 
 class SpectrumIdentificationWorkerBase(Process, SpectrumEvaluatorBase):
+    """A worker process which evaluates work orders from :attr:`input_queue` and sends
+    the packed matches back on :attr:`output_queue`.
+
+    If :attr:`n_threads` is greater than 1, the structure subgroups of each work order
+    are evaluated by a pool of threads sharing this process's scan cache. This only helps
+    as much as the scoring code releases the GIL, as the peak matching kernels do.
+
+    Attributes
+    ----------
+    n_threads : int
+        The number of threads to evaluate structure subgroups with
+    """
     verbose = False
 
+    _thread_state = None
+    _lock = None
+    thread_pool = None
+
     def __init__(self, input_queue, output_queue, producer_done_event, consumer_done_event,
                  scorer_type, evaluation_args, spectrum_map, mass_shift_map, log_handler,
-                 solution_packer):
+                 solution_packer, n_threads=1):
         Process.__init__(self)
         if evaluation_args is None:
             evaluation_args = dict()
@@ -535,6 +564,44 @@ class SpectrumIdentificationWorkerBase(Process, SpectrumEvaluatorBase):
         self.result_buffer = []
         self.buffer_size = 1000
         self.last_sent_result = time.time()
+        self.n_threads = n_threads
+
+    @property
+    def solution_map(self):
+        state = self._thread_state
+        if state is None:
+            return self._solution_map
+        try:
+            return state.solution_map
+        except AttributeError:
+            state.solution_map = solution_map = dict()
+            return solution_map
+
+    @solution_map.setter
+    def solution_map(self, value):
+        state = self._thread_state
+        if state is None:
+            self._solution_map = value
+        else:
+            state.solution_map = value
+
+    def _init_thread_pool(self):
+        # Thread primitives cannot be sent to the child process, so they are
+        # created once it has started.
+        if self.n_threads > 1 and self.thread_pool is None:
+            self._lock = RLock()
+            self._thread_state = thread_local()
+            self.thread_pool = ThreadPool(self.n_threads)
+
+    def _thread_guard(self):
+        lock = self._lock
+        if lock is None:
+            return _null_lock
+        return lock
+
+    def _count_evaluation(self, pruned):
+        with self._thread_guard():
+            SpectrumEvaluatorBase._count_evaluation(self, pruned)
 
     def log(self, message):
         """Send a normal logging message via :attr:`log_handler`
@@ -559,13 +626,16 @@ class SpectrumIdentificationWorkerBase(Process, SpectrumEvaluatorBase):
             self.log_handler("DEBUG::%s" % message)
 
     def fetch_scan(self, key):
-        try:
-            return self.local_scan_map[key]
-        except KeyError:
-            serialized_scan = self.spectrum_map[key]
-            scan = pickle.loads(serialized_scan)
-            self.local_scan_map[key] = scan
-            return scan
+        with self._thread_guard():
+            try:
+                return self.local_scan_map[key]
+            except KeyError:
+                serialized_scan = self.spectrum_map[key]
+                scan = pickle.loads(serialized_scan)
+                # Build the peak index once here, every match against this scan shares it
+                ScanPeakIndex.from_scan(scan)
+                self.local_scan_map[key] = scan
+                return scan
 
     def fetch_mass_shift(self, key):
         try:
@@ -586,15 +656,17 @@ class SpectrumIdentificationWorkerBase(Process, SpectrumEvaluatorBase):
         return self._work_complete.is_set()
 
     def _append_to_result_buffer(self, payload):
-        self.result_buffer.append(payload)
-        if len(self.result_buffer) > self.buffer_size:
-            self._flush_result_buffer()
+        with self._thread_guard():
+            self.result_buffer.append(payload)
+            if len(self.result_buffer) > self.buffer_size:
+                self._flush_result_buffer()
 
     def _flush_result_buffer(self):
-        if self.result_buffer:
-            self.output_queue.put(self.result_buffer)
-            self.result_buffer = []
-            self.last_sent_result = time.time()
+        with self._thread_guard():
+            if self.result_buffer:
+                self.output_queue.put(self.result_buffer)
+                self.result_buffer = []
+                self.last_sent_result = time.time()
 
     def pack_output(self, target):
         """Transmit the completed identifications for a given target
@@ -616,6 +688,16 @@ class SpectrumIdentificationWorkerBase(Process, SpectrumEvaluatorBase):
     def evaluate(self, scan, structure, evaluation_context=None, *args, **kwargs):
         raise NotImplementedError()
 
+    def handle_group(self, work_order):
+        if self.thread_pool is None:
+            return super(SpectrumIdentificationWorkerBase, self).handle_group(work_order)
+        hit_cache_groups = self.construct_cache_subgroups(work_order)
+        results = []
+        for chunk in self.thread_pool.map(
+                lambda subgroup: self.evaluate_subgroup(work_order, subgroup), hit_cache_groups):
+            results.extend(chunk)
+        return results
+
     def cleanup(self):
         """Send signals indicating the worker process is finished and do any
         final shared resource cleanup needed on the worker's side.
@@ -624,6 +706,13 @@ class SpectrumIdentificationWorkerBase(Process, SpectrumEvaluatorBase):
         """
         self.debug("... Process %s Setting Work Complete Flag. Processed %d structures" % (
             self.name, self.items_handled))
+        if self.thread_pool is not None:
+            self.thread_pool.close()
+            self.thread_pool.join()
+            self.thread_pool = None
+        if self.pruned_count:
+            self.log("... Process %s Pruned %d of %d Matches Below The Score Threshold" % (
+                self.name, self.pruned_count, self.pruned_count + self.evaluated_count))
         try:
             self._work_complete.set()
         except (RemoteError, KeyError):
@@ -694,6 +783,7 @@ class SpectrumIdentificationWorkerBase(Process, SpectrumEvaluatorBase):
         new_name = getattr(self, 'process_name', None)
         if new_name is not None:
             TaskBase().try_set_process_name(new_name)
+        self._init_thread_pool()
         try:
             self.before_task()
         except Exception:
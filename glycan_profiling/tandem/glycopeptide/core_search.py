@@ -236,7 +236,8 @@ class CoarseStubGlycopeptideFragment(object):
 
 class GlycanCombinationRecordBase(object):
     __slots__ = ['id', 'dehydrated_mass', 'composition', 'count', 'glycan_types',
-                 'size', "_fragment_cache", "internal_size_approximation", "_hash"]
+                 'size', "_fragment_cache", "internal_size_approximation", "_hash",
+                 "side_group_count"]
 
     def is_n_glycan(self):
         return GlycanTypes.n_glycan in self.glycan_types
@@ -424,7 +425,7 @@ class CoarseGlycanMatch(object):
         self.core_theoretical = core_theoretical
 
     def __iter__(self):
-        yield self.matched_fragments
+        yield self.fragment_matches
         yield self.n_matched
         yield self.n_theoretical
         yield self.core_matched
@@ -473,7 +474,8 @@ class GlycanCoarseScorerBase(object):
             if hits:
                 if is_core:
                     core_matched += 1
-                fragment_matches.append((shift.key, target_mass, hits))
+                fragment_matches.append(
+                    CoarseStubGlycopeptideMatch(shift.key, target_mass, shift.mass, hits))
             if has_tandem_shift:
                 shifted_mass = target_mass + mass_shift_tandem_mass
                 hits = scan.deconvoluted_peak_set.all_peaks_for(
@@ -496,7 +498,7 @@ class GlycanCoarseScorerBase(object):
         score = 0
         for fmatch in glycan_match.fragment_matches:
             mass = fmatch.mass
-            for peak in fmatch.matches:
+            for peak in fmatch.peaks_matched:
                 score += np.log(peak.intensity) * (1 - (np.abs(peak.neutral_mass - mass) / mass) ** 4) * coverage
         return score
 
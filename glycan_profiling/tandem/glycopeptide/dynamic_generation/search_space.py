@@ -1,4 +1,5 @@
 import os
+import math
 import operator
 import logging
 import struct
@@ -13,6 +14,7 @@ from collections import namedtuple, defaultdict
 from lxml import etree
 
 from glycopeptidepy import GlycosylationType
+from glycopeptidepy.structure import Composition
 
 from glycopeptidepy.structure.glycan import GlycanCompositionWithOffsetProxy
 from glycopeptidepy.structure.sequence import (
@@ -41,6 +43,8 @@ from ...workload import WorkloadManager
 from ..core_search import GlycanCombinationRecord, GlycanFilteringPeptideMassEstimator
 
 
+_water_mass = Composition("H2O").mass
+
 logger = logging.Logger("glycresoft.dynamic_generation")
 
 
@@ -140,41 +144,145 @@ class GlycoformGeneratorBase(LoggingMixin):
             cache_size = int(cache_size)
         self.glycan_combinations = glycan_combinations
         self._peptide_cache = LRUMapping(cache_size)
+        self._peptide_object_cache = LRUMapping(2 ** 12)
+        self._site_combination_cache = LRUMapping(cache_size)
+        self._glycan_mass_cache = {}
         self._cache_hit = 0
         self._cache_miss = 0
         self.default_structure_type = default_structure_type
         self.glycan_prior_model = kwargs.pop("glycan_prior_model", None)
         super(GlycoformGeneratorBase, self).__init__(*args, **kwargs)
 
-    def handle_glycan_combination(self, peptide_obj, peptide_record, glycan_combination,
-                                  glycosylation_sites, core_type):
+    def _get_peptide_object(self, peptide_record, peptide_obj=None):
+        try:
+            return self._peptide_object_cache[peptide_record.id]
+        except KeyError:
+            if peptide_obj is None:
+                peptide_obj = peptide_record.convert()
+            self._peptide_object_cache[peptide_record.id] = peptide_obj
+            return peptide_obj
+
+    def glycan_mass(self, glycan_combination):
+        """The mass `glycan_combination` adds to a peptide's :attr:`total_mass` once it
+        is attached as a :class:`~.GlycanCompositionWithOffsetProxy`.
+
+        The aggregate glycan of a glycopeptide loses a single water when it is attached, however
+        many sites it is split across, so this is not :attr:`GlycanCombinationRecord.dehydrated_mass`
+        when :attr:`GlycanCombinationRecord.count` is greater than one.
+
+        Parameters
+        ----------
+        glycan_combination : :class:`~.GlycanCombinationRecord`
+
+        Returns
+        -------
+        float
+        """
+        try:
+            return self._glycan_mass_cache[glycan_combination.id]
+        except KeyError:
+            mass = GlycanCompositionWithOffsetProxy(glycan_combination.composition).mass() - _water_mass
+            self._glycan_mass_cache[glycan_combination.id] = mass
+            return mass
+
+    def site_combinations(self, peptide_record, glycosylation_sites, core_type, count, peptide_obj=None):
+        """List the ways `count` glycans may be placed on the unoccupied sites of `peptide_record`,
+        parsing the peptide only the first time it is asked for.
+
+        Parameters
+        ----------
+        peptide_record : :class:`~.PeptideDatabaseRecord`
+        glycosylation_sites : :class:`Iterable` of int
+        core_type : :class:`~.Modification`
+        count : int
+        peptide_obj : :class:`~.PeptideSequence`, optional
+            The already-parsed peptide, if available
+
+        Returns
+        -------
+        list of tuple
+        """
+        key = (peptide_record.id, core_type.name, count)
+        try:
+            return self._site_combination_cache[key]
+        except KeyError:
+            pass
+        peptide_obj = self._get_peptide_object(peptide_record, peptide_obj)
+        glycosylation_sites_unoccupied = set(glycosylation_sites)
+        for site in list(glycosylation_sites_unoccupied):
+            if peptide_obj[site][1]:
+                glycosylation_sites_unoccupied.remove(site)
+        site_combinations = list(limiting_combinations(glycosylation_sites_unoccupied, count))
+        self._site_combination_cache[key] = site_combinations
+        return site_combinations
+
+    def handle_glycan_combination_keys(self, peptide_record, glycan_combination, glycosylation_sites,
+                                       core_type, peptide_obj=None):
+        """Produce a :class:`LazyRecord` for each way of attaching `glycan_combination` to
+        `peptide_record`, without building any glycopeptide sequences.
+
+        Parameters
+        ----------
+        peptide_record : :class:`~.PeptideDatabaseRecord`
+        glycan_combination : :class:`~.GlycanCombinationRecord`
+        glycosylation_sites : :class:`Iterable` of int
+        core_type : :class:`~.Modification`
+        peptide_obj : :class:`~.PeptideSequence`, optional
+            The already-parsed peptide, if available
+
+        Returns
+        -------
+        list of :class:`LazyRecord`
+        """
         key = self._make_key(peptide_record, glycan_combination)
         if key in self._peptide_cache:
             self._cache_hit += 1
             return self._peptide_cache[key]
         self._cache_miss += 1
-        protein_relation = PeptideProteinRelation(
-            key.start_position, key.end_position, key.protein_id, key.hypothesis_id)
-        glycosylation_sites_unoccupied = set(glycosylation_sites)
-        for site in list(glycosylation_sites_unoccupied):
-            if peptide_obj[site][1]:
-                glycosylation_sites_unoccupied.remove(site)
-        site_combinations = list(limiting_combinations(glycosylation_sites_unoccupied, glycan_combination.count))
-        result_set = [None for i in site_combinations]
-        for i, site_set in enumerate(site_combinations):
-            glycoform = peptide_obj.clone(share_cache=False)
-            glycoform.id = key._replace(site_combination_index=i)
-            glycoform.glycan = GlycanCompositionWithOffsetProxy(glycan_combination.composition)
-            for site in site_set:
-                glycoform.add_modification(site, core_type.name)
-            glycoform.protein_relation = protein_relation
-            if self.glycan_prior_model is not None:
-                glycoform.glycan_prior = self.glycan_prior_model.score(glycoform, key.structure_type)
-            result_set[i] = glycoform
-        result_set = Record.build(result_set)
+        total_mass = peptide_record.calculated_mass + self.glycan_mass(glycan_combination)
+        site_combinations = self.site_combinations(
+            peptide_record, glycosylation_sites, core_type, glycan_combination.count, peptide_obj)
+        result_set = [
+            LazyRecord(
+                key._replace(site_combination_index=i), total_mass,
+                (self, peptide_record, glycan_combination, site_set, core_type))
+            for i, site_set in enumerate(site_combinations)
+        ]
         self._peptide_cache[key] = result_set
         return result_set
 
+    def build_glycoform(self, record):
+        """Build the glycopeptide sequence a :class:`LazyRecord` describes.
+
+        Parameters
+        ----------
+        record : :class:`LazyRecord`
+
+        Returns
+        -------
+        :class:`~.FragmentCachingGlycopeptide`
+        """
+        _, peptide_record, glycan_combination, site_set, core_type = record.source
+        key = record.id
+        glycoform = self._get_peptide_object(peptide_record).clone(share_cache=False)
+        glycoform.id = key
+        glycoform.glycan = GlycanCompositionWithOffsetProxy(glycan_combination.composition)
+        for site in site_set:
+            glycoform.add_modification(site, core_type.name)
+        glycoform.protein_relation = PeptideProteinRelation(
+            key.start_position, key.end_position, key.protein_id, key.hypothesis_id)
+        if self.glycan_prior_model is not None:
+            glycoform.glycan_prior = self.glycan_prior_model.score(glycoform, key.structure_type)
+        return glycoform
+
+    def handle_glycan_combination(self, peptide_obj, peptide_record, glycan_combination,
+                                  glycosylation_sites, core_type):
+        result_set = self.handle_glycan_combination_keys(
+            peptide_record, glycan_combination, glycosylation_sites, core_type, peptide_obj)
+        for record in result_set:
+            record.materialize()
+        return result_set
+
     def _make_key(self, peptide_record, glycan_combination, structure_type=None):
         if structure_type is None:
             structure_type = self.default_structure_type
@@ -208,6 +316,9 @@ class GlycoformGeneratorBase(LoggingMixin):
         self._cache_hit = 0
         self._cache_miss = 0
         self._peptide_cache.clear()
+        self._peptide_object_cache.clear()
+        self._site_combination_cache.clear()
+        self._glycan_mass_cache.clear()
 
 
 class PeptideGlycosylator(GlycoformGeneratorBase):
@@ -236,35 +347,100 @@ class PeptideGlycosylator(GlycoformGeneratorBase):
         peptide_groups.clear()
         self.peptide_to_group_id = peptide_to_group_id
 
-    def handle_peptide_mass(self, peptide_mass, intact_mass, error_tolerance=1e-5):
+    def handle_peptide_mass(self, peptide_mass, intact_mass, error_tolerance=1e-5, precursor_error_tolerance=None):
+        """Find all glycopeptides made of a peptide with mass `peptide_mass` and a glycan
+        combination with mass ``intact_mass - peptide_mass``.
+
+        The returned records are :class:`LazyRecord` instances, whose sequences are only
+        built when they are first needed.
+
+        Parameters
+        ----------
+        peptide_mass : float
+            The predicted peptide mass
+        intact_mass : float
+            The glycopeptide's intact mass
+        error_tolerance : float
+            The PPM error tolerance to search the peptide and glycan combination masses with
+        precursor_error_tolerance : float, optional
+            If given, skip any peptide and glycan combination whose total mass is not within this
+            PPM error tolerance of `intact_mass` before producing any records for them
+
+        Returns
+        -------
+        list of :class:`LazyRecord`
+        """
         peptide_records = self.peptides.search_mass_ppm(peptide_mass, error_tolerance)
         glycan_mass = intact_mass - peptide_mass
         glycan_combinations = self.glycan_combinations.search_mass_ppm(glycan_mass, error_tolerance)
         result_set = []
         for peptide in peptide_records:
-            self._combinate(peptide, glycan_combinations, result_set)
+            self._combinate_keys(peptide, glycan_combinations, result_set, intact_mass, precursor_error_tolerance)
         # self.log(
         #     "... peptide mass %0.2f with intact mass %0.2f produced %d peptide matches, %d glycan"
         #     " matches, and %d combinations" % (
         #         peptide_mass, intact_mass, len(peptide_records), len(glycan_combinations), len(result_set)))
         return result_set
 
-    def _combinate(self, peptide, glycan_combinations, result_set=None):
+    def handle_peptide_mass_interval(self, peptide_lower, peptide_upper, glycan_lower, glycan_upper):
+        """Find all glycopeptides made of a peptide with a mass between `peptide_lower` and
+        `peptide_upper` and a glycan combination with a mass between `glycan_lower` and `glycan_upper`.
+
+        Parameters
+        ----------
+        peptide_lower : float
+        peptide_upper : float
+        glycan_lower : float
+        glycan_upper : float
+
+        Returns
+        -------
+        list of tuple
+            Triples of :class:`LazyRecord`, peptide mass and glycan combination mass, so that
+            the records can be filtered against a more specific query later.
+        """
+        if glycan_upper <= 0 or peptide_upper <= 0:
+            return []
+        peptide_records = self.peptides.search_between(max(peptide_lower, 0), peptide_upper)
+        glycan_combinations = self.glycan_combinations.search_between(max(glycan_lower, 0), glycan_upper)
+        result_set = []
+        for peptide in peptide_records:
+            for glycan_combination in glycan_combinations:
+                for record in self._combinate_keys(peptide, (glycan_combination, )):
+                    result_set.append(
+                        (record, peptide.calculated_mass, glycan_combination.dehydrated_mass))
+        return result_set
+
+    def _combinate_keys(self, peptide, glycan_combinations, result_set=None, intact_mass=None,
+                        precursor_error_tolerance=None):
         if result_set is None:
             result_set = []
-        peptide_obj = peptide.convert()
+        check_mass = intact_mass is not None and precursor_error_tolerance is not None
         for glycan_combination in glycan_combinations:
+            if check_mass:
+                total_mass = peptide.calculated_mass + self.glycan_mass(glycan_combination)
+                if abs(intact_mass - total_mass) / intact_mass > precursor_error_tolerance:
+                    continue
             for tp in glycan_combination.glycan_types:
                 tp = GlycosylationType[tp]
                 if tp is GlycosylationType.n_linked:
                     result_set.extend(
-                        self.handle_n_glycan(peptide_obj.clone(), peptide, glycan_combination))
+                        self.handle_glycan_combination_keys(
+                            peptide, glycan_combination, peptide.n_glycosylation_sites, _n_glycosylation))
                 elif tp is GlycosylationType.o_linked:
                     result_set.extend(
-                        self.handle_o_glycan(peptide_obj.clone(), peptide, glycan_combination))
+                        self.handle_glycan_combination_keys(
+                            peptide, glycan_combination, peptide.o_glycosylation_sites, _o_glycosylation))
                 elif tp is GlycosylationType.glycosaminoglycan:
                     result_set.extend(
-                        self.handle_gag_linker(peptide_obj.clone(), peptide, glycan_combination))
+                        self.handle_glycan_combination_keys(
+                            peptide, glycan_combination, peptide.gagylation_sites, _gag_linker_glycosylation))
+        return result_set
+
+    def _combinate(self, peptide, glycan_combinations, result_set=None):
+        result_set = self._combinate_keys(peptide, glycan_combinations, result_set)
+        for record in result_set:
+            record.materialize()
         return result_set
 
     def generate_crossproduct(self, lower_bound=0, upper_bound=float('inf')):
@@ -279,11 +455,11 @@ class PeptideGlycosylator(GlycoformGeneratorBase):
                 continue
             minimum_glycan_mass = max(lower_bound - peptide.calculated_mass, 0)
             glycan_combinations = self.glycan_combinations.search_between(minimum_glycan_mass, glycan_mass_limit + 10)
-            for solution in self._combinate(peptide, glycan_combinations):
+            for solution in self._combinate_keys(peptide, glycan_combinations):
                 total_mass = solution.total_mass
                 if total_mass < lower_bound or total_mass > upper_bound:
                     continue
-                yield solution
+                yield solution.materialize()
 
     def reset(self, **kwargs):
         super(PeptideGlycosylator, self).reset(**kwargs)
@@ -308,11 +484,116 @@ class DynamicGlycopeptideSearchBase(LoggingMixin):
                 self.peptide_glycosylator.peptide_to_group_id[hit.id.peptide_id]].add(hit.id)
 
 
+class PeptideMassCandidateMemo(object):
+    """Remembers the glycopeptide candidates of quantized (peptide mass, intact mass) bins, so
+    that scans which predict the same peptide mass at nearly the same precursor mass do not
+    repeat the peptide and glycan combination searches.
+
+    Each bin spans a relative width of :attr:`error_tolerance` in both dimensions. The first
+    query to land in a bin searches for every candidate any query in that bin could match, and
+    each query then filters the bin's candidates down to exactly those
+    :meth:`PeptideGlycosylator.handle_peptide_mass` would have produced.
+
+    Attributes
+    ----------
+    peptide_glycosylator : :class:`PeptideGlycosylator`
+        The candidate generator to populate bins with
+    error_tolerance : float
+        The PPM error tolerance peptide and glycan combination masses are matched with
+    bins : :class:`~.LRUMapping`
+        The candidates of each populated bin
+    hits : int
+        The number of queries answered from an already populated bin
+    misses : int
+        The number of queries which had to populate a bin
+    """
+
+    def __init__(self, peptide_glycosylator, error_tolerance=2e-5, max_size=2 ** 12):
+        self.peptide_glycosylator = peptide_glycosylator
+        self.error_tolerance = error_tolerance
+        self.bins = LRUMapping(max_size)
+        self.hits = 0
+        self.misses = 0
+
+    def bin_index(self, mass):
+        return int(math.log(mass) / self.error_tolerance)
+
+    def bin_bounds(self, index):
+        return math.exp(index * self.error_tolerance), math.exp((index + 1) * self.error_tolerance)
+
+    def _populate(self, peptide_bin, intact_bin):
+        peptide_lo, peptide_hi = self.bin_bounds(peptide_bin)
+        intact_lo, intact_hi = self.bin_bounds(intact_bin)
+        # Pad each window by twice the error tolerance to absorb rounding at the bin edges,
+        # the exact criteria are applied in :meth:`search`
+        pad = self.error_tolerance * 2
+        return self.peptide_glycosylator.handle_peptide_mass_interval(
+            peptide_lo * (1 - pad), peptide_hi * (1 + pad),
+            (intact_lo - peptide_hi) * (1 - pad), (intact_hi - peptide_lo) * (1 + pad))
+
+    def search(self, peptide_mass, intact_mass, precursor_error_tolerance=None):
+        """Find all glycopeptides made of a peptide with mass `peptide_mass` and a glycan
+        combination with mass ``intact_mass - peptide_mass``, like
+        :meth:`PeptideGlycosylator.handle_peptide_mass`.
+
+        Parameters
+        ----------
+        peptide_mass : float
+            The predicted peptide mass
+        intact_mass : float
+            The glycopeptide's intact mass
+        precursor_error_tolerance : float, optional
+            If given, skip any candidate whose total mass is not within this PPM error
+            tolerance of `intact_mass`
+
+        Returns
+        -------
+        list of :class:`LazyRecord`
+        """
+        glycan_mass = intact_mass - peptide_mass
+        if glycan_mass <= 0 or peptide_mass <= 0:
+            return []
+        key = (self.bin_index(peptide_mass), self.bin_index(intact_mass))
+        try:
+            candidates = self.bins[key]
+            self.hits += 1
+        except KeyError:
+            candidates = self._populate(*key)
+            self.bins[key] = candidates
+            self.misses += 1
+        peptide_width = peptide_mass * self.error_tolerance
+        glycan_width = glycan_mass * self.error_tolerance
+        check_mass = precursor_error_tolerance is not None
+        result_set = []
+        for record, candidate_peptide_mass, candidate_glycan_mass in candidates:
+            if abs(candidate_peptide_mass - peptide_mass) > peptide_width:
+                continue
+            if abs(candidate_glycan_mass - glycan_mass) > glycan_width:
+                continue
+            if check_mass and abs(intact_mass - record.total_mass) / intact_mass > precursor_error_tolerance:
+                continue
+            result_set.append(record)
+        return result_set
+
+    def clear(self):
+        self.bins.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.bins)
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({size} bins, hits={self.hits}, misses={self.misses})".format(
+            self=self, size=len(self))
+
+
 class PredictiveGlycopeptideSearch(DynamicGlycopeptideSearchBase):
 
     def __init__(self, peptide_glycosylator, product_error_tolerance=2e-5, glycan_score_threshold=0.1,
                  min_fragments=2, peptide_masses_per_scan=100,
-                 probing_range_for_missing_precursors=3, trust_precursor_fits=True):
+                 probing_range_for_missing_precursors=3, trust_precursor_fits=True,
+                 candidate_memo_size=2 ** 12):
         if min_fragments is None:
             min_fragments = 2
         self.peptide_glycosylator = peptide_glycosylator
@@ -325,6 +606,35 @@ class PredictiveGlycopeptideSearch(DynamicGlycopeptideSearchBase):
         self.peptide_masses_per_scan = peptide_masses_per_scan
         self.probing_range_for_missing_precursors = probing_range_for_missing_precursors
         self.trust_precursor_fits = trust_precursor_fits
+        if candidate_memo_size:
+            self.candidate_memo = PeptideMassCandidateMemo(
+                self.peptide_glycosylator, product_error_tolerance, candidate_memo_size)
+        else:
+            self.candidate_memo = None
+
+    def reset(self):
+        super(PredictiveGlycopeptideSearch, self).reset()
+        if self.candidate_memo is not None:
+            self.candidate_memo.clear()
+
+    def find_candidates(self, peptide_mass, intact_mass, precursor_error_tolerance=None):
+        """Find all glycopeptides made of a peptide with mass `peptide_mass` whose intact
+        mass is `intact_mass`, using :attr:`candidate_memo` if it is enabled.
+
+        Parameters
+        ----------
+        peptide_mass : float
+        intact_mass : float
+        precursor_error_tolerance : float, optional
+
+        Returns
+        -------
+        list of :class:`LazyRecord`
+        """
+        if self.candidate_memo is not None:
+            return self.candidate_memo.search(peptide_mass, intact_mass, precursor_error_tolerance)
+        return self.peptide_glycosylator.handle_peptide_mass(
+            peptide_mass, intact_mass, self.product_error_tolerance, precursor_error_tolerance)
 
     def handle_scan_group(self, group, precursor_error_tolerance=1e-5, mass_shifts=None, workload=None):
         if mass_shifts is None or not mass_shifts:
@@ -335,7 +645,7 @@ class PredictiveGlycopeptideSearch(DynamicGlycopeptideSearchBase):
         glycan_score_threshold = self.glycan_score_threshold
         min_fragments = self.min_fragments
         estimate_peptide_mass = self.peptide_mass_predictor.estimate_peptide_mass
-        handle_peptide_mass = self.peptide_glycosylator.handle_peptide_mass
+        handle_peptide_mass = self.find_candidates
         peptide_masses_per_scan = self.peptide_masses_per_scan
         for scan in group:
             workload.add_scan(scan)
@@ -361,7 +671,7 @@ class PredictiveGlycopeptideSearch(DynamicGlycopeptideSearchBase):
                                                                    simplify=False):
                         peptide_mass = peptide_mass_pred.peptide_mass
                         n_peptide_masses += 1
-                        for candidate in handle_peptide_mass(peptide_mass, intact_mass, self.product_error_tolerance):
+                        for candidate in handle_peptide_mass(peptide_mass, intact_mass, precursor_error_tolerance):
                             n_glycopeptides += 1
                             key = (candidate.id, mass_shift_name)
                             mass_threshold_passed = (
@@ -606,6 +916,89 @@ class Record(object):
         return inst
 
 
+class LazyRecord(Record):
+    """A :class:`Record` whose glycopeptide sequence and glycan prior are not computed
+    until they are first requested.
+
+    Its :attr:`id` and :attr:`total_mass` are known up front, so candidates can be
+    de-duplicated and filtered by precursor mass without building any sequences.
+
+    Attributes
+    ----------
+    source : tuple
+        The :class:`GlycoformGeneratorBase`, peptide record, glycan combination, site
+        combination and glycosylation core type to build the glycopeptide from, or
+        :const:`None` once the glycopeptide has been built.
+    """
+    __slots__ = ('_glycopeptide', '_glycan_prior', 'source')
+
+    def __init__(self, id=None, total_mass=0, source=None):
+        self.id = id
+        self.total_mass = total_mass
+        self.source = source
+        self._glycopeptide = None
+        self._glycan_prior = None
+
+    def materialize(self):
+        if self.source is not None:
+            glycoform = self.source[0].build_glycoform(self)
+            if self._glycopeptide is None:
+                self._glycopeptide = str(glycoform)
+            if self._glycan_prior is None:
+                self._glycan_prior = glycoform.glycan_prior
+            self.source = None
+        else:
+            if self._glycopeptide is None:
+                self._glycopeptide = ''
+            if self._glycan_prior is None:
+                self._glycan_prior = 0.0
+        return self
+
+    @property
+    def glycopeptide(self):
+        if self._glycopeptide is None:
+            self.materialize()
+        return self._glycopeptide
+
+    @glycopeptide.setter
+    def glycopeptide(self, value):
+        self._glycopeptide = value
+
+    @property
+    def glycan_prior(self):
+        if self._glycan_prior is None:
+            self.materialize()
+        return self._glycan_prior
+
+    @glycan_prior.setter
+    def glycan_prior(self, value):
+        self._glycan_prior = value
+
+    def __repr__(self):
+        if self._glycopeptide is None:
+            return "LazyRecord(%r)" % (self.id, )
+        return "LazyRecord(%s)" % self._glycopeptide
+
+    def __setstate__(self, state):
+        self.source = None
+        super(LazyRecord, self).__setstate__(state)
+
+    def _copy_with_id(self, new_id):
+        inst = self.__class__(new_id, self.total_mass, self.source)
+        inst._glycopeptide = self._glycopeptide
+        # Like :meth:`Record.copy`, copies do not carry over the glycan prior
+        inst._glycan_prior = 0.0
+        return inst
+
+    def copy(self, structure_type=None):
+        if structure_type is None:
+            structure_type = self.id.structure_type
+        return self._copy_with_id(self.id.copy(structure_type))
+
+    def to_decoy_glycan(self):
+        return self._copy_with_id(self.id.to_decoy_glycan())
+
+
 class SharedCacheAwareDecoyFragmentCachingGlycopeptide(DecoyFragmentCachingGlycopeptide):
 
     def stub_fragments(self, *args, **kwargs):
@@ -177,6 +177,13 @@ class StructureMapper(TaskExecutionSequence):
         total = hits + misses
         if total > 0:
             self.log("... Cache Performance: %d / %d (%0.2f%%)" % (hits, total, hits / float(total) * 100.0))
+        candidate_memo = getattr(predictive_search, "candidate_memo", None)
+        if candidate_memo is not None:
+            hits = candidate_memo.hits
+            total = hits + candidate_memo.misses
+            if total > 0:
+                self.log("... Candidate Memo Performance: %d / %d (%0.2f%%) over %d Bins" % (
+                    hits, total, hits / float(total) * 100.0, len(candidate_memo)))
 
     def _prepare_scan(self, scan):
         try:
@@ -371,10 +378,18 @@ class SpectrumMatcher(TaskExecutionSequence):
         This task may spin up additional processes if :attr:`n_processes` is greater than
         1, but it must be ~4 or better usually to have an appreciable speedup compared to
         a executing the matching in serial. IPC communication is expensive, no matter what.
+
+    When :attr:`prune_candidates` is set, each spectrum-structure pair's score is first bounded
+    from above, and pairs whose bound is below the minimum score of the solution set's retention
+    method are not scored, since :meth:`~.SpectrumSolutionSet.threshold` would discard them anyway.
+
+    When :attr:`n_threads_per_process` is greater than 1, each worker process evaluates
+    structures on that many threads sharing its copy of the scans.
     """
     def __init__(self, workload, group_i, group_n, scorer_type=None,
                  ipc_manager=None, n_processes=6, mass_shifts=None,
-                 evaluation_kwargs=None, cache_seeds=None, **kwargs):
+                 evaluation_kwargs=None, cache_seeds=None, prune_candidates=True,
+                 n_threads_per_process=1, **kwargs):
         if scorer_type is None:
             scorer_type = LogIntensityScorer
         if evaluation_kwargs is None:
@@ -391,6 +406,16 @@ class SpectrumMatcher(TaskExecutionSequence):
         self.ipc_manager = ipc_manager
         self.n_processes = n_processes
         self.cache_seeds = cache_seeds
+        self.prune_candidates = prune_candidates
+        self.n_threads_per_process = n_threads_per_process
+
+    def _get_evaluation_kwargs(self, matcher):
+        evaluation_kwargs = dict(self.evaluation_kwargs)
+        if self.prune_candidates:
+            minimum_score = matcher.solution_set_type.default_selection_method.minimum_score()
+            if minimum_score is not None:
+                evaluation_kwargs.setdefault("prune_below_score", minimum_score)
+        return evaluation_kwargs
 
     def score_spectra(self):
         matcher = MultiScoreGlycopeptideMatcher(
@@ -398,7 +423,9 @@ class SpectrumMatcher(TaskExecutionSequence):
             ipc_manager=self.ipc_manager,
             n_processes=self.n_processes,
             mass_shifts=self.mass_shifts,
-            cache_seeds=self.cache_seeds)
+            cache_seeds=self.cache_seeds,
+            n_threads_per_process=self.n_threads_per_process)
+        evaluation_kwargs = self._get_evaluation_kwargs(matcher)
 
         target_solutions = []
         self.log("... %0.2f%%" % (max((self.group_i - 1), 0) * 100.0 / self.group_n), self.workload)
@@ -415,7 +442,7 @@ class SpectrumMatcher(TaskExecutionSequence):
                 ((running_total_work + batch.batch_size) * 100.) / float(total_work + 1)))
             running_total_work += batch.batch_size
             target_scan_solution_map = matcher._evaluate_hit_groups(
-                batch, **self.evaluation_kwargs)
+                batch, **evaluation_kwargs)
             temp = matcher._collect_scan_solutions(
                 target_scan_solution_map, batch.scan_map)
             temp = [case for case in temp if len(case) > 0]
@@ -446,7 +473,7 @@ class MatcherExecutor(TaskExecutionSequence):
     """
     def __init__(self, in_queue, out_queue, in_done_event, scorer_type=None, ipc_manager=None,
                  n_processes=6, mass_shifts=None, evaluation_kwargs=None, cache_seeds=None,
-                 **kwargs):
+                 prune_candidates=True, **kwargs):
         if scorer_type is None:
             scorer_type = LogIntensityScorer
         if evaluation_kwargs is None:
@@ -465,6 +492,7 @@ class MatcherExecutor(TaskExecutionSequence):
         self.n_processes = n_processes
         self.ipc_manager = ipc_manager
         self.cache_seeds = cache_seeds
+        self.prune_candidates = prune_candidates
 
     def configure_task(self, matcher_task):
         matcher_task.ipc_manager = self.ipc_manager
@@ -473,6 +501,7 @@ class MatcherExecutor(TaskExecutionSequence):
         matcher_task.evaluation_kwargs = self.evaluation_kwargs
         matcher_task.mass_shifts = self.mass_shifts
         matcher_task.mass_shift_map = {m.name: m for m in self.mass_shifts}
+        matcher_task.prune_candidates = self.prune_candidates
         return matcher_task
 
     def execute_task(self, matcher_task):
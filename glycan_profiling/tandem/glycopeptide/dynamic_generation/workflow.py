@@ -159,7 +159,7 @@ class MultipartGlycopeptideIdentifier(TaskBase):
                  probing_range_for_missing_precursors=3, trust_precursor_fits=True,
                  glycan_score_threshold=1.0, peptide_masses_per_scan=100,
                  fdr_estimation_strategy=None, glycosylation_site_models_path=None,
-                 cache_seeds=None, n_mapping_workers=1, **kwargs):
+                 cache_seeds=None, n_mapping_workers=1, prune_candidates=True, **kwargs):
         if fdr_estimation_strategy is None:
             fdr_estimation_strategy = GlycopeptideFDREstimationStrategy.multipart_gamma_gaussian_mixture
         if scorer_type is None:
@@ -209,6 +209,7 @@ class MultipartGlycopeptideIdentifier(TaskBase):
         self.n_mapping_workers = n_mapping_workers
         self.ipc_manager = ipc_manager
         self.cache_seeds = cache_seeds
+        self.prune_candidates = prune_candidates
 
         self.file_manager = file_manager
         self.journal_path = self.file_manager.get('glycopeptide-match-journal')
@@ -330,7 +331,8 @@ class MultipartGlycopeptideIdentifier(TaskBase):
                 evaluation_kwargs=self.evaluation_kwargs,
                 error_tolerance=self.product_error_tolerance,
                 cache_seeds=self.cache_seeds,
-                mass_shifts=self.mass_shifts)
+                mass_shifts=self.mass_shifts,
+                prune_candidates=self.prune_candidates)
             execution_branches.append(branch)
         del scorer_type_payload
         del predictive_search_payload
@@ -468,7 +470,7 @@ class IdentificationWorker(TaskExecutionSequence):
                  scan_loader=None, target_predictive_search=None, decoy_predictive_search=None,
                  # Matching Executor Parameters
                  n_processes=4, scorer_type=None, evaluation_kwargs=None, error_tolerance=None, cache_seeds=None,
-                 mass_shifts=None, ):
+                 mass_shifts=None, prune_candidates=True):
         self.name = name
         self.ipc_manager_address = ipc_manager_address
         self.input_batch_queue = input_batch_queue
@@ -489,6 +491,7 @@ class IdentificationWorker(TaskExecutionSequence):
         self.error_tolerance = error_tolerance
         self.cache_seeds = cache_seeds
         self.mass_shifts = mass_shifts
+        self.prune_candidates = prune_candidates
         self.results_processed = multiprocessing.Value(ctypes.c_uint64)
 
     def _get_repr_details(self):
@@ -531,7 +534,8 @@ class IdentificationWorker(TaskExecutionSequence):
             mass_shifts=self.mass_shifts,
             evaluation_kwargs=self.evaluation_kwargs,
             error_tolerance=self.error_tolerance,
-            cache_seeds=self.cache_seeds
+            cache_seeds=self.cache_seeds,
+            prune_candidates=self.prune_candidates
         )
 
         journal_writer = JournalFileWriter(self.journal_path)
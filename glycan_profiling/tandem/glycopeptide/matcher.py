@@ -71,18 +71,19 @@ class GlycopeptideIdentificationWorker(GlycopeptideSpectrumGroupEvaluatorMixin,
 
     def __init__(self, input_queue, output_queue, producer_done_event, consumer_done_event,
                  scorer_type, evaluation_args, spectrum_map, mass_shift_map, log_handler,
-                 parser_type, solution_packer, cache_seeds=None):
+                 parser_type, solution_packer, cache_seeds=None, n_threads=1):
         if cache_seeds is None:
             cache_seeds = {}
         SpectrumIdentificationWorkerBase.__init__(
             self, input_queue, output_queue, producer_done_event, consumer_done_event,
             scorer_type, evaluation_args, spectrum_map, mass_shift_map,
-            log_handler=log_handler, solution_packer=solution_packer)
+            log_handler=log_handler, solution_packer=solution_packer, n_threads=n_threads)
         self.parser = parser_type()
         self.cache_seeds = cache_seeds
 
     def evaluate(self, scan, structure, evaluation_context=None, *args, **kwargs):
-        target = self.parser(structure)
+        with self._thread_guard():
+            target = self.parser(structure)
         if evaluation_context is not None:
             evaluation_context(target)
         matcher = self.scorer_type.evaluate(scan, target, *args, **kwargs)
@@ -129,7 +130,8 @@ class GlycopeptideMatcher(GlycopeptideSpectrumGroupEvaluatorMixin, PeptideMassFi
     def __init__(self, tandem_cluster, scorer_type, structure_database, parser_type=None,
                  n_processes=5, ipc_manager=None, probing_range_for_missing_precursors=3,
                  mass_shifts=None, batch_size=DEFAULT_WORKLOAD_MAX, peptide_mass_filter=None,
-                 trust_precursor_fits=True, cache_seeds=None, sequence_type=None):
+                 trust_precursor_fits=True, cache_seeds=None, sequence_type=None,
+                 n_threads_per_process=1):
         if parser_type is None:
             parser_type = self._default_parser_type()
         if sequence_type is None:
@@ -145,6 +147,7 @@ class GlycopeptideMatcher(GlycopeptideSpectrumGroupEvaluatorMixin, PeptideMassFi
         self.parser = None
         self.reset_parser()
         self.cache_seeds = cache_seeds
+        self.n_threads_per_process = n_threads_per_process
 
     def _default_sequence_type(self):
         return FragmentCachingGlycopeptide
@@ -175,7 +178,8 @@ class GlycopeptideMatcher(GlycopeptideSpectrumGroupEvaluatorMixin, PeptideMassFi
     def _worker_specification(self):
         return GlycopeptideIdentificationWorker, {
             "parser_type": ParserClosure(self.parser_type, self.sequence_type),
-            "cache_seeds": self.cache_seeds
+            "cache_seeds": self.cache_seeds,
+            "n_threads": self.n_threads_per_process
         }
 
 
@@ -38,8 +38,14 @@ class GlycopeptideSpectrumMatcherBase(SpectrumMatcherBase):
             fragments = self.target.stub_fragments(extended=True)
         else:
             fragments = self.target.stub_fragments(extended=True, extended_fucosylation=True)
-        for frag in fragments:
-            for peak in self.spectrum.all_peaks_for(frag.mass, error_tolerance):
+        peak_index = self.peak_index
+        fragments = list(fragments)
+        peak_groups = peak_index.peaks_for_masses([frag.mass for frag in fragments], error_tolerance)
+        if chemical_shift is not None:
+            shifted_peak_groups = peak_index.peaks_for_masses(
+                [frag.mass + self.mass_shift.tandem_mass for frag in fragments], error_tolerance)
+        for i, frag in enumerate(fragments):
+            for peak in peak_groups[i]:
                 # should we be masking these? peptides which have amino acids which are
                 # approximately the same mass as a monosaccharide unit at ther terminus
                 # can produce cases where a stub ion and a backbone fragment match the
@@ -48,8 +54,7 @@ class GlycopeptideSpectrumMatcherBase(SpectrumMatcherBase):
                 masked_peaks.add(peak.index.neutral_mass)
                 self.solution_map.add(peak, frag)
             if chemical_shift is not None:
-                shifted_mass = frag.mass + self.mass_shift.tandem_mass
-                for peak in self.spectrum.all_peaks_for(shifted_mass, error_tolerance):
+                for peak in shifted_peak_groups[i]:
                     masked_peaks.add(peak.index.neutral_mass)
                     shifted_frag = frag.clone()
                     shifted_frag.chemical_shift = chemical_shift
@@ -61,15 +66,63 @@ class GlycopeptideSpectrumMatcherBase(SpectrumMatcherBase):
         fragments = self.target.get_fragments(series, strategy=strategy)
         return fragments
 
+    def _backbone_peak_matches(self, series, error_tolerance=2e-5, strategy=None, include_neutral_losses=False):
+        """Match each fragment of `series` against :attr:`spectrum`, without any peak masking.
+
+        The fragments of the peptide backbone do not depend upon the glycan, so when
+        :attr:`target` shares its fragment caching context with the other glycoforms of
+        its peptide, the matches are computed once per scan and re-used by each of them.
+        The glycan-dependent peak masking is applied by each caller.
+
+        Parameters
+        ----------
+        series : :class:`~.IonSeries`
+        error_tolerance : float
+        strategy : type
+        include_neutral_losses : bool
+
+        Returns
+        -------
+        list of tuple
+            A (fragments, peak tuples) pair for each position along the backbone, in the
+            order :meth:`get_fragments` produces them.
+        """
+        try:
+            caches = self.target.fragment_caches
+            key = ('backbone_peak_matches', self.scan.id, str(series), strategy,
+                   include_neutral_losses, error_tolerance)
+        except AttributeError:
+            caches = key = None
+        if caches is not None:
+            try:
+                return caches[key]
+            except KeyError:
+                pass
+        positions = [list(frags) for frags in self.get_fragments(
+            series, strategy=strategy, include_neutral_losses=include_neutral_losses)]
+        # Match the whole series against the spectrum in one batch
+        peak_groups = self.peak_index.peaks_for_masses(
+            [frag.mass for frags in positions for frag in frags], error_tolerance)
+        result = []
+        offset = 0
+        for frags in positions:
+            n = len(frags)
+            result.append((frags, peak_groups[offset:offset + n]))
+            offset += n
+        if caches is not None:
+            caches[key] = result
+        return result
+
     def _match_backbone_series(self, series, error_tolerance=2e-5, masked_peaks=None, strategy=None,
                                include_neutral_losses=False):
         if strategy is None:
             strategy = HCDFragmentationStrategy
         if masked_peaks is None:
             masked_peaks = set()
-        for frags in self.get_fragments(series, strategy=strategy, include_neutral_losses=include_neutral_losses):
-            for frag in frags:
-                for peak in self.spectrum.all_peaks_for(frag.mass, error_tolerance):
+        for frags, peak_groups in self._backbone_peak_matches(
+                series, error_tolerance, strategy, include_neutral_losses):
+            for frag, peaks in zip(frags, peak_groups):
+                for peak in peaks:
                     if peak.index.neutral_mass in masked_peaks:
                         continue
                     self.solution_map.add(peak, frag)
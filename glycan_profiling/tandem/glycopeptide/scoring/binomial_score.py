@@ -62,8 +62,9 @@ def median_sorted(numbers):
         return (n - 1) // 2, numbers[(n - 1) // 2]
 
 
-def medians(array):
-    array.sort()
+def medians(array, presorted=False):
+    if not presorted:
+        array.sort()
     offset, m1 = median_sorted(array)
     offset += 1
     i, m2 = median_sorted(array[offset:])
@@ -95,9 +96,12 @@ def _counting_tiers(peak_list, matched_peaks, total_product_ion_count):
     return counts
 
 
-def _intensity_tiers(peak_list, matched_peaks, total_product_ion_count):
-    intensity_list = np.array([p.intensity for p in peak_list])
-    m1, m2, m3, m4 = medians(intensity_list)
+def _intensity_tiers(peak_list, matched_peaks, total_product_ion_count, sorted_intensities=None):
+    if sorted_intensities is None:
+        intensity_list = np.array([p.intensity for p in peak_list])
+        m1, m2, m3, m4 = medians(intensity_list)
+    else:
+        m1, m2, m3, m4 = medians(sorted_intensities, presorted=True)
 
     matched_intensities = np.array(
         [p.intensity for p, _ in matched_peaks])
@@ -187,10 +191,10 @@ def _score_tiers(peak_list, matched_peaks, total_product_ion_count):
     return counts
 
 
-def binomial_intensity(peak_list, matched_peaks, total_product_ion_count):
+def binomial_intensity(peak_list, matched_peaks, total_product_ion_count, sorted_intensities=None):
     if len(matched_peaks) == 0:
         return np.exp(0)
-    counts = _intensity_tiers(peak_list, matched_peaks, total_product_ion_count)
+    counts = _intensity_tiers(peak_list, matched_peaks, total_product_ion_count, sorted_intensities)
 
     prod = 0
     for k, v in counts.items():
@@ -213,22 +217,31 @@ class BinomialSpectrumMatcher(GlycopeptideSpectrumMatcherBase):
         self._init_binomial()
 
     def _init_binomial(self):
-        self._sanitized_spectrum = set(self.spectrum)
+        self._oxonium_peak_indices = set()
         self.n_theoretical = 0
 
+    @property
+    def _sanitized_spectrum(self):
+        masked = self._oxonium_peak_indices
+        return {peak for peak in self.spectrum if peak.index.neutral_mass not in masked}
+
+    def _sanitized_intensities(self):
+        return self.peak_index.sorted_intensities(self._oxonium_peak_indices)
+
     def _match_oxonium_ions(self, error_tolerance=2e-5, masked_peaks=None):
         if masked_peaks is None:
             masked_peaks = set()
         val = super(BinomialSpectrumMatcher, self)._match_oxonium_ions(
             error_tolerance=error_tolerance, masked_peaks=masked_peaks)
-        self._sanitized_spectrum -= {self.spectrum[i] for i in masked_peaks}
+        self._oxonium_peak_indices.update(masked_peaks)
         return val
 
     def _match_backbone_series(self, series, error_tolerance=2e-5, masked_peaks=None, strategy=None,
                                include_neutral_losses=False):
         if strategy is None:
             strategy = HCDFragmentationStrategy
-        for frags in self.get_fragments(series, strategy=strategy, include_neutral_losses=include_neutral_losses):
+        for frags, peak_groups in self._backbone_peak_matches(
+                series, error_tolerance, strategy, include_neutral_losses):
             # Should this be on the level of position, or the level of the individual fragment ions?
             # At the level of position, this makes missing only glycosylated or unglycosylated ions
             # less punishing, while at the level of the fragment makes more sense by the definition
@@ -236,8 +249,8 @@ class BinomialSpectrumMatcher(GlycopeptideSpectrumMatcherBase):
             #
             # Using the less severe case to be less pessimistic
             self.n_theoretical += 1
-            for frag in frags:
-                for peak in self.spectrum.all_peaks_for(frag.mass, error_tolerance):
+            for frag, peaks in zip(frags, peak_groups):
+                for peak in peaks:
                     if peak.index.neutral_mass in masked_peaks:
                         continue
                     self.solution_map.add(peak, frag)
@@ -270,9 +283,10 @@ class BinomialSpectrumMatcher(GlycopeptideSpectrumMatcherBase):
 
     def _intensity_component_binomial(self):
         intensity_component = binomial_intensity(
-            self._sanitized_spectrum,
+            None,
             self._sanitize_solution_map(),
-            self.n_theoretical)
+            self.n_theoretical,
+            self._sanitized_intensities())
 
         if intensity_component < 1e-170:
             intensity_component = 1e-170
@@ -283,7 +297,8 @@ class BinomialSpectrumMatcher(GlycopeptideSpectrumMatcherBase):
 
         solution_map = self._sanitize_solution_map()
         n_matched = len(solution_map)
-        if n_matched == 0 or len(self._sanitized_spectrum) == 0:
+        sanitized_intensities = self._sanitized_intensities()
+        if n_matched == 0 or len(sanitized_intensities) == 0:
             return 0
 
         fragment_match_component = binomial_fragments_matched(
@@ -297,9 +312,10 @@ class BinomialSpectrumMatcher(GlycopeptideSpectrumMatcherBase):
             fragment_match_component = 1e-170
 
         intensity_component = binomial_intensity(
-            self._sanitized_spectrum,
+            None,
             solution_map,
-            self.n_theoretical)
+            self.n_theoretical,
+            sanitized_intensities)
 
         if intensity_component < 1e-170:
             intensity_component = 1e-170
@@ -133,13 +133,13 @@ class GlycanCompositionSignatureMatcher(GlycopeptideSpectrumMatcherBase):
             return
         self.maximum_intensity = self.base_peak()
         water = _water
-        spectrum = self.spectrum
+        peaks_for_masses = self.peak_index.peaks_for_masses
 
         for mono in self.signatures:
             is_expected = mono.is_expected(self.glycan_composition)
             peak = ()
-            for mass in mono.masses:
-                peak += spectrum.all_peaks_for(mass, error_tolerance)
+            for match in peaks_for_masses(mono.masses, error_tolerance):
+                peak += match
             if peak:
                 peak = base_peak_tuple(peak)
             else:
@@ -155,8 +155,8 @@ class GlycanCompositionSignatureMatcher(GlycopeptideSpectrumMatcherBase):
             for compound in self.compound_signatures:
                 is_expected = compound.is_expected(self.glycan_composition)
                 peak = ()
-                for mass in compound.masses:
-                    peak += spectrum.all_peaks_for(mass, error_tolerance)
+                for match in peaks_for_masses(compound.masses, error_tolerance):
+                    peak += match
                 if peak:
                     peak = base_peak_tuple(peak)
                 else:
@@ -2,6 +2,7 @@ import math
 import numpy as np
 
 from glycopeptidepy.structure.fragment import IonSeries
+from glycopeptidepy.structure.fragmentation_strategy import EXDFragmentationStrategy, HCDFragmentationStrategy
 
 from .base import ModelTreeNode
 from .precursor_mass_accuracy import MassAccuracyMixin
@@ -26,14 +27,14 @@ class LogIntensityScorer(SignatureAwareCoverageScorer, MassAccuracyMixin):
         return self._score
 
     def calculate_peptide_score(self, error_tolerance=2e-5, coverage_weight=1.0, *args, **kwargs):
-        total = 0
         series_set = {IonSeries.b, IonSeries.y, IonSeries.c, IonSeries.z}
-        seen = set()
+        peak_indices = []
+        mass_errors = []
         for peak_pair in self.solution_map:
-            peak = peak_pair.peak
             if peak_pair.fragment.get_series() in series_set:
-                seen.add(peak.index.neutral_mass)
-                total += np.log10(peak.intensity) * (1 - (abs(peak_pair.mass_accuracy()) / error_tolerance) ** 4)
+                peak_indices.append(peak_pair.peak.index.neutral_mass)
+                mass_errors.append(peak_pair.mass_accuracy())
+        total = self.peak_index.weighted_log_intensity_sum(peak_indices, mass_errors, error_tolerance)
         n_term, c_term = self._compute_coverage_vectors()[:2]
         coverage_score = ((n_term + c_term[::-1])).sum() / float((2 * len(self.target) - 1))
         score = total * coverage_score ** coverage_weight
@@ -54,9 +55,10 @@ class LogIntensityScorer(SignatureAwareCoverageScorer, MassAccuracyMixin):
             if not frag.is_extended:
                 core_fragments.add(frag.name)
 
-        total = 0
         core_matches = set()
         extended_matches = set()
+        peak_indices = []
+        mass_errors = []
 
         for peak_pair in self.solution_map:
             if peak_pair.fragment.series != series:
@@ -69,7 +71,9 @@ class LogIntensityScorer(SignatureAwareCoverageScorer, MassAccuracyMixin):
             peak = peak_pair.peak
             if peak.index.neutral_mass not in seen:
                 seen.add(peak.index.neutral_mass)
-                total += np.log10(peak.intensity) * (1 - (abs(peak_pair.mass_accuracy()) / error_tolerance) ** 4)
+                peak_indices.append(peak.index.neutral_mass)
+                mass_errors.append(peak_pair.mass_accuracy())
+        total = self.peak_index.weighted_log_intensity_sum(peak_indices, mass_errors, error_tolerance)
         glycan_composition = self.target.glycan_composition
         n = self._get_internal_size(glycan_composition)
         k = 2.0
@@ -89,6 +93,91 @@ class LogIntensityScorer(SignatureAwareCoverageScorer, MassAccuracyMixin):
             return 0
         return score
 
+    def score_upper_bound(self, error_tolerance=2e-5, peptide_weight=0.65, *args, **kwargs):
+        """Bound :meth:`calculate_score` from above using only the peaks which the stub
+        glycopeptide and backbone fragments of :attr:`target` could match, without
+        building :attr:`solution_map`.
+
+        Every matched peak is credited with its full log intensity, the peptide and
+        core glycan coverage are computed as if no peak were masked, and the glycan
+        signature ion component, which is never positive, is taken to be zero. The
+        backbone matches are stored in the target's fragment cache, so a match which
+        is not pruned does not repeat them in :meth:`match`.
+
+        Parameters
+        ----------
+        error_tolerance : float
+            The product ion mass error tolerance
+        peptide_weight : float
+            The weight of the peptide score, as in :meth:`calculate_score`
+
+        Returns
+        -------
+        float
+        """
+        coverage_weight = kwargs.get("coverage_weight", 1.0)
+        core_weight = kwargs.get("core_weight", 0.4)
+        include_neutral_losses = kwargs.get("include_neutral_losses", False)
+        extended_glycan_search = kwargs.get("extended_glycan_search", False)
+        peak_index = self.peak_index
+
+        is_hcd = self.is_hcd()
+        is_exd = self.is_exd()
+        if not is_hcd and not is_exd:
+            is_hcd = True
+
+        stub_peaks = set()
+        glycan_bound = 0.0
+        if is_hcd:
+            if not extended_glycan_search:
+                fragments = list(self.target.stub_fragments(extended=True))
+            else:
+                fragments = list(self.target.stub_fragments(extended=True, extended_fucosylation=True))
+            masses = [frag.mass for frag in fragments]
+            if self.mass_shift.tandem_mass != 0:
+                masses.extend([mass + self.mass_shift.tandem_mass for mass in masses])
+            query_indices, peak_indices = peak_index.match_masses(masses, error_tolerance)
+            stub_peaks.update(peak_indices.tolist())
+            # Each matched theoretical fragment contributes at most one distinct name
+            # to the core or extended matches
+            n_matched = len(set(query_indices.tolist()))
+            n_core = len({frag.name for frag in fragments if not frag.is_extended})
+            if n_core:
+                core_coverage = min(n_matched / float(n_core), 1.0) ** core_weight
+            else:
+                core_coverage = 1.0
+            glycan_bound = peak_index.sum_log_intensities(list(stub_peaks), 0) * core_coverage + (
+                core_coverage * max(self.target.glycan_prior, 0))
+
+        if is_exd:
+            series_strategies = [(IonSeries.b, EXDFragmentationStrategy), (IonSeries.c, EXDFragmentationStrategy),
+                                 (IonSeries.y, EXDFragmentationStrategy), (IonSeries.z, EXDFragmentationStrategy)]
+        else:
+            series_strategies = [(IonSeries.b, HCDFragmentationStrategy), (IonSeries.y, HCDFragmentationStrategy)]
+        backbone_peaks = []
+        n_term_positions = set()
+        c_term_positions = set()
+        for series, strategy in series_strategies:
+            if series in (IonSeries.b, IonSeries.c):
+                positions = n_term_positions
+            else:
+                positions = c_term_positions
+            for frags, peak_groups in self._backbone_peak_matches(
+                    series, error_tolerance, strategy, include_neutral_losses):
+                for frag, peaks in zip(frags, peak_groups):
+                    for peak in peaks:
+                        # Peaks matched by stub glycopeptides are masked from the backbone
+                        if peak.index.neutral_mass in stub_peaks:
+                            continue
+                        backbone_peaks.append(peak.index.neutral_mass)
+                        positions.add(frag.position)
+        total = peak_index.sum_log_intensities(backbone_peaks, 0)
+        coverage = (len(n_term_positions) + len(c_term_positions)) / float(2 * len(self.target) - 1)
+        peptide_bound = total * coverage ** coverage_weight
+
+        return peptide_bound * peptide_weight + glycan_bound * (
+            1 - peptide_weight) + self._precursor_mass_accuracy_score()
+
     def peptide_score(self, error_tolerance=2e-5, coverage_weight=1.0, *args, **kwargs):
         if self._peptide_score is None:
             self._peptide_score = self.calculate_peptide_score(error_tolerance, coverage_weight, *args, **kwargs)
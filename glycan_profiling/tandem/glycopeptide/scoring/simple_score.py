@@ -47,12 +47,13 @@ class SimpleCoverageScorer(GlycopeptideSpectrumMatcherBase):
         # which means that if the last fragment could be glycosylated then the next one will be
         # but if the last fragment wasn't the next one might be.
         previous_position_glycosylated = False
-        for frags in self.get_fragments(series, strategy=strategy, include_neutral_losses=include_neutral_losses):
+        for frags, peak_groups in self._backbone_peak_matches(
+                series, error_tolerance, strategy, include_neutral_losses):
             glycosylated_position = previous_position_glycosylated
-            for frag in frags:
+            for frag, peaks in zip(frags, peak_groups):
                 if not glycosylated_position:
                     glycosylated_position |= frag.is_glycosylated
-                for peak in self.spectrum.all_peaks_for(frag.mass, error_tolerance):
+                for peak in peaks:
                     if peak.index.neutral_mass in masked_peaks:
                         continue
                     self.solution_map.add(peak, frag)
@@ -55,32 +55,101 @@ class MatchBetweenDataset(object):
     def ms1_scoring_model(self):
         return self.analysis_loader.analysis.parameters.get('scoring_model')
 
-    def find(self, ids, mass_error_tolerance=1e-5, time_error_tolerance=2.0):
+    def _get_apex_time(self, ids):
+        apex_time = ids.apex_time
+        if apex_time is None:
+            apex_time = ids.tandem_solutions[0].scan_time
+        return apex_time
+
+    def find_identified(self, ids, mass_error_tolerance=1e-5, time_error_tolerance=2.0,
+                        query_apex_time=None, correct_time=None):
+        """Find identified structures in this dataset matching the structure of `ids`
+        within the mass and time error tolerances.
+
+        Parameters
+        ----------
+        ids : :class:`~.IdentifiedStructure`
+            The identification to search for
+        mass_error_tolerance : float
+            The PPM mass error tolerance
+        time_error_tolerance : float
+            The apex time error tolerance
+        query_apex_time : float, optional
+            The apex time of `ids` to use instead of its own, e.g. after retention time correction.
+        correct_time : Callable, optional
+            A function applied to the apex times of this dataset's structures before comparing
+            them to `query_apex_time`.
+
+        Returns
+        -------
+        list of tuple
+        """
         key = ids.structure
-        out = []
         id_out = []
         ids_mass = ids.weighted_neutral_mass
-        ids_apex_time = ids.apex_time
-        if ids_apex_time is None:
-            ids_apex_time = ids.tandem_solutions[0].scan_time
+        if query_apex_time is None:
+            query_apex_time = self._get_apex_time(ids)
         if key in self._find_by_structure:
             results = self._find_by_structure[key]
             for result in results:
                 if abs(result.weighted_neutral_mass - ids_mass) / ids_mass < mass_error_tolerance:
-                    apex_time = result.apex_time
-                    if apex_time is None:
-                        apex_time = result.tandem_solutions[0].scan_time
-                    if abs(apex_time - ids_apex_time) < time_error_tolerance:
+                    apex_time = self._get_apex_time(result)
+                    if correct_time is not None:
+                        apex_time = correct_time(apex_time)
+                    if abs(apex_time - query_apex_time) < time_error_tolerance:
                         id_out.append((result, None))
+        return id_out
+
+    def find_chromatograms(self, ids, mass_error_tolerance=1e-5, time_error_tolerance=2.0):
+        out = []
+        ids_mass = ids.weighted_neutral_mass
+        ids_apex_time = self._get_apex_time(ids)
         for mshift in ids.mass_shifts:
             qmass = mshift.mass + ids_mass
             chroma = self.chromatograms.find_all_by_mass(
                 qmass, mass_error_tolerance)
             for chrom in chroma:
                 if abs(chrom.apex_time - ids_apex_time) < time_error_tolerance:
-                    if not isinstance(chrom, Chromatogram) and (chrom, None) in id_out:
-                        continue
                     out.append((chrom, mshift))
+        return out
+
+    def find(self, ids, mass_error_tolerance=1e-5, time_error_tolerance=2.0, candidates=None,
+             query_apex_time=None, correct_time=None):
+        """Find identified structures and chromatograms in this dataset which may be
+        the same analyte as `ids`.
+
+        Parameters
+        ----------
+        ids : :class:`~.IdentifiedStructure`
+            The identification to search for
+        mass_error_tolerance : float
+            The PPM mass error tolerance
+        time_error_tolerance : float
+            The apex time error tolerance
+        candidates : list of tuple, optional
+            Pre-computed (chromatogram, mass shift) pairs, as produced by
+            :meth:`MatchBetweenFeatureIndex.find`. If not provided, :attr:`chromatograms`
+            will be searched directly.
+        query_apex_time : float, optional
+            Passed to :meth:`find_identified`
+        correct_time : Callable, optional
+            Passed to :meth:`find_identified`
+
+        Returns
+        -------
+        list of tuple
+        """
+        id_out = self.find_identified(
+            ids, mass_error_tolerance, time_error_tolerance,
+            query_apex_time=query_apex_time, correct_time=correct_time)
+        if candidates is None:
+            candidates = self.find_chromatograms(
+                ids, mass_error_tolerance, time_error_tolerance)
+        out = []
+        for chrom, mshift in candidates:
+            if not isinstance(chrom, Chromatogram) and (chrom, None) in id_out:
+                continue
+            out.append((chrom, mshift))
         return id_out + out
 
     def get_identified_structure_for(self, structure):
@@ -0,0 +1,238 @@
+'''A combined mass and retention time index over the features of many
+:class:`~.MatchBetweenDataset` instances, so that the features of every
+run can be searched at once instead of scanning each dataset's chromatograms
+for each shared identification.
+'''
+from collections import defaultdict
+
+import numpy as np
+
+
+def _feature_apex_time(feature):
+    apex_time = feature.apex_time
+    if apex_time is None:
+        try:
+            apex_time = feature.tandem_solutions[0].scan_time
+        except (AttributeError, IndexError):
+            apex_time = np.nan
+    return apex_time
+
+
+class MatchBetweenFeatureIndex(object):
+    """Indexes the features (chromatograms and identified structures) of a collection
+    of datasets by neutral mass and apex time.
+
+    Features are held in parallel arrays sorted by neutral mass. A query locates the
+    mass window with a binary search and then filters that window by apex time
+    and dataset in a single vectorized step. Features added after the index is built
+    are kept in an unsorted overflow buffer until there are enough of them to
+    warrant re-sorting.
+
+    If a :class:`~.LinearRetentionTimeCorrector` is provided, all apex times are
+    mapped onto its reference run before they are compared.
+
+    Attributes
+    ----------
+    labels : list of str
+        The labels of the indexed datasets, in order
+    features : list
+        The indexed features, sorted by neutral mass
+    masses : :class:`np.ndarray`
+        The neutral mass of each feature in :attr:`features`
+    apex_times : :class:`np.ndarray`
+        The (possibly corrected) apex time of each feature in :attr:`features`
+    dataset_indices : :class:`np.ndarray`
+        The index into :attr:`labels` for the dataset each feature in :attr:`features`
+        came from
+    retention_time_corrector : :class:`~.LinearRetentionTimeCorrector`
+        The retention time correction to apply to each dataset, if any
+    """
+
+    def __init__(self, datasets, retention_time_corrector=None, rebuild_threshold=1000):
+        self.labels = [mbd.label for mbd in datasets]
+        self.label_to_index = {label: i for i, label in enumerate(self.labels)}
+        self.retention_time_corrector = retention_time_corrector
+        self.rebuild_threshold = rebuild_threshold
+
+        self.features = []
+        self.masses = np.array([])
+        self.apex_times = np.array([])
+        self.dataset_indices = np.array([], dtype=int)
+
+        self._pending = []
+        self.build(datasets)
+
+    def correct_time(self, apex_time, label):
+        """Map `apex_time` from the run labeled `label` onto the reference run of
+        :attr:`retention_time_corrector`.
+
+        If no corrector is available, or it has no correction for `label`, `apex_time`
+        is returned unchanged.
+
+        Parameters
+        ----------
+        apex_time : float or :class:`np.ndarray`
+        label : str
+
+        Returns
+        -------
+        float or :class:`np.ndarray`
+        """
+        if self.retention_time_corrector is None or label is None:
+            return apex_time
+        try:
+            return self.retention_time_corrector.correct(apex_time, label)
+        except KeyError:
+            return apex_time
+
+    def feature_apex_time(self, feature, label):
+        """Get the apex time of `feature` from the run labeled `label`, corrected by
+        :meth:`correct_time`, falling back to its first MS/MS scan time if it has no
+        chromatogram.
+        """
+        return self.correct_time(_feature_apex_time(feature), label)
+
+    def build(self, datasets):
+        features = []
+        masses = []
+        apex_times = []
+        dataset_indices = []
+        for mbd in datasets:
+            i = self.label_to_index[mbd.label]
+            n = len(features)
+            for feature in mbd.chromatograms:
+                features.append(feature)
+                masses.append(feature.neutral_mass)
+                apex_times.append(_feature_apex_time(feature))
+                dataset_indices.append(i)
+            apex_times[n:] = self.correct_time(
+                np.array(apex_times[n:], dtype=float), mbd.label).tolist()
+        self._set_arrays(features, masses, apex_times, dataset_indices)
+
+    def _set_arrays(self, features, masses, apex_times, dataset_indices):
+        masses = np.array(masses, dtype=float)
+        order = np.argsort(masses, kind='mergesort')
+        self.masses = masses[order]
+        self.apex_times = np.array(apex_times, dtype=float)[order]
+        self.dataset_indices = np.array(dataset_indices, dtype=int)[order]
+        self.features = [features[i] for i in order]
+
+    def add(self, feature, label):
+        """Add a new feature from the dataset labeled `label` to the index.
+
+        Parameters
+        ----------
+        feature : :class:`~.ChromatogramInterface`
+        label : str
+        """
+        apex_time = self.feature_apex_time(feature, label)
+        self._pending.append(
+            (feature, feature.neutral_mass, apex_time, self.label_to_index[label]))
+        if len(self._pending) >= self.rebuild_threshold:
+            self._merge_pending()
+
+    def _merge_pending(self):
+        features = list(self.features)
+        masses = self.masses.tolist()
+        apex_times = self.apex_times.tolist()
+        dataset_indices = self.dataset_indices.tolist()
+        for feature, mass, apex_time, dataset_index in self._pending:
+            features.append(feature)
+            masses.append(mass)
+            apex_times.append(apex_time)
+            dataset_indices.append(dataset_index)
+        self._pending = []
+        self._set_arrays(features, masses, apex_times, dataset_indices)
+
+    def __len__(self):
+        return len(self.features) + len(self._pending)
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({n} features, {k} datasets)".format(
+            self=self, n=len(self), k=len(self.labels))
+
+    def search(self, masses, apex_times, mass_error_tolerance=1e-5, time_error_tolerance=2.0):
+        """Find all features within the mass and time error tolerances of each
+        query mass and apex time pair.
+
+        Parameters
+        ----------
+        masses : :class:`np.ndarray`
+            The query neutral masses
+        apex_times : :class:`np.ndarray`
+            The query apex times, already corrected to the reference run if
+            retention time correction is in use.
+        mass_error_tolerance : float
+            The PPM mass error tolerance
+        time_error_tolerance : float
+            The apex time error tolerance
+
+        Returns
+        -------
+        list of list of int
+            For each query, the indices of matching features. Indices at or beyond
+            ``len(self.features)`` refer to features still in the overflow buffer.
+        """
+        masses = np.asarray(masses, dtype=float)
+        apex_times = np.asarray(apex_times, dtype=float)
+        width = masses * mass_error_tolerance
+        # Widen the window slightly and apply the exact relative error test below
+        lo = np.searchsorted(self.masses, masses - width * 1.01, 'left')
+        hi = np.searchsorted(self.masses, masses + width * 1.01, 'right')
+        results = []
+        n = len(self.features)
+        for i in range(len(masses)):
+            start, end = lo[i], hi[i]
+            mass = masses[i]
+            apex_time = apex_times[i]
+            mask = (np.abs(self.masses[start:end] - mass) / mass < mass_error_tolerance) & (
+                np.abs(self.apex_times[start:end] - apex_time) < time_error_tolerance)
+            hits = (np.flatnonzero(mask) + start).tolist()
+            for j, (_feature, pmass, ptime, _dataset_index) in enumerate(self._pending):
+                if abs(pmass - mass) / mass < mass_error_tolerance and abs(
+                        ptime - apex_time) < time_error_tolerance:
+                    hits.append(n + j)
+            results.append(hits)
+        return results
+
+    def _get(self, i):
+        n = len(self.features)
+        if i < n:
+            return self.features[i], self.labels[self.dataset_indices[i]]
+        feature, _mass, _apex_time, dataset_index = self._pending[i - n]
+        return feature, self.labels[dataset_index]
+
+    def find(self, ids, mass_error_tolerance=1e-5, time_error_tolerance=2.0, source_label=None):
+        """Find the features of every dataset which match any mass shifted form of `ids`,
+        issuing one batched query for all of its mass shifts.
+
+        Parameters
+        ----------
+        ids : :class:`~.IdentifiedStructure`
+            The identification to search for
+        mass_error_tolerance : float
+            The PPM mass error tolerance
+        time_error_tolerance : float
+            The apex time error tolerance
+        source_label : str, optional
+            The label of the dataset `ids` came from, used for retention time correction
+
+        Returns
+        -------
+        defaultdict(list)
+            A mapping from dataset label to (feature, mass shift) pairs, suitable for passing
+            to :meth:`MatchBetweenDataset.find` as `candidates`.
+        """
+        ids_mass = ids.weighted_neutral_mass
+        ids_apex_time = self.feature_apex_time(ids, source_label)
+        mass_shifts = list(ids.mass_shifts)
+        query_masses = [ids_mass + mshift.mass for mshift in mass_shifts]
+        query_times = [ids_apex_time] * len(query_masses)
+        out = defaultdict(list)
+        hit_sets = self.search(
+            query_masses, query_times, mass_error_tolerance, time_error_tolerance)
+        for mshift, hits in zip(mass_shifts, hit_sets):
+            for i in hits:
+                feature, label = self._get(i)
+                out[label].append((feature, mshift))
+        return out
@@ -8,9 +8,12 @@ from glycan_profiling.chromatogram_tree.chromatogram import GlycopeptideChromato
 from glycan_profiling.scoring import ChromatogramSolution
 from glycan_profiling.tandem.chromatogram_mapping import TandemAnnotatedChromatogram
 from glycan_profiling.tandem.identified_structure import IdentifiedStructure
+from glycan_profiling.scoring.elution_time_grouping.cross_run import LinearRetentionTimeCorrector
 
 from glycan_profiling.plotting import chromatogram_artist
 
+from .index import MatchBetweenFeatureIndex
+
 
 MergeAction = namedtuple("MergeAction", ("label", "existing", "new", "shift"))
 CreateAction = namedtuple(
@@ -90,7 +93,8 @@ class SharedIdentification(object):
 
 
 class MatchBetweenRunBuilder(TaskBase):
-    def __init__(self, datasets, mass_error_tolerance=1e-5, time_error_tolerance=2.0):
+    def __init__(self, datasets, mass_error_tolerance=1e-5, time_error_tolerance=2.0,
+                 use_feature_index=True, retention_time_correction=False):
         self.datasets = datasets
         self.feature_table = dict()
         self.build_feature_table()
@@ -99,6 +103,37 @@ class MatchBetweenRunBuilder(TaskBase):
         self.mass_error_tolerance = mass_error_tolerance
         self.time_error_tolerance = time_error_tolerance
 
+        self.retention_time_corrector = None
+        if retention_time_correction:
+            self.retention_time_corrector = self.build_retention_time_corrector()
+
+        self.feature_index = None
+        if use_feature_index:
+            self.feature_index = self.build_feature_index()
+
+    def build_retention_time_corrector(self):
+        self.log("Fitting Retention Time Correction")
+        corrector = LinearRetentionTimeCorrector(
+            list(self.feature_table.values()), self.labels)
+        corrector.fit()
+        self.log("... Reference Run: %r" % (corrector.reference_key, ))
+        return corrector
+
+    def build_feature_index(self):
+        self.log("Building Feature Index")
+        index = MatchBetweenFeatureIndex(
+            self.datasets, retention_time_corrector=self.retention_time_corrector)
+        self.log("... %d Features Indexed" % (len(index), ))
+        return index
+
+    def _make_time_corrector(self, label):
+        if self.feature_index is None or self.retention_time_corrector is None:
+            return None
+
+        def correct_time(apex_time):
+            return self.feature_index.correct_time(apex_time, label)
+        return correct_time
+
     def build_feature_table(self, mass_error_tolerance=1e-5, time_error_tolerance=2.0):
         for mbd in self.datasets:
             for ids in mbd.identified_structures:
@@ -131,6 +166,8 @@ class MatchBetweenRunBuilder(TaskBase):
             shared_id = self.feature_table[structure]
             shared_id[mbd.label] = ids
             mbd.add(ids)
+            if self.feature_index is not None:
+                self.feature_index.add(ids, mbd.label)
 
     def merge(self, label, structure, new, shift):
         self.log("Merging %r into %r in %r" % (new, structure, label))
@@ -157,9 +194,9 @@ class MatchBetweenRunBuilder(TaskBase):
         merge_actions = set()
         link_actions = set()
 
-        for inst in shared_id.values():
+        for label, inst in shared_id.items():
             merges, creates, links = self.find(
-                inst, mass_error_tolerance, time_error_tolerance)
+                inst, mass_error_tolerance, time_error_tolerance, source_label=label)
             create_actions.update(creates)
             merge_actions.update(merges)
             link_actions.update(links)
@@ -189,14 +226,29 @@ class MatchBetweenRunBuilder(TaskBase):
 
         return merge_actions, create_actions, link_actions
 
-    def find(self, ids, mass_error_tolerance=1e-5, time_error_tolerance=2.0):
+    def find(self, ids, mass_error_tolerance=1e-5, time_error_tolerance=2.0, source_label=None):
         create_actions = set()
         merge_actions = set()
         link_actions = set()
 
+        if self.feature_index is not None:
+            candidates_by_label = self.feature_index.find(
+                ids, mass_error_tolerance, time_error_tolerance, source_label)
+            query_apex_time = self.feature_index.feature_apex_time(ids, source_label)
+        else:
+            candidates_by_label = None
+            query_apex_time = None
+
         for mbd in self.datasets:
             shared_id = self.feature_table[ids.structure]
-            out = mbd.find(ids, mass_error_tolerance, time_error_tolerance)
+            if candidates_by_label is not None:
+                out = mbd.find(
+                    ids, mass_error_tolerance, time_error_tolerance,
+                    candidates=candidates_by_label.get(mbd.label, []),
+                    query_apex_time=query_apex_time,
+                    correct_time=self._make_time_corrector(mbd.label))
+            else:
+                out = mbd.find(ids, mass_error_tolerance, time_error_tolerance)
             # We've identified this structure in this sample already
             if mbd.label in shared_id:
                 existing_match = shared_id[mbd.label]
@@ -225,6 +277,8 @@ class MatchBetweenRunBuilder(TaskBase):
                         existing_apex_time = existing_match.apex_time
                         if existing_apex_time is None:
                             existing_apex_time = existing_match.tandem_solutions[0].scan_time
+                        # Both times come from the same run, so no retention time correction
+                        # is needed here.
                         if abs(entity.apex_time - existing_apex_time) < time_error_tolerance:
                             if existing_match.chromatogram is not None and existing_match.chromatogram.common_nodes(entity):
                                 self.log("Repeated attempt to merge %r and %r in %r\n" % (
@@ -0,0 +1,436 @@
+'''A precomputed sparse scan by signature ion intensity matrix, built in a single
+pass over the MSn scans of a processed mzML file and stored alongside it, so that
+oxonium ion scores and glycan type signatures can be looked up without loading
+and re-matching each scan's peaks.
+'''
+import os
+
+import numpy as np
+
+from glycan_profiling.task import TaskBase
+from glycan_profiling.tandem.peak_index import ScanPeakIndex
+from glycan_profiling.tandem.oxonium_ions import (
+    standard_oxonium_ions, signature_oxonium_ions, _gscore_oxonium_ions)
+
+
+def _ion_label(ion):
+    annotation = getattr(ion, "annotation", None)
+    if annotation is None:
+        return str(ion)
+    if isinstance(annotation, float):
+        return "%0.4f" % (annotation, )
+    return str(annotation)
+
+
+def _acquisition_lower_bound(scan):
+    minimum_mass = 0
+    if scan.acquisition_information:
+        try:
+            scan_windows = scan.acquisition_information[0]
+            window = scan_windows[0]
+            minimum_mass = window.lower
+        except IndexError:
+            pass
+    return minimum_mass
+
+
+class OxoniumIndexBuilder(object):
+    """Accumulates the signature ion intensities of MSn scans one at a time,
+    to produce an :class:`OxoniumIndex`.
+
+    Attributes
+    ----------
+    ions : list
+        The ions to search for, anything with a :meth:`mass` method
+    ion_masses : :class:`np.ndarray`
+        The neutral mass of each ion
+    error_tolerance : float
+        The PPM error tolerance to match ions with
+    """
+
+    def __init__(self, ions=None, error_tolerance=2e-5):
+        if ions is None:
+            ions = standard_oxonium_ions + signature_oxonium_ions
+        self.ions = list(ions)
+        self.ion_masses = np.array([ion.mass() for ion in self.ions], dtype=float)
+        self.error_tolerance = error_tolerance
+        self.scan_ids = []
+        self.indptr = [0]
+        self.indices = []
+        self.intensities = []
+        self.base_peak_intensities = []
+        self.lower_bounds = []
+
+    def __len__(self):
+        return len(self.scan_ids)
+
+    def add(self, scan):
+        """Match every ion against `scan`'s deconvoluted peaks and record the
+        intensity of the nearest peak to each ion found.
+
+        Parameters
+        ----------
+        scan : :class:`~.ProcessedScan`
+        """
+        peak_set = scan.deconvoluted_peak_set
+        if peak_set is None:
+            return
+        peak_index = ScanPeakIndex(peak_set)
+        query_indices, peak_indices = peak_index.match_masses(self.ion_masses, self.error_tolerance)
+        if len(query_indices):
+            errors = np.abs(peak_index.neutral_masses[peak_indices] - self.ion_masses[query_indices])
+            # Like :meth:`DeconvolutedPeakSet.has_peak`, keep only the nearest peak to each ion
+            order = np.lexsort((errors, query_indices))
+            query_indices = query_indices[order]
+            keep = np.ones(len(order), dtype=bool)
+            keep[1:] = query_indices[1:] != query_indices[:-1]
+            self.indices.extend(query_indices[keep].tolist())
+            self.intensities.extend(peak_index.intensities[peak_indices[order][keep]].tolist())
+        self.indptr.append(len(self.indices))
+        self.scan_ids.append(scan.id)
+        self.base_peak_intensities.append(peak_index.base_peak_intensity)
+        self.lower_bounds.append(_acquisition_lower_bound(scan))
+
+    def build(self):
+        """Assemble the accumulated rows into an :class:`OxoniumIndex`.
+
+        Returns
+        -------
+        :class:`OxoniumIndex`
+        """
+        return OxoniumIndex(
+            self.scan_ids, self.ion_masses, [_ion_label(ion) for ion in self.ions],
+            np.array(self.indptr, dtype=np.intp), np.array(self.indices, dtype=np.intp),
+            np.array(self.intensities, dtype=float), np.array(self.base_peak_intensities, dtype=float),
+            np.array(self.lower_bounds, dtype=float), self.error_tolerance)
+
+
+class OxoniumIndex(object):
+    """A sparse matrix of the intensity of each signature ion in each MSn scan of a
+    processed mzML file, stored in compressed sparse row form with one row per scan
+    and one column per ion.
+
+    Attributes
+    ----------
+    scan_ids : list
+        The id of the scan of each row
+    ion_masses : :class:`np.ndarray`
+        The neutral mass of the ion of each column
+    ion_labels : list
+        A name for the ion of each column
+    indptr : :class:`np.ndarray`
+        The offset of each row's entries in :attr:`indices` and :attr:`intensities`
+    indices : :class:`np.ndarray`
+        The column of each entry
+    intensities : :class:`np.ndarray`
+        The intensity of the peak matched to each entry's ion
+    base_peak_intensities : :class:`np.ndarray`
+        The intensity of the most intense peak of each scan
+    lower_bounds : :class:`np.ndarray`
+        The lower bound of the acquisition window of each scan
+    error_tolerance : float
+        The PPM error tolerance ions were matched with
+    """
+
+    file_suffix = "-oxonium-idx.npz"
+
+    def __init__(self, scan_ids, ion_masses, ion_labels, indptr, indices, intensities,
+                 base_peak_intensities, lower_bounds, error_tolerance=2e-5):
+        self.scan_ids = list(scan_ids)
+        self.ion_masses = np.asarray(ion_masses, dtype=float)
+        self.ion_labels = list(ion_labels)
+        self.indptr = indptr
+        self.indices = indices
+        self.intensities = intensities
+        self.base_peak_intensities = base_peak_intensities
+        self.lower_bounds = lower_bounds
+        self.error_tolerance = error_tolerance
+        self.scan_id_to_row = {scan_id: i for i, scan_id in enumerate(self.scan_ids)}
+
+    def __len__(self):
+        return len(self.scan_ids)
+
+    def __contains__(self, scan_id):
+        return scan_id in self.scan_id_to_row
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({n} scans, {m} ions, {k} entries)".format(
+            self=self, n=len(self), m=len(self.ion_masses), k=len(self.indices))
+
+    @classmethod
+    def build(cls, scans, ions=None, error_tolerance=2e-5):
+        """Build an index over the MSn scans among `scans`.
+
+        Parameters
+        ----------
+        scans : :class:`Iterable` of :class:`~.ProcessedScan`
+        ions : list, optional
+            The ions to index. Defaults to the standard and signature oxonium ions
+        error_tolerance : float
+
+        Returns
+        -------
+        :class:`OxoniumIndex`
+        """
+        builder = OxoniumIndexBuilder(ions, error_tolerance)
+        for scan in scans:
+            if scan.ms_level > 1:
+                builder.add(scan)
+        return builder.build()
+
+    @classmethod
+    def index_file_name(cls, path):
+        return path + cls.file_suffix
+
+    def save(self, path):
+        """Write the index to `path` as an uncompressed :mod:`numpy` archive.
+
+        Parameters
+        ----------
+        path : str
+        """
+        with open(path, 'wb') as handle:
+            np.savez(
+                handle, scan_ids=np.array(self.scan_ids, dtype=str),
+                ion_masses=self.ion_masses, ion_labels=np.array(self.ion_labels, dtype=str),
+                indptr=self.indptr, indices=self.indices, intensities=self.intensities,
+                base_peak_intensities=self.base_peak_intensities, lower_bounds=self.lower_bounds,
+                error_tolerance=np.array(self.error_tolerance))
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by :meth:`save`.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        :class:`OxoniumIndex`
+        """
+        with np.load(path, allow_pickle=False) as archive:
+            return cls(
+                archive['scan_ids'].tolist(), archive['ion_masses'], archive['ion_labels'].tolist(),
+                archive['indptr'], archive['indices'], archive['intensities'],
+                archive['base_peak_intensities'], archive['lower_bounds'],
+                float(archive['error_tolerance']))
+
+    @classmethod
+    def for_file(cls, path):
+        """Load the index stored alongside the processed mzML file at `path`,
+        if one exists.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        :class:`OxoniumIndex` or :const:`None`
+        """
+        index_path = cls.index_file_name(path)
+        if not os.path.exists(index_path):
+            return None
+        return cls.load(index_path)
+
+    def columns_for(self, ions):
+        """Find the column of each of `ions`, matching on mass.
+
+        Parameters
+        ----------
+        ions : :class:`Iterable`
+            Anything with a :meth:`mass` method, or masses
+
+        Returns
+        -------
+        :class:`np.ndarray`
+
+        Raises
+        ------
+        KeyError
+            If an ion is not indexed
+        """
+        columns = []
+        for ion in ions:
+            mass = ion.mass() if hasattr(ion, 'mass') else float(ion)
+            hits = np.flatnonzero(np.abs(self.ion_masses - mass) < 1e-4)
+            if len(hits) == 0:
+                raise KeyError(ion)
+            columns.append(hits[0])
+        return np.array(columns, dtype=np.intp)
+
+    def row(self, scan_id):
+        """Get the intensity of each ion found in the scan with id `scan_id`.
+
+        Parameters
+        ----------
+        scan_id : str
+
+        Returns
+        -------
+        dict
+            A mapping from ion label to intensity
+        """
+        i = self.scan_id_to_row[scan_id]
+        start, end = self.indptr[i], self.indptr[i + 1]
+        labels = self.ion_labels
+        return {labels[j]: float(v) for j, v in zip(self.indices[start:end], self.intensities[start:end])}
+
+    def to_dense(self, columns=None):
+        """Expand the index into a dense scan by ion intensity matrix, with
+        zeros where an ion was not found.
+
+        Parameters
+        ----------
+        columns : :class:`np.ndarray`, optional
+            The columns to include, defaulting to all of them
+
+        Returns
+        -------
+        :class:`np.ndarray`
+        """
+        n_columns = len(self.ion_masses)
+        dense = np.zeros((len(self), n_columns), dtype=float)
+        rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        dense[rows, self.indices] = self.intensities
+        if columns is not None:
+            dense = dense[:, columns]
+        return dense
+
+    def oxonium_ratios(self, ions=None, use_acquisition_window=True):
+        """Compute the oxonium ion ratio of every scan, as
+        :meth:`~.OxoniumIonScanner.ratio` would from the scan's peaks.
+
+        Parameters
+        ----------
+        ions : list, optional
+            The ions to score with, defaulting to those of the G-score
+        use_acquisition_window : bool
+            Whether to ignore ions below each scan's acquisition window
+
+        Returns
+        -------
+        :class:`np.ndarray`
+        """
+        if ions is None:
+            ions = _gscore_oxonium_ions
+        columns = self.columns_for(ions)
+        masses = self.ion_masses[columns]
+        matrix = self.to_dense(columns)
+        if use_acquisition_window:
+            lower_bounds = self.lower_bounds
+        else:
+            lower_bounds = np.zeros(len(self))
+        # The scanner skips ions below the window but only counts those strictly above it
+        included = masses[None, :] >= lower_bounds[:, None]
+        counted = (masses[None, :] > lower_bounds[:, None]).sum(axis=1)
+        base = self.base_peak_intensities
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total = np.where(included, matrix, 0).sum(axis=1) / base
+            ratios = total / counted
+        ratios[(counted == 0) | (base == 0)] = 0
+        return ratios
+
+    def oxonium_ratio(self, scan_id, ions=None, use_acquisition_window=True):
+        """Compute the oxonium ion ratio of the scan with id `scan_id`.
+
+        See Also
+        --------
+        :meth:`oxonium_ratios`
+        """
+        i = self.scan_id_to_row[scan_id]
+        if ions is None:
+            ions = _gscore_oxonium_ions
+        columns = self.columns_for(ions)
+        start, end = self.indptr[i], self.indptr[i + 1]
+        found = dict(zip(self.indices[start:end], self.intensities[start:end]))
+        lower_bound = self.lower_bounds[i] if use_acquisition_window else 0
+        base = self.base_peak_intensities[i]
+        n = 0
+        total = 0.0
+        for column in columns:
+            mass = self.ion_masses[column]
+            if mass > lower_bound:
+                n += 1
+            if mass >= lower_bound:
+                total += found.get(column, 0.0)
+        if n == 0 or base == 0:
+            return 0
+        return total / base / n
+
+
+class OxoniumTriage(TaskBase):
+    """Partitions MSn scans by their oxonium ion ratio, read from an :class:`OxoniumIndex`
+    for all scans at once, so that scans without glycan signature ions can be removed
+    before they are mapped to and matched against any structures.
+
+    Scans missing from the index are always kept.
+
+    Attributes
+    ----------
+    oxonium_index : :class:`OxoniumIndex`
+        The index to read oxonium ion intensities from
+    threshold : float
+        The minimum oxonium ion ratio to keep a scan
+    ions : list
+        The ions to compute the ratio with, defaulting to those of the G-score
+    histogram_bins : list
+        The bin edges of the score histogram to log
+    """
+
+    histogram_bins = [0, 0.01, 0.025, 0.05, 0.1, 0.2, 0.5, 1.0, np.inf]
+
+    def __init__(self, oxonium_index, threshold=0.05, ions=None):
+        self.oxonium_index = oxonium_index
+        self.threshold = threshold
+        self.ions = ions
+
+    def scores(self, scans):
+        """Look up the oxonium ion ratio of each of `scans`.
+
+        Parameters
+        ----------
+        scans : :class:`Sequence`
+            Scans or :class:`~.ScanStub` objects with an :attr:`id`
+
+        Returns
+        -------
+        :class:`np.ndarray`
+            The ratio of each scan, or NaN for scans not in the index
+        """
+        ratios = self.oxonium_index.oxonium_ratios(self.ions)
+        rows = self.oxonium_index.scan_id_to_row
+        result = np.empty(len(scans), dtype=float)
+        for i, scan in enumerate(scans):
+            row = rows.get(scan.id)
+            result[i] = ratios[row] if row is not None else np.nan
+        return result
+
+    def log_histogram(self, scores):
+        counts, edges = np.histogram(scores[~np.isnan(scores)], bins=self.histogram_bins)
+        for count, lo, hi in zip(counts, edges[:-1], edges[1:]):
+            self.log("...... [%0.3f, %0.3f): %d" % (lo, hi, count))
+
+    def triage(self, scans):
+        """Split `scans` into those whose oxonium ion ratio meets :attr:`threshold`
+        and those which do not.
+
+        Parameters
+        ----------
+        scans : :class:`Sequence`
+
+        Returns
+        -------
+        kept : list
+        rejected : list
+        """
+        scores = self.scores(scans)
+        keep = ~(scores < self.threshold)
+        kept = [scan for scan, k in zip(scans, keep) if k]
+        rejected = [scan for scan, k in zip(scans, keep) if not k]
+        n_missing = int(np.isnan(scores).sum())
+        self.log("... Oxonium Triage Kept %d of %d Scans (%d Not Indexed), Dropped %d Below %0.3f" % (
+            len(kept), len(scans), n_missing, len(rejected), self.threshold))
+        self.log_histogram(scores)
+        return kept, rejected
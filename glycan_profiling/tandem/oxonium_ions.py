@@ -34,6 +34,21 @@ _standard_oxonium_ions = [
 
 standard_oxonium_ions = _standard_oxonium_ions[:]
 
+_neugc = FrozenMonosaccharideResidue.from_iupac_lite('NeuGc')
+
+# Ions which indicate a particular glycan type rather than glycosylation in general,
+# mirroring the signatures of :mod:`~.glycan_signature_ions`
+_signature_oxonium_ions = [
+    _neugc,
+    _mass_wrapper(_neugc.mass() - Composition("H2O").mass, "NeuGc-H2O"),
+    _mass_wrapper(242.01915393925, "@phosphate-Hex"),
+    _mass_wrapper(224.00858925555, "@phosphate-Hex-H2O"),
+    _mass_wrapper(333.10598119017, "@acetyl-NeuAc"),
+    _mass_wrapper(315.09541650647, "@acetyl-NeuAc-H2O"),
+]
+
+signature_oxonium_ions = _signature_oxonium_ions[:]
+
 _gscore_oxonium_ions = [
     _hexnac,
     _mass_wrapper(_hexnac.mass() - Composition("C2H6O3").mass),
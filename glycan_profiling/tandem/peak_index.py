@@ -0,0 +1,258 @@
+'''A per-scan index over a deconvoluted peak set's masses and intensities, built
+once per scan and shared by every spectrum matcher evaluated against it, so that
+fragment masses can be matched in batches and scan-wide intensity statistics are
+not recomputed for each candidate.
+'''
+import numpy as np
+
+
+def match_masses(neutral_masses, query_masses, error_tolerance=2e-5):
+    """Find every entry of the sorted array `neutral_masses` within `error_tolerance`
+    PPM of each of `query_masses`.
+
+    Parameters
+    ----------
+    neutral_masses : :class:`np.ndarray`
+        The sorted peak masses
+    query_masses : :class:`np.ndarray`
+        The masses to search for
+    error_tolerance : float
+
+    Returns
+    -------
+    query_indices : :class:`np.ndarray`
+    peak_indices : :class:`np.ndarray`
+    """
+    width = query_masses * error_tolerance
+    lo = np.searchsorted(neutral_masses, query_masses - width, 'left')
+    hi = np.searchsorted(neutral_masses, query_masses + width, 'right')
+    counts = hi - lo
+    total = counts.sum()
+    query_indices = np.repeat(np.arange(len(query_masses)), counts)
+    if total == 0:
+        return query_indices, np.zeros(0, dtype=np.intp)
+    starts = np.cumsum(counts) - counts
+    peak_indices = np.repeat(lo - starts, counts) + np.arange(total)
+    return query_indices, peak_indices
+
+
+def sum_log_intensities(log_intensities, peak_indices, minimum=-np.inf):
+    """Sum the entries of `log_intensities` selected by `peak_indices`, raising any
+    entry less than `minimum` to `minimum`.
+
+    Parameters
+    ----------
+    log_intensities : :class:`np.ndarray`
+    peak_indices : :class:`np.ndarray`
+    minimum : float
+
+    Returns
+    -------
+    float
+    """
+    return float(np.maximum(log_intensities[peak_indices], minimum).sum())
+
+
+def weighted_log_intensity_sum(log_intensities, peak_indices, mass_errors, error_tolerance=2e-5):
+    """Sum the entries of `log_intensities` selected by `peak_indices`, each weighted
+    by ``1 - (|error| / error_tolerance) ** 4`` as the log intensity scorers do.
+
+    Parameters
+    ----------
+    log_intensities : :class:`np.ndarray`
+    peak_indices : :class:`np.ndarray`
+    mass_errors : :class:`np.ndarray`
+        The PPM error of each match
+    error_tolerance : float
+
+    Returns
+    -------
+    float
+    """
+    weights = 1 - (np.abs(mass_errors) / error_tolerance) ** 4
+    return float((log_intensities[peak_indices] * weights).sum())
+
+
+try:
+    from glycan_profiling._c.tandem.spectrum_match import (
+        match_masses, sum_log_intensities, weighted_log_intensity_sum)
+except ImportError:
+    pass
+
+
+class ScanPeakIndex(object):
+    """Parallel arrays describing the peaks of a :class:`~.DeconvolutedPeakSet`, ordered
+    by neutral mass like the peak set itself, so position ``i`` in each array describes the
+    peak whose ``index.neutral_mass`` is ``i``.
+
+    Attributes
+    ----------
+    peak_set : :class:`~.DeconvolutedPeakSet`
+        The indexed peak set
+    peaks : tuple
+        The peaks of :attr:`peak_set`
+    neutral_masses : :class:`np.ndarray`
+        The neutral mass of each peak, sorted ascending
+    intensities : :class:`np.ndarray`
+        The intensity of each peak
+    log_intensities : :class:`np.ndarray`
+        The base 10 logarithm of each peak's intensity
+    charges : :class:`np.ndarray`
+        The charge state of each peak
+    intensity_order : :class:`np.ndarray`
+        The peak indices sorted by ascending intensity
+    intensity_rank : :class:`np.ndarray`
+        The rank of each peak by intensity, where the most intense peak has rank 0
+    total_ion_current : float
+        The sum of all peak intensities
+    base_peak_intensity : float
+        The intensity of the most intense peak
+    charge_groups : dict
+        A mapping from charge state to the indices of the peaks with that charge
+    """
+
+    def __init__(self, peak_set):
+        self.peak_set = peak_set
+        self.peaks = peaks = tuple(peak_set)
+        n = len(peaks)
+        self.neutral_masses = np.fromiter((p.neutral_mass for p in peaks), dtype=float, count=n)
+        self.intensities = np.fromiter((p.intensity for p in peaks), dtype=float, count=n)
+        self.charges = np.fromiter((p.charge for p in peaks), dtype=int, count=n)
+        with np.errstate(divide='ignore'):
+            self.log_intensities = np.log10(self.intensities)
+        self.intensity_order = np.argsort(self.intensities, kind='mergesort')
+        self.intensity_rank = np.empty(n, dtype=int)
+        self.intensity_rank[self.intensity_order[::-1]] = np.arange(n)
+        self.total_ion_current = float(self.intensities.sum())
+        self.base_peak_intensity = float(self.intensities.max()) if n else 0.0
+        self.charge_groups = {
+            int(z): np.flatnonzero(self.charges == z) for z in np.unique(self.charges)}
+
+    @classmethod
+    def from_scan(cls, scan):
+        """Get the index of `scan`'s deconvoluted peak set, building it and attaching it
+        to `scan` the first time it is requested.
+
+        Parameters
+        ----------
+        scan : :class:`~.ProcessedScan`
+
+        Returns
+        -------
+        :class:`ScanPeakIndex`
+        """
+        peak_set = scan.deconvoluted_peak_set
+        index = getattr(scan, 'peak_index', None)
+        if index is None or index.peak_set is not peak_set:
+            index = cls(peak_set)
+            try:
+                scan.peak_index = index
+            except AttributeError:
+                pass
+        return index
+
+    def __len__(self):
+        return len(self.peaks)
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({n} peaks, tic={self.total_ion_current:0.3g})".format(
+            self=self, n=len(self))
+
+    def match_masses(self, masses, error_tolerance=2e-5):
+        """Find every peak within `error_tolerance` PPM of each of `masses`, like calling
+        :meth:`DeconvolutedPeakSet.all_peaks_for` once per mass.
+
+        Parameters
+        ----------
+        masses : :class:`np.ndarray`
+            The neutral masses to search for
+        error_tolerance : float
+            The PPM error tolerance
+
+        Returns
+        -------
+        query_indices : :class:`np.ndarray`
+            The index into `masses` of each match
+        peak_indices : :class:`np.ndarray`
+            The index of the matched peak for each match
+        """
+        masses = np.ascontiguousarray(masses, dtype=float)
+        return match_masses(self.neutral_masses, masses, error_tolerance)
+
+    def peaks_for_masses(self, masses, error_tolerance=2e-5):
+        """Find the peaks within `error_tolerance` PPM of each of `masses`.
+
+        Parameters
+        ----------
+        masses : :class:`Sequence` of float
+        error_tolerance : float
+
+        Returns
+        -------
+        list of tuple
+            The matched peaks for each mass, in the same order as `masses`
+        """
+        query_indices, peak_indices = self.match_masses(masses, error_tolerance)
+        result = [()] * len(masses)
+        if len(query_indices) == 0:
+            return result
+        peaks = self.peaks
+        # Matches are grouped by query, so each query's peaks are a contiguous run
+        boundaries = np.flatnonzero(np.diff(query_indices)) + 1
+        for run in np.split(np.arange(len(query_indices)), boundaries):
+            result[query_indices[run[0]]] = tuple([peaks[i] for i in peak_indices[run]])
+        return result
+
+    def sum_log_intensities(self, peak_indices, minimum=-np.inf):
+        """Sum the log intensities of the peaks at `peak_indices`, raising any which are
+        less than `minimum` to `minimum`.
+
+        Parameters
+        ----------
+        peak_indices : :class:`Sequence` of int
+        minimum : float
+
+        Returns
+        -------
+        float
+        """
+        peak_indices = np.ascontiguousarray(peak_indices, dtype=np.intp)
+        return sum_log_intensities(self.log_intensities, peak_indices, minimum)
+
+    def weighted_log_intensity_sum(self, peak_indices, mass_errors, error_tolerance=2e-5):
+        """Sum the log intensities of the peaks at `peak_indices`, each weighted by
+        how close its match was, ``1 - (|error| / error_tolerance) ** 4``.
+
+        Parameters
+        ----------
+        peak_indices : :class:`Sequence` of int
+        mass_errors : :class:`Sequence` of float
+            The PPM error of the match to each peak
+        error_tolerance : float
+
+        Returns
+        -------
+        float
+        """
+        peak_indices = np.ascontiguousarray(peak_indices, dtype=np.intp)
+        mass_errors = np.ascontiguousarray(mass_errors, dtype=float)
+        return weighted_log_intensity_sum(self.log_intensities, peak_indices, mass_errors, error_tolerance)
+
+    def sorted_intensities(self, excluded=None):
+        """Get the intensities of all peaks not in `excluded` in ascending order.
+
+        Parameters
+        ----------
+        excluded : :class:`Iterable` of int, optional
+            The indices of peaks to leave out
+
+        Returns
+        -------
+        :class:`np.ndarray`
+        """
+        order = self.intensity_order
+        if excluded:
+            keep = np.ones(len(self.peaks), dtype=bool)
+            keep[list(excluded)] = False
+            order = order[keep[order]]
+        return self.intensities[order]
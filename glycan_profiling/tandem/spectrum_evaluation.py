@@ -120,7 +120,8 @@ class TandemClusterEvaluatorBase(TaskBase):
             for structure in hits:
                 result = self.evaluate(
                     scan, structure, mass_shift=mass_shift, **kwargs)
-                solutions.append(result)
+                if result is not None:
+                    solutions.append(result)
         out = self.solution_set_type(
             scan, solutions).sort().threshold()
         return out
@@ -33,6 +33,17 @@ class SpectrumMatchRetentionStrategyBase(object):
     def __call__(self, solution_set):
         return self.filter_matches(solution_set)
 
+    def minimum_score(self):
+        """The score a :class:`SpectrumMatch` must reach to be retained by this
+        strategy, regardless of the other members of the list.
+
+        Returns
+        -------
+        float or :const:`None`
+            :const:`None` if this strategy does not impose an absolute minimum
+        """
+        return None
+
     def __repr__(self):
         return "{self.__class__.__name__}({self.threshold})".format(self=self)
 
@@ -57,6 +68,9 @@ class MinimumScoreRetentionStrategy(SpectrumMatchRetentionStrategyBase):
                 retain.append(match)
         return retain
 
+    def minimum_score(self):
+        return self.threshold
+
 
 class MinimumMultiScoreRetentionStrategy(SpectrumMatchRetentionStrategyBase):
     """A strategy for filtering :class:`~.SpectrumMatch` from a list if
@@ -82,6 +96,10 @@ class MinimumMultiScoreRetentionStrategy(SpectrumMatchRetentionStrategyBase):
                 retain.append(match)
         return retain
 
+    def minimum_score(self):
+        # The first dimension of the score set is the match's score
+        return self.threshold[0]
+
 
 class MaximumSolutionCountRetentionStrategy(SpectrumMatchRetentionStrategyBase):
     """A strategy for filtering :class:`~.SpectrumMatch` from a list to retain
@@ -208,6 +226,13 @@ class SpectrumMatchRetentionMethod(SpectrumMatchRetentionStrategyBase):
             retained = strategy(retained)
         return retained
 
+    def minimum_score(self):
+        thresholds = [strategy.minimum_score() for strategy in self.strategies]
+        thresholds = [threshold for threshold in thresholds if threshold is not None]
+        if not thresholds:
+            return None
+        return max(thresholds)
+
     def __repr__(self):
         return "{self.__class__.__name__}({self.strategies!r})".format(self=self)
 
@@ -12,6 +12,7 @@ from glycan_profiling.structure import (
 from glycan_profiling.chromatogram_tree import Unmodified
 
 from glycan_profiling.tandem.ref import TargetReference, SpectrumReference
+from glycan_profiling.tandem.peak_index import ScanPeakIndex
 
 
 neutron_offset = isotopic_shift()
@@ -294,6 +295,31 @@ class SpectrumMatcherBase(SpectrumMatchBase):
         """
         raise NotImplementedError()
 
+    def score_upper_bound(self, *args, **kwargs):
+        """Calculate a value which :meth:`calculate_score` cannot exceed for this
+        match, without calling :meth:`match`.
+
+        The default implementation cannot bound the score and returns infinity.
+        Subclasses which can bound their score cheaply should override this so
+        that :meth:`evaluate` can skip matches which cannot be retained.
+
+        Returns
+        -------
+        float
+        """
+        return float('inf')
+
+    @property
+    def peak_index(self):
+        """The :class:`~.ScanPeakIndex` of :attr:`scan`, shared with every other
+        match against the same scan.
+
+        Returns
+        -------
+        :class:`~.ScanPeakIndex`
+        """
+        return ScanPeakIndex.from_scan(self.scan)
+
     def base_peak(self):
         """Find the base peak intensity of the spectrum, the
         most intense peak's intensity.
@@ -303,10 +329,7 @@ class SpectrumMatcherBase(SpectrumMatchBase):
         float
 
         """
-        try:
-            return max([peak.intensity for peak in self.spectrum])
-        except ValueError:
-            return 0
+        return self.peak_index.base_peak_intensity
 
     @classmethod
     def evaluate(cls, scan, target, *args, **kwargs):
@@ -320,13 +343,20 @@ class SpectrumMatcherBase(SpectrumMatchBase):
             The scan to match against.
         target : :class:`object`
             The structure to match.
+        prune_below_score : float, optional
+            If given, :meth:`score_upper_bound` is checked first, and if it is less
+            than this value, the match is not carried out and :const:`None` is returned.
 
         Returns
         -------
         :class:`SpectrumMatcherBase`
         """
         mass_shift = kwargs.pop("mass_shift", Unmodified)
+        prune_below_score = kwargs.pop("prune_below_score", None)
         inst = cls(scan, target, mass_shift=mass_shift)
+        if prune_below_score is not None:
+            if inst.score_upper_bound(*args, **kwargs) < prune_below_score:
+                return None
         inst.match(*args, **kwargs)
         inst.calculate_score(*args, **kwargs)
         return inst
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ms_deisotope.output import ProcessedMzMLDeserializer
+
+from glycan_profiling.serialize import DatabaseBoundOperation, MSScan
+from glycan_profiling.output.annotate_spectra import SpectrumAnnotatorExport
+from glycan_profiling.test.fixtures import get_test_data
+from glycan_profiling.test.test_columnar_export import populate_glycopeptide_analysis
+
+
+class TestSpectrumAnnotatorExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database_path = os.path.join(self.directory, "analysis.db")
+        self.mzml_path = get_test_data("example_glycopeptide_spectra.mzML")
+        db = DatabaseBoundOperation(self.database_path)
+        self.analysis_id = populate_glycopeptide_analysis(db.session)
+        self.scan_ids = [scan.id for scan in ProcessedMzMLDeserializer(self.mzml_path)]
+        # Point every stored scan at a spectrum in the test file. Matches sharing a
+        # spectrum and structure overwrite the same figure.
+        for i, scan in enumerate(db.query(MSScan).order_by(MSScan.index)):
+            scan.scan_id = self.scan_ids[min(i, len(self.scan_ids) - 1)]
+        db.session.commit()
+        db.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _run(self, n_processes):
+        output_path = os.path.join(self.directory, "spectra-%d" % n_processes)
+        task = SpectrumAnnotatorExport(
+            self.database_path, self.analysis_id, output_path, self.mzml_path,
+            n_processes=n_processes, chunk_size=3)
+        self.assertEqual(task.run(), 7)
+        return sorted(os.listdir(output_path))
+
+    def test_serial(self):
+        files = self._run(1)
+        self.assertEqual(len(files), len(self.scan_ids))
+        self.assertTrue(all(f.endswith(".pdf") for f in files))
+
+    def test_parallel(self):
+        self.assertEqual(self._run(2), self._run(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from glycan_profiling.benchmark import (
+    BenchmarkCase, BenchmarkRunner, BenchmarkHistory, benchmark_registry,
+    execute_benchmark, compare_to_baseline)
+from glycan_profiling.benchmark.synthetic import (
+    ReplicatedRunPeakSource, load_sample, glycomics_sample)
+from glycan_profiling.trace import ChromatogramExtractor
+
+
+class CountingBenchmark(BenchmarkCase):
+    name = "counting"
+
+    def setup(self):
+        self.values = list(range(1000 * self.scale))
+        self.prepared = 0
+
+    def prepare(self):
+        self.prepared += 1
+
+    def run(self):
+        return sum(1 for _ in self.values)
+
+
+class FailingBenchmark(BenchmarkCase):
+    name = "failing"
+
+    def run(self):
+        raise ValueError("boom")
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_execute(self):
+        result = execute_benchmark(CountingBenchmark, scale=2, repeats=3)
+        self.assertFalse(result.failed)
+        self.assertEqual(result.items, 2000)
+        self.assertEqual(len(result.wall_times), 3)
+        self.assertAlmostEqual(result.items_per_second, 2000 / result.wall_time)
+        self.assertTrue(result.peak_rss is None or result.peak_rss > 0)
+
+        result = execute_benchmark(FailingBenchmark)
+        self.assertTrue(result.failed)
+        self.assertIn("boom", result.error)
+
+    def test_history_and_baseline(self):
+        runner = BenchmarkRunner([CountingBenchmark, FailingBenchmark], repeats=2, isolate=False)
+        record = runner.run()
+        self.assertEqual([r['name'] for r in record['results']], ['counting', 'failing'])
+
+        history = BenchmarkHistory(os.path.join(self.directory, "history.json"))
+        self.assertIsNone(history.latest())
+        history.append(record)
+        history.append(record)
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history.latest()['results'], record['results'])
+
+        self.assertEqual(compare_to_baseline(record, record), [])
+        baseline = history.latest()
+        baseline['results'][0]['wall_times'] = [t / 2. for t in baseline['results'][0]['wall_times']]
+        regressions = compare_to_baseline(record, baseline, time_tolerance=0.5)
+        self.assertEqual([(r.name, r.metric) for r in regressions], [('counting', 'wall_time')])
+        self.assertAlmostEqual(regressions[0].ratio, 2.0)
+
+    def test_registered_case(self):
+        self.assertIn("target-decoy-q-values", benchmark_registry)
+        result = execute_benchmark(benchmark_registry["target-decoy-q-values"], repeats=1)
+        self.assertFalse(result.failed, result.error)
+        self.assertEqual(result.items, 20000)
+
+
+class TestReplicatedRunPeakSource(unittest.TestCase):
+    def test_extraction_scales(self):
+        loader = load_sample(glycomics_sample)
+        counts = []
+        for scale in (1, 2):
+            source = ReplicatedRunPeakSource(loader, scale)
+            extractor = ChromatogramExtractor(source, minimum_mass=500, delta_rt=0.5)
+            chromatograms = extractor.run()
+            counts.append((len(extractor.accumulated), len(chromatograms)))
+        self.assertEqual(counts[1], (counts[0][0] * 2, counts[0][1] * 2))
+        scan_id = source.replicate_id(next(iter(loader.extended_index.ms1_ids)), 1)
+        header = source.get_scan_header_by_id(scan_id)
+        self.assertEqual(header.id, scan_id)
+        self.assertAlmostEqual(header.scan_time, source.convert_scan_id_to_retention_time(scan_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
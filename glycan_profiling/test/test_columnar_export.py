@@ -0,0 +1,135 @@
+import io
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from glycan_profiling.serialize import (
+    DatabaseBoundOperation, GlycopeptideHypothesis, Protein, Peptide, Glycopeptide, SampleRun, MSScan,
+    PrecursorInformation, Analysis, CompoundMassShift, GlycopeptideSpectrumMatch,
+    GlycopeptideSpectrumSolutionSet, GlycopeptideSpectrumCluster, IdentifiedGlycopeptide,
+    Chromatogram, ChromatogramSolution, GlycanCombination)
+from glycan_profiling.serialize.tandem import GlycopeptideSpectrumMatchScoreSet
+from glycan_profiling.output.columnar import (
+    GlycopeptideSpectrumMatchColumnarExporter, IdentifiedGlycopeptideColumnarExporter,
+    make_chunk_writer, read_columnar_directory)
+
+
+def populate_glycopeptide_analysis(session):
+    hypothesis = GlycopeptideHypothesis(name='hypothesis', parameters={'enzymes': ['trypsin']})
+    session.add(hypothesis)
+    session.flush()
+    protein = Protein(name='protein', protein_sequence='NVTKNST', hypothesis_id=hypothesis.id)
+    session.add(protein)
+    session.flush()
+    peptide = Peptide(
+        protein_id=protein.id, hypothesis_id=hypothesis.id, start_position=0, end_position=4,
+        calculated_mass=400., base_peptide_sequence='NVTK', modified_peptide_sequence='NVTK')
+    session.add(peptide)
+    session.flush()
+    glycan_combination = GlycanCombination(
+        hypothesis_id=hypothesis.id, count=1, composition='{Hex:5; HexNAc:2}', calculated_mass=1216.42)
+    session.add(glycan_combination)
+    session.flush()
+    glycopeptide = Glycopeptide(
+        peptide_id=peptide.id, protein_id=protein.id, hypothesis_id=hypothesis.id,
+        glycan_combination_id=glycan_combination.id,
+        glycopeptide_sequence='N(N-Glycosylation)VTK{Hex:5; HexNAc:2}', calculated_mass=1000.)
+    session.add(glycopeptide)
+    session.flush()
+    sample_run = SampleRun(name='sample')
+    session.add(sample_run)
+    session.flush()
+    analysis = Analysis(
+        name='analysis', sample_run_id=sample_run.id, analysis_type='glycopeptide_lc_msms',
+        parameters={
+            'hypothesis_id': hypothesis.id, 'sample_path': 'sample.mzML', 'mass_error_tolerance': 1e-5,
+            'grouping_error_tolerance': 1.5e-5, 'fragment_error_tolerance': 2e-5, 'psm_fdr_threshold': 0.05})
+    session.add(analysis)
+    session.flush()
+    unmodified = CompoundMassShift(name='Unmodified')
+    session.add(unmodified)
+    mass_shift = CompoundMassShift(name='Ammonium')
+    session.add(mass_shift)
+    cluster = GlycopeptideSpectrumCluster(analysis_id=analysis.id)
+    session.add(cluster)
+    session.flush()
+    for i in range(7):
+        scan = MSScan(scan_id='scan=%d' % i, scan_time=i * 0.5, sample_run_id=sample_run.id,
+                      ms_level=2, index=i)
+        session.add(scan)
+        session.flush()
+        session.add(PrecursorInformation(
+            product_id=scan.id, neutral_mass=1000.01, charge=2, intensity=1e5,
+            sample_run_id=sample_run.id))
+        solution_set = GlycopeptideSpectrumSolutionSet(
+            scan_id=scan.id, analysis_id=analysis.id, cluster_id=cluster.id, is_decoy=False)
+        session.add(solution_set)
+        session.flush()
+        match = GlycopeptideSpectrumMatch(
+            scan_id=scan.id, analysis_id=analysis.id, score=10 + i, q_value=0.01,
+            solution_set_id=solution_set.id, structure_id=glycopeptide.id, is_decoy=False,
+            is_best_match=True, mass_shift_id=mass_shift.id if i % 2 else unmodified.id)
+        session.add(match)
+        session.flush()
+        if i < 3:
+            session.add(GlycopeptideSpectrumMatchScoreSet(
+                id=match.id, peptide_score=5, glycan_score=3, glycopeptide_score=8, glycan_coverage=0.5,
+                total_q_value=0.0, peptide_q_value=0.0, glycan_q_value=0.0, glycopeptide_q_value=0.0))
+    chromatogram = Chromatogram(
+        neutral_mass=1000.02, start_time=1.0, end_time=3.0, analysis_id=analysis.id)
+    session.add(chromatogram)
+    session.flush()
+    solution = ChromatogramSolution(chromatogram_id=chromatogram.id, analysis_id=analysis.id, score=0.9)
+    session.add(solution)
+    session.flush()
+    session.add(IdentifiedGlycopeptide(
+        analysis_id=analysis.id, structure_id=glycopeptide.id, ms1_score=0.9, ms2_score=16,
+        q_value=0.01, chromatogram_solution_id=solution.id, spectrum_cluster_id=cluster.id))
+    session.add(IdentifiedGlycopeptide(
+        analysis_id=analysis.id, structure_id=glycopeptide.id, ms1_score=0.1, ms2_score=12,
+        q_value=0.02, spectrum_cluster_id=cluster.id))
+    session.commit()
+    return analysis.id
+
+
+class TestColumnarExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db = DatabaseBoundOperation("sqlite://")
+        self.analysis_id = populate_glycopeptide_analysis(self.db.session)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_unknown_column(self):
+        with self.assertRaises(ValueError):
+            GlycopeptideSpectrumMatchColumnarExporter(self.db.session, self.analysis_id, columns=['spam'])
+
+    def test_spectrum_matches_columnar(self):
+        exporter = GlycopeptideSpectrumMatchColumnarExporter(self.db.session, self.analysis_id, chunk_size=3)
+        self.assertEqual(exporter.run(make_chunk_writer('columnar', self.directory, exporter)), 7)
+        table = read_columnar_directory(self.directory)
+        self.assertEqual(list(table.keys()), exporter.column_names())
+        self.assertEqual(list(table['scan_id']), ['scan=%d' % i for i in range(7)])
+        self.assertTrue(np.allclose(table['ms2_score'], np.arange(10, 17)))
+        self.assertEqual(np.isnan(table['peptide_score']).sum(), 4)
+        self.assertEqual(list(table['mass_shift_name'][:2]), ['Unmodified', 'Ammonium'])
+
+    def test_identifications_csv(self):
+        exporter = IdentifiedGlycopeptideColumnarExporter(
+            self.db.session, self.analysis_id, columns=['glycopeptide', 'q_value', 'msms_count', 'protein_name'])
+        buffer = io.BytesIO()
+        buffer.mode = 'wb'
+        writer = make_chunk_writer('csv', None, exporter, buffer)
+        self.assertEqual(exporter.run(writer), 2)
+        writer.outstream.detach()
+        lines = buffer.getvalue().decode('utf8').splitlines()
+        self.assertEqual(lines[0], 'glycopeptide,q_value,msms_count,protein_name')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].endswith(',7,protein'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import pickle
+import unittest
+
+from itertools import combinations
+
+from glycopeptidepy import PeptideSequence
+from glypy.structure.glycan_composition import HashableGlycanComposition
+
+from glycan_profiling.serialize.hypothesis.glycan import GlycanTypes
+from glycan_profiling.structure.structure_loader import PeptideDatabaseRecord
+from glycan_profiling.tandem.glycopeptide.core_search import GlycanCombinationRecord
+from glycan_profiling.tandem.glycopeptide.dynamic_generation.search_space import (
+    PeptideGlycosylator, PeptideMassCandidateMemo, LazyRecord, Record)
+
+
+peptide_sequences = [
+    ("PEPTNITK", [4], [3]),
+    ("QLNSSNGTK", [2, 5], []),
+    ("AANGTSTR", [2], [4, 5, 6]),
+]
+
+glycan_compositions = [
+    ("{Hex:5; HexNAc:2}", 1, [GlycanTypes.n_glycan]),
+    ("{Hex:5; HexNAc:4; Neu5Ac:2}", 1, [GlycanTypes.n_glycan]),
+    ("{Hex:10; HexNAc:4}", 2, [GlycanTypes.n_glycan]),
+    ("{Hex:1; HexNAc:1; Neu5Ac:1}", 1, [GlycanTypes.o_glycan]),
+]
+
+
+def make_peptides():
+    peptides = []
+    for i, (seq, n_sites, o_sites) in enumerate(peptide_sequences, 1):
+        peptides.append(PeptideDatabaseRecord(
+            i, PeptideSequence(seq).mass, seq, 1, i * 10, i * 10 + len(seq), 1,
+            n_sites, o_sites, []))
+    return peptides
+
+
+def make_glycan_combinations():
+    water = 18.0105646837
+    combinations = []
+    for i, (gc, count, types) in enumerate(glycan_compositions, 1):
+        gc = HashableGlycanComposition.parse(gc)
+        combinations.append(GlycanCombinationRecord(
+            i, gc.mass() - water * count, gc, count, types))
+    return combinations
+
+
+class TestLazyCandidateGeneration(unittest.TestCase):
+
+    def make_glycosylator(self):
+        return PeptideGlycosylator(make_peptides(), make_glycan_combinations())
+
+    def test_total_mass(self):
+        glycosylator = self.make_glycosylator()
+        records = []
+        for peptide in make_peptides():
+            glycosylator._combinate_keys(peptide, make_glycan_combinations(), records)
+        self.assertTrue(len(records) > 0)
+        for record in records:
+            self.assertAlmostEqual(
+                glycosylator.build_glycoform(record).total_mass, record.total_mass, 5)
+
+    def test_handle_peptide_mass_is_lazy(self):
+        glycosylator = self.make_glycosylator()
+        peptide = make_peptides()[0]
+        glycan = make_glycan_combinations()[1]
+        intact_mass = peptide.calculated_mass + glycan.dehydrated_mass
+        records = glycosylator.handle_peptide_mass(peptide.calculated_mass, intact_mass, 1e-5, 1e-5)
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertIsInstance(record, LazyRecord)
+        self.assertIsNone(record._glycopeptide)
+        self.assertEqual(record.id.glycan_combination_id, glycan.id)
+
+        decoy = record.to_decoy_glycan()
+        self.assertIsNone(decoy._glycopeptide)
+        self.assertTrue(decoy.id.is_decoy())
+
+        self.assertEqual(
+            record.glycopeptide, "PEPTN(N-Glycosylation)ITK{Hex:5; HexNAc:4; Neu5Ac:2}")
+        self.assertEqual(record.glycopeptide, decoy.glycopeptide)
+        self.assertEqual(decoy.glycan_prior, 0.0)
+
+        # Records outside the precursor tolerance are never produced
+        self.assertEqual(glycosylator.handle_peptide_mass(
+            peptide.calculated_mass, intact_mass + 1.0, 1e-2, 1e-5), [])
+
+        dup = pickle.loads(pickle.dumps(record, -1))
+        self.assertEqual(dup, record)
+        self.assertEqual(dup.convert().total_mass, record.convert().total_mass)
+
+    def test_matches_eager_construction(self):
+        glycosylator = self.make_glycosylator()
+        for peptide in make_peptides():
+            peptide_obj = peptide.convert()
+            for glycan in make_glycan_combinations():
+                for tp in glycan.glycan_types:
+                    if tp == GlycanTypes.n_glycan:
+                        sites = peptide.n_glycosylation_sites
+                    else:
+                        sites = peptide.o_glycosylation_sites
+                    lazy = glycosylator.handle_peptide_mass(
+                        peptide.calculated_mass, peptide.calculated_mass + glycan.dehydrated_mass,
+                        1e-5)
+                    lazy = {r.id: r.glycopeptide for r in lazy if r.id.glycan_combination_id == glycan.id}
+                    expected = {}
+                    unoccupied = [s for s in sites if not peptide_obj[s][1]]
+                    for i, site_set in enumerate(combinations(unoccupied, glycan.count)):
+                        seq = peptide_obj.clone()
+                        for site in site_set:
+                            seq.add_modification(site, "N-Glycosylation" if tp == GlycanTypes.n_glycan
+                                                 else "O-Glycosylation")
+                        seq.glycan = glycan.composition
+                        expected[i] = str(seq)
+                    self.assertEqual(
+                        sorted(expected.values()), sorted(lazy.values()))
+
+    def test_record_compatibility(self):
+        glycosylator = self.make_glycosylator()
+        lazy = list(glycosylator.generate_crossproduct(2600, 10000))
+        for record in lazy:
+            rebuilt = Record.parse(record.serialize())
+            self.assertEqual(rebuilt.glycopeptide, record.glycopeptide)
+            self.assertEqual(rebuilt.id, record.id)
+
+
+class TestPeptideMassCandidateMemo(unittest.TestCase):
+
+    def test_matches_handle_peptide_mass(self):
+        glycosylator = PeptideGlycosylator(make_peptides(), make_glycan_combinations())
+        memo = PeptideMassCandidateMemo(glycosylator, 1e-5)
+        n = 0
+        for peptide in make_peptides():
+            for glycan in make_glycan_combinations():
+                for peptide_shift in (-0.009, -0.004, 0.0, 0.004, 0.009):
+                    peptide_mass = peptide.calculated_mass + peptide_shift
+                    intact_mass = peptide.calculated_mass + glycan.dehydrated_mass + peptide_shift / 2.
+                    for precursor_error_tolerance in (None, 1e-5):
+                        expected = glycosylator.handle_peptide_mass(
+                            peptide_mass, intact_mass, 1e-5, precursor_error_tolerance)
+                        observed = memo.search(peptide_mass, intact_mass, precursor_error_tolerance)
+                        self.assertEqual(
+                            sorted(r.id for r in expected), sorted(r.id for r in observed))
+                        n += len(expected)
+        self.assertTrue(n > 0)
+        self.assertTrue(memo.hits > 0)
+        memo.clear()
+        self.assertEqual(len(memo), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+import numpy as np
+
+from glypy.structure.glycan_composition import HashableGlycanComposition
+
+from glycan_profiling.scoring.elution_time_grouping import (
+    GlycopeptideChromatogramProxy,
+    ReplicatedAbundanceWeightedPeptideFactorElutionTimeFitter)
+from glycan_profiling.scoring.elution_time_grouping.linear_regression import (
+    weighted_linear_regression_fit, ransac, normal_matrix, downdate_normal_matrix)
+
+
+peptides = ["PEPTN(N-Glycosylation)ITK", "QLN(N-Glycosylation)SSR", "AAN(N-Glycosylation)GTK"]
+
+
+def make_cases():
+    rng = np.random.RandomState(0)
+    cases = []
+    for rep_i, rep in enumerate(['r1', 'r2', 'r3']):
+        for pep_i, peptide in enumerate(peptides):
+            for hex_ in range(3, 7):
+                for hexnac in range(3, 6):
+                    for neuac in range(0, 3):
+                        gc = HashableGlycanComposition(Hex=hex_, HexNAc=hexnac, Neu5Ac=neuac)
+                        seq = peptide + "{Hex:%d; HexNAc:%d; Neu5Ac:%d}" % (hex_, hexnac, neuac)
+                        apex_time = (20 + 5 * pep_i - 0.3 * hex_ + 0.2 * hexnac + 1.0 * neuac +
+                                     0.5 * rep_i + rng.normal(0, 0.2))
+                        cases.append(GlycopeptideChromatogramProxy(
+                            1000. + hex_ * 162, apex_time, rng.uniform(1e4, 1e6), gc,
+                            structure=seq, analysis_name=rep))
+    return cases
+
+
+class TestWeightedLinearRegression(unittest.TestCase):
+
+    def _make_data(self, n=200):
+        rng = np.random.RandomState(1)
+        X = np.vstack([np.ones(n), rng.uniform(0, 1, n)]).T
+        y = X.dot([1.0, 2.0]) + rng.normal(0, 0.05, n)
+        w = rng.uniform(0.1, 1.0, n)
+        return X, y, w
+
+    def test_leverage(self):
+        X, y, w = self._make_data()
+        fit = weighted_linear_regression_fit(X, y, w, include_projection_matrix=True)
+        W = np.diag(w)
+        H = X.dot(np.linalg.pinv(X.T.dot(W).dot(X))).dot(X.T).dot(W)
+        self.assertTrue(np.allclose(np.diag(H), fit.leverage))
+        self.assertTrue(np.allclose(H, fit.projection_matrix))
+
+    def test_downdate(self):
+        X, y, w = self._make_data()
+        xtwx = normal_matrix(X, w)
+        removed = np.arange(0, 200, 3)
+        kept = np.setdiff1d(np.arange(200), removed)
+        self.assertTrue(np.allclose(
+            downdate_normal_matrix(xtwx, X[removed], w[removed]),
+            normal_matrix(X[kept], w[kept])))
+
+    def test_ransac(self):
+        X, y, w = self._make_data()
+        y[:20] += 10
+        fit = ransac(X, y, w)
+        self.assertTrue(np.allclose(fit.parameters, [1.0, 2.0], atol=0.05))
+        chunked = ransac(X, y, w, chunk_size=7)
+        self.assertTrue(np.allclose(fit.parameters, chunked.parameters))
+
+
+class TestElutionTimeModelSubset(unittest.TestCase):
+
+    def test_training_scores(self):
+        cases = make_cases()
+        model = ReplicatedAbundanceWeightedPeptideFactorElutionTimeFitter(
+            cases, ['Hex', 'HexNAc', 'Neu5Ac'])
+        model.fit()
+        scores = model.training_scores()
+        self.assertTrue(np.allclose(scores, [model.score(case) for case in cases]))
+
+    def test_subset_matches_fresh_model(self):
+        cases = make_cases()
+        model = ReplicatedAbundanceWeightedPeptideFactorElutionTimeFitter(
+            cases, ['Hex', 'HexNAc', 'Neu5Ac'])
+        model.fit()
+        # Drops the reference replicate and all but one peptide, so both the
+        # peptide and replicate indicator columns must be compacted.
+        indices = [i for i, case in enumerate(cases)
+                   if str(case.structure).startswith("QLN") and case.analysis_name != 'r1']
+        subset = model.subset(indices)
+        subset.fit()
+        fresh = ReplicatedAbundanceWeightedPeptideFactorElutionTimeFitter(
+            [cases[i] for i in indices], ['Hex', 'HexNAc', 'Neu5Ac'])
+        fresh.fit()
+        self.assertEqual(subset.feature_names(), fresh.feature_names())
+        self.assertTrue(np.allclose(subset.parameters, fresh.parameters))
+        self.assertTrue(np.allclose(
+            [subset.predict(cases[i]) for i in indices],
+            [fresh.predict(cases[i]) for i in indices]))
+
+
+if __name__ == '__main__':
+    unittest.main()
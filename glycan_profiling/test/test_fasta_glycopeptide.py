@@ -1,4 +1,6 @@
 import unittest
+import os
+import shutil
 import tempfile
 
 from glycan_profiling.serialize.hypothesis.peptide import Peptide, Protein, Glycopeptide
@@ -7,6 +9,9 @@ from glycan_profiling.database.builder.glycan import (
     TextFileGlycanHypothesisSerializer,
     CombinatorialGlycanHypothesisSerializer)
 from glycan_profiling import serialize
+from glycan_profiling.database.disk_backed_database import (
+    GlycopeptideDiskBackedStructureDatabase,
+    ImplicitGlycopeptideDiskBackedStructureDatabase)
 from glycan_profiling.test import fixtures
 
 from glycan_profiling.test.test_constrained_combinatorics import FILE_SOURCE as GLYCAN_RULE_FILE_SOURCE
@@ -95,6 +100,12 @@ simple_n_glycans = """
 {Hex:5; HexNAc:2}    N-Glycan
 """
 
+mixed_glycans = """
+{Hex:5; HexNAc:2}    N-Glycan
+{Hex:5; HexNAc:4; Neu5Ac:2}    N-Glycan
+{Hex:1; HexNAc:1; Neu5Ac:2}    O-Glycan
+"""
+
 decorin = """
 >sp|P21793|PGS2_BOVIN Decorin
 MKATIIFLLVAQVSWAGPFQQKGLFDFMLEDEASGIGPEEHFPEVPEIEPMGPVCPFRCQ
@@ -223,6 +234,111 @@ class FastaGlycopeptideTests(unittest.TestCase):
         self.clear_file(fasta_file)
         self.clear_file(glycan_file)
 
+    def test_digest_cache(self):
+        glycan_file = self.setup_tempfile(simple_n_glycans)
+        fasta_file = self.setup_tempfile(FASTA_FILE_SOURCE)
+        cache_dir = tempfile.mkdtemp()
+
+        def build(task_type, digest_cache, **kwargs):
+            db_file = self.setup_tempfile("")
+            glycan_builder = TextFileGlycanHypothesisSerializer(glycan_file, db_file)
+            glycan_builder.start()
+            glycopeptide_builder = task_type(
+                fasta_file, db_file, glycan_builder.hypothesis_id,
+                constant_modifications=constant_modifications,
+                variable_modifications=variable_modifications, max_missed_cleavages=1,
+                digest_cache=digest_cache, **kwargs)
+            glycopeptide_builder.extract_proteins()
+            glycopeptide_builder.digest_proteins()
+            peptides = sorted(glycopeptide_builder.query(
+                Protein.name, Peptide.modified_peptide_sequence, Peptide.start_position,
+                Peptide.end_position, Peptide.n_glycosylation_sites).join(Peptide.protein).all())
+            self.clear_file(db_file)
+            return peptides
+
+        reference = build(naive_glycopeptide.FastaGlycopeptideHypothesisSerializer, None)
+        self.assertTrue(len(reference) > 0)
+        self.assertEqual(reference, build(
+            naive_glycopeptide.FastaGlycopeptideHypothesisSerializer, cache_dir))
+        self.assertTrue(len(os.listdir(cache_dir)) > 0)
+        self.assertEqual(reference, build(
+            naive_glycopeptide.FastaGlycopeptideHypothesisSerializer, cache_dir))
+
+        # The multiprocess digestor uses the default peptide length range,
+        # so compare it only against itself
+        reference = build(
+            naive_glycopeptide.MultipleProcessFastaGlycopeptideHypothesisSerializer, None, n_processes=2)
+        self.assertEqual(reference, build(
+            naive_glycopeptide.MultipleProcessFastaGlycopeptideHypothesisSerializer, cache_dir,
+            n_processes=2))
+        self.assertEqual(reference, build(
+            naive_glycopeptide.MultipleProcessFastaGlycopeptideHypothesisSerializer, cache_dir,
+            n_processes=2))
+
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        self.clear_file(glycan_file)
+        self.clear_file(fasta_file)
+
+    def test_implicit_cross_product(self):
+        glycan_file = self.setup_tempfile(mixed_glycans)
+        fasta_file = self.setup_tempfile(FASTA_FILE_SOURCE)
+
+        def build(full_cross_product):
+            db_file = self.setup_tempfile("")
+            glycan_builder = TextFileGlycanHypothesisSerializer(glycan_file, db_file)
+            glycan_builder.start()
+            glycopeptide_builder = naive_glycopeptide.FastaGlycopeptideHypothesisSerializer(
+                fasta_file, db_file, glycan_builder.hypothesis_id,
+                constant_modifications=constant_modifications,
+                variable_modifications=variable_modifications, max_missed_cleavages=1,
+                max_glycosylation_events=2, full_cross_product=full_cross_product)
+            glycopeptide_builder.start()
+            return db_file, glycopeptide_builder.hypothesis_id
+
+        full_db_file, full_hypothesis_id = build(True)
+        implicit_db_file, implicit_hypothesis_id = build(False)
+
+        full = GlycopeptideDiskBackedStructureDatabase(full_db_file, full_hypothesis_id)
+        implicit = ImplicitGlycopeptideDiskBackedStructureDatabase(implicit_db_file, implicit_hypothesis_id)
+        self.assertFalse(ImplicitGlycopeptideDiskBackedStructureDatabase.is_implicit(full.hypothesis))
+        self.assertTrue(ImplicitGlycopeptideDiskBackedStructureDatabase.is_implicit(implicit.hypothesis))
+        self.assertEqual(0, implicit.query(Glycopeptide).count())
+
+        def summarize(records):
+            return sorted((str(r.glycopeptide_sequence), round(r.calculated_mass, 4)) for r in records)
+
+        expected = summarize(full.get_all_records())
+        self.assertEqual(len(expected), len(full))
+        self.assertEqual(len(expected), len(implicit))
+        self.assertEqual(expected, summarize(implicit.get_all_records()))
+        self.assertEqual(sorted(map(str, full)), sorted(map(str, implicit)))
+        self.assertAlmostEqual(full.lowest_mass, implicit.lowest_mass, 4)
+        self.assertAlmostEqual(full.highest_mass, implicit.highest_mass, 4)
+
+        mass = 4123.718954557139
+        self.assertEqual(
+            summarize(full.search_mass(mass, 5.0)), summarize(implicit.search_mass(mass, 5.0)))
+
+        # Both hypotheses were built the same way, so their peptides and glycan
+        # combinations have the same ids
+        glycopeptides = {
+            (gp.glycopeptide_sequence, gp.peptide_id, gp.glycan_combination_id): gp
+            for gp in full.query(Glycopeptide).filter(
+                Glycopeptide.hypothesis_id == full_hypothesis_id)}
+        for record in implicit.search_mass(mass, 5.0):
+            self.assertEqual(
+                record.glycopeptide_sequence, implicit.get_record(record.id).glycopeptide_sequence)
+            inst = implicit.materialize_glycopeptide(record.id)
+            reference = glycopeptides[
+                inst.glycopeptide_sequence, inst.peptide_id, inst.glycan_combination_id]
+            self.assertEqual(reference.formula, inst.formula)
+            self.assertEqual(reference.protein_id, inst.protein_id)
+
+        self.clear_file(full_db_file)
+        self.clear_file(implicit_db_file)
+        self.clear_file(glycan_file)
+        self.clear_file(fasta_file)
+
     def test_extract_forward_backward(self):
         fasta_file = fixtures.get_test_data("yeast_glycoproteins.fa")
         glycan_file = self.setup_tempfile(simple_n_glycans)
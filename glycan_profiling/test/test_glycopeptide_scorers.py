@@ -5,8 +5,14 @@ from ms_deisotope.output import ProcessedMzMLDeserializer
 
 from glycan_profiling.test.fixtures import get_test_data
 
+from glycan_profiling.structure import FragmentCachingGlycopeptide
+from glycan_profiling.structure.structure_loader import GlycanAwareGlycopeptideFragmentCachingContext
+from glycan_profiling.tandem.glycopeptide.dynamic_generation.search_space import (
+    glycopeptide_key_t, StructureClassification)
+
 from glycan_profiling.tandem.glycopeptide.scoring import (
     base, intensity_scorer, simple_score, binomial_score, coverage_weighted_binomial)
+from glycan_profiling.tandem.spectrum_match import solution_set
 
 
 class TestGlycopeptideScorers(unittest.TestCase):
@@ -63,6 +69,31 @@ class TestGlycopeptideScorers(unittest.TestCase):
         match = coverage_weighted_binomial.CoverageWeightedBinomialScorer.evaluate(scan2, gp2)
         self.assertAlmostEqual(match.score, 162.67839798093911, 3)
 
+    def test_shared_backbone_matches(self):
+        scan, scan2 = self.load_spectra()
+        sequences = ['YLGN(N-Glycosylation)ATAIFFLPDEGK{Hex:5; HexNAc:4; Neu5Ac:1}',
+                     'YLGN(N-Glycosylation)ATAIFFLPDEGK{Hex:5; HexNAc:4; Neu5Ac:2}']
+        for scorer in (simple_score.SimpleCoverageScorer,
+                       coverage_weighted_binomial.CoverageWeightedBinomialScorer):
+            context = GlycanAwareGlycopeptideFragmentCachingContext()
+            for i, sequence in enumerate(sequences):
+                key = glycopeptide_key_t(
+                    0, 16, 1, 1, 1, i, StructureClassification.target_peptide_target_glycan, 0)
+                for spectrum in (scan, scan2):
+                    shared = FragmentCachingGlycopeptide(sequence)
+                    shared.id = key
+                    context(shared)
+                    alone = FragmentCachingGlycopeptide(sequence)
+                    alone.id = key
+                    shared_match = scorer.evaluate(spectrum, shared)
+                    alone_match = scorer.evaluate(spectrum, alone)
+                    self.assertAlmostEqual(shared_match.score, alone_match.score, 6)
+                    self.assertEqual(len(shared_match.solution_map), len(alone_match.solution_map))
+            keys = [k for k in context.keys() if k[0] == 'backbone_peak_matches']
+            # One entry per scan and ion series, shared by both glycoforms. The
+            # second scan is an EThcD scan, matching b, c, y and z ions.
+            self.assertEqual(len(keys), 6)
+
     def test_log_intensity(self):
         scan, scan2 = self.load_spectra()
         gp, gp2 = self.build_structures()
@@ -76,3 +107,20 @@ class TestGlycopeptideScorers(unittest.TestCase):
         self.assertAlmostEqual(match.score, 72.71569538828025, 3)
         match = intensity_scorer.LogIntensityScorer.evaluate(scan2, gp2)
         self.assertAlmostEqual(match.score, 157.97265377375456, 3)
+
+    def test_log_intensity_upper_bound(self):
+        scan, scan2 = self.load_spectra()
+        gp, gp2 = self.build_structures()
+        unrelated = PeptideSequence('PEPTIDEN(N-Glycosylation)K{Hex:5; HexNAc:4}')
+        for s in (scan, scan2):
+            for target in (gp, gp2, unrelated):
+                match = intensity_scorer.LogIntensityScorer.evaluate(s, target)
+                bound = intensity_scorer.LogIntensityScorer(s, target).score_upper_bound()
+                self.assertGreaterEqual(bound, match.score)
+
+        threshold = solution_set.default_multiscore_selection_method.minimum_score()
+        self.assertEqual(threshold, 1.0)
+        self.assertIsNone(intensity_scorer.LogIntensityModelTree.evaluate(
+            scan, unrelated, prune_below_score=threshold))
+        match = intensity_scorer.LogIntensityModelTree.evaluate(scan, gp, prune_below_score=threshold)
+        self.assertAlmostEqual(match.score, 55.396555993522334, 3)
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+
+from glycan_profiling.tandem.match_between_runs.index import MatchBetweenFeatureIndex
+
+
+class _Feature(object):
+    def __init__(self, neutral_mass, apex_time, mass_shifts=None):
+        self.neutral_mass = self.weighted_neutral_mass = neutral_mass
+        self.apex_time = apex_time
+        self.mass_shifts = mass_shifts or []
+
+
+class _Dataset(object):
+    def __init__(self, label, chromatograms):
+        self.label = label
+        self.chromatograms = chromatograms
+
+
+class _MassShift(object):
+    def __init__(self, mass):
+        self.mass = mass
+
+
+class TestMatchBetweenFeatureIndex(unittest.TestCase):
+
+    def _make_datasets(self, n_datasets=4, n_features=300):
+        rng = np.random.RandomState(7)
+        datasets = []
+        for i in range(n_datasets):
+            features = [
+                _Feature(m, t) for m, t in zip(
+                    rng.uniform(1000, 5000, n_features), rng.uniform(0, 60, n_features))]
+            datasets.append(_Dataset("run-%d" % i, features))
+        return datasets
+
+    def _brute_force(self, datasets, mass, apex_time, mass_error_tolerance, time_error_tolerance):
+        hits = set()
+        for mbd in datasets:
+            for feature in mbd.chromatograms:
+                if abs(feature.neutral_mass - mass) / mass < mass_error_tolerance and abs(
+                        feature.apex_time - apex_time) < time_error_tolerance:
+                    hits.add(id(feature))
+        return hits
+
+    def test_search(self):
+        datasets = self._make_datasets()
+        index = MatchBetweenFeatureIndex(datasets)
+        for mbd in datasets:
+            for feature in mbd.chromatograms[::25]:
+                masses = [feature.neutral_mass, feature.neutral_mass + 0.01]
+                times = [feature.apex_time + 0.5, feature.apex_time]
+                for mass, apex_time, hits in zip(masses, times, index.search(masses, times, 1e-5, 2.0)):
+                    expected = self._brute_force(datasets, mass, apex_time, 1e-5, 2.0)
+                    self.assertEqual({id(index._get(i)[0]) for i in hits}, expected)
+
+    def test_find_with_added_features(self):
+        datasets = self._make_datasets()
+        index = MatchBetweenFeatureIndex(datasets, rebuild_threshold=2)
+        source = datasets[1].chromatograms[3]
+        query = _Feature(source.neutral_mass, source.apex_time, [_MassShift(0.0), _MassShift(17.026549)])
+        result = index.find(query, 1e-5, 2.0)
+        self.assertEqual([f for f, _ in result['run-1']], [source])
+
+        added = _Feature(source.neutral_mass + 17.026549, source.apex_time + 1.0)
+        index.add(added, 'run-2')
+        result = index.find(query, 1e-5, 2.0)
+        self.assertEqual(result['run-2'], [(added, query.mass_shifts[1])])
+        # Trigger merging the overflow buffer into the sorted arrays
+        index.add(_Feature(2000.0, 10.0), 'run-0')
+        self.assertEqual(len(index._pending), 0)
+        result = index.find(query, 1e-5, 2.0)
+        self.assertEqual(result['run-2'], [(added, query.mass_shifts[1])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import io
+import unittest
+
+from glycan_profiling.serialize import DatabaseBoundOperation, Analysis, IdentifiedGlycopeptide
+from glycan_profiling.output.xml import (
+    GNOmeResolver, MzIdentMLSerializer, StreamingMzIdentMLSerializer)
+from glycan_profiling.test.test_columnar_export import populate_glycopeptide_analysis
+
+
+class NamedBytesIO(io.BytesIO):
+    name = "analysis.mzid"
+
+    def close(self):
+        if not self.closed:
+            self.value = self.getvalue()
+        super(NamedBytesIO, self).close()
+
+
+class TestStreamingMzIdentMLSerializer(unittest.TestCase):
+    gnome_resolver = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.gnome_resolver = GNOmeResolver()
+
+    def setUp(self):
+        self.db = DatabaseBoundOperation("sqlite://")
+        self.analysis_id = populate_glycopeptide_analysis(self.db.session)
+        self.analysis = self.db.query(Analysis).get(self.analysis_id)
+
+    def write(self, serializer_type, *args, **kwargs):
+        outfile = NamedBytesIO()
+        serializer = serializer_type(
+            outfile, *args, export_mzml=False, gnome_resolver=self.gnome_resolver, **kwargs)
+        serializer.run()
+        return outfile.value.decode('utf8'), serializer
+
+    def test_matches_in_memory(self):
+        glycopeptides = self.db.query(IdentifiedGlycopeptide).filter(
+            IdentifiedGlycopeptide.analysis_id == self.analysis_id).all()
+        expected, in_memory = self.write(MzIdentMLSerializer, glycopeptides, self.analysis, self.db)
+        streamed, streaming = self.write(
+            StreamingMzIdentMLSerializer, self.analysis, self.db, chunk_size=2)
+        self.assertEqual(streaming.scan_ids, in_memory.scan_ids)
+        self.assertEqual(len(streaming.scan_ids), 7)
+        for tag in ("<DBSequence ", "<SpectrumIdentificationResult ", "<SpectrumIdentificationItem "):
+            self.assertEqual(streamed.count(tag), expected.count(tag), tag)
+        # Both identifications share one structure, which is written only once
+        self.assertEqual(streamed.count("<Peptide "), 1)
+        self.assertEqual(streamed.count("<PeptideEvidence "), 1)
+        self.assertEqual(streamed.count("<SpectrumIdentificationResult "), 7)
+
+    def test_thresholds(self):
+        streamed, streaming = self.write(
+            StreamingMzIdentMLSerializer, self.analysis, self.db, ms2_score_threshold=14)
+        self.assertEqual(streamed.count("<SpectrumIdentificationResult "), 3)
+        self.assertEqual(streaming.scan_ids, {'scan=4', 'scan=5', 'scan=6'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ms_deisotope.output import ProcessedMzMLDeserializer
+
+from glycan_profiling.test.fixtures import get_test_data
+from glycan_profiling.scan_cache import MzMLScanCacheHandler
+from glycan_profiling.tandem.oxonium_ions import gscore_scanner, oxonium_detector
+from glycan_profiling.tandem.oxonium_index import OxoniumIndex, OxoniumTriage
+
+
+class TestOxoniumIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def load_spectra(self):
+        return list(ProcessedMzMLDeserializer(get_test_data("example_glycopeptide_spectra.mzML")))
+
+    def test_oxonium_ratios(self):
+        scans = self.load_spectra()
+        index = OxoniumIndex.build(scans)
+        self.assertEqual(len(index), len(scans))
+        ratios = index.oxonium_ratios(use_acquisition_window=False)
+        for i, scan in enumerate(scans):
+            expected = gscore_scanner(scan.deconvoluted_peak_set)
+            self.assertAlmostEqual(ratios[i], expected)
+            self.assertAlmostEqual(index.oxonium_ratio(scan.id, use_acquisition_window=False), expected)
+            self.assertAlmostEqual(
+                index.oxonium_ratio(scan.id, oxonium_detector.ions_to_search, use_acquisition_window=False),
+                oxonium_detector(scan.deconvoluted_peak_set))
+        self.assertIn("HexNAc", index.row(scans[0].id))
+
+    def test_save_load(self):
+        scans = self.load_spectra()
+        index = OxoniumIndex.build(scans)
+        path = os.path.join(self.directory, "spectra.mzML")
+        self.assertIsNone(OxoniumIndex.for_file(path))
+        index.save(OxoniumIndex.index_file_name(path))
+        loaded = OxoniumIndex.for_file(path)
+        self.assertEqual(loaded.scan_ids, index.scan_ids)
+        self.assertEqual(loaded.ion_labels, index.ion_labels)
+        self.assertTrue(np.allclose(loaded.to_dense(), index.to_dense()))
+
+    def test_built_while_writing(self):
+        scans = self.load_spectra()
+        path = os.path.join(self.directory, "spectra.mzML")
+        handler = MzMLScanCacheHandler.configure_storage(path, "spectra")
+        for scan in scans:
+            handler.accumulate(scan)
+        handler.complete()
+        loaded = OxoniumIndex.for_file(path)
+        self.assertEqual(loaded.scan_ids, [scan.id for scan in scans])
+        self.assertTrue(np.allclose(loaded.to_dense(), OxoniumIndex.build(scans).to_dense()))
+
+    def test_triage(self):
+        scans = self.load_spectra()
+        index = OxoniumIndex.build(scans)
+        ratios = index.oxonium_ratios()
+        threshold = (ratios[0] + ratios[1]) / 2.
+        triage = OxoniumTriage(index, threshold)
+        kept, rejected = triage.triage(scans)
+        self.assertEqual([s.id for s in kept], [s.id for s, r in zip(scans, ratios) if r >= threshold])
+        self.assertEqual(len(kept) + len(rejected), len(scans))
+        self.assertEqual(len(kept), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+from ms_deisotope.output import ProcessedMzMLDeserializer
+
+from glycan_profiling.test.fixtures import get_test_data
+from glycan_profiling.tandem.peak_index import ScanPeakIndex
+
+
+class TestScanPeakIndex(unittest.TestCase):
+    def load_spectra(self):
+        return list(ProcessedMzMLDeserializer(get_test_data("example_glycopeptide_spectra.mzML")))
+
+    def test_match_masses(self):
+        for scan in self.load_spectra():
+            index = ScanPeakIndex.from_scan(scan)
+            self.assertIs(index, ScanPeakIndex.from_scan(scan))
+            peak_set = scan.deconvoluted_peak_set
+            masses = [p.neutral_mass + shift for p in peak_set for shift in (-0.05, 0.0, 0.01)]
+            masses.append(10.0)
+            for peaks, mass in zip(index.peaks_for_masses(masses, 2e-5), masses):
+                expected = peak_set.all_peaks_for(mass, 2e-5)
+                self.assertEqual(
+                    [p.index.neutral_mass for p in peaks],
+                    [p.index.neutral_mass for p in expected])
+
+    def test_intensity_statistics(self):
+        scan = self.load_spectra()[0]
+        index = ScanPeakIndex.from_scan(scan)
+        intensities = np.array([p.intensity for p in scan.deconvoluted_peak_set])
+        self.assertAlmostEqual(index.total_ion_current, intensities.sum())
+        self.assertAlmostEqual(index.base_peak_intensity, intensities.max())
+        self.assertEqual(index.intensity_rank[np.argmax(intensities)], 0)
+        excluded = {0, 3, 5}
+        kept = [intensities[i] for i in range(len(intensities)) if i not in excluded]
+        self.assertTrue(np.allclose(index.sorted_intensities(excluded), sorted(kept)))
+        self.assertEqual(sum(map(len, index.charge_groups.values())), len(index))
+
+    def test_log_intensity_sums(self):
+        scan = self.load_spectra()[0]
+        index = ScanPeakIndex.from_scan(scan)
+        peaks = list(scan.deconvoluted_peak_set)[::3]
+        peak_indices = [p.index.neutral_mass for p in peaks]
+        errors = np.linspace(-1e-5, 1e-5, len(peaks))
+        self.assertAlmostEqual(
+            index.sum_log_intensities(peak_indices),
+            sum(np.log10(p.intensity) for p in peaks))
+        self.assertAlmostEqual(
+            index.sum_log_intensities(peak_indices, 3.0),
+            sum(max(np.log10(p.intensity), 3.0) for p in peaks))
+        self.assertAlmostEqual(
+            index.weighted_log_intensity_sum(peak_indices, errors, 2e-5),
+            sum(np.log10(p.intensity) * (1 - (abs(e) / 2e-5) ** 4) for p, e in zip(peaks, errors)))
+        self.assertEqual(index.sum_log_intensities([]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ms_deisotope.output import ProcessedMzMLDeserializer
+
+from glycan_profiling.serialize import DatabaseBoundOperation, MSScan, IdentifiedGlycopeptide
+from glycan_profiling.output.report.base import RenderedFragmentCache
+from glycan_profiling.output.report.glycopeptide_lcmsms.render import GlycopeptideDatabaseSearchReportCreator
+from glycan_profiling.test.fixtures import get_test_data
+from glycan_profiling.test.test_columnar_export import populate_glycopeptide_analysis
+
+
+class TestRenderedFragmentCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_fetch(self):
+        cache = RenderedFragmentCache(os.path.join(self.directory, "cache"))
+        key = cache.key("plot", "PEPTIDE", 1.0)
+        self.assertEqual(key, cache.key("plot", "PEPTIDE", 1.0))
+        self.assertNotEqual(key, cache.key("plot", "PEPTIDE", 2.0))
+        self.assertNotEqual(key, cache.key("logo", "PEPTIDE", 1.0))
+        self.assertEqual(cache.fetch(key, lambda: {"svg": "<svg/>"}), {"svg": "<svg/>"})
+        self.assertEqual(cache.fetch(key, lambda: self.fail("rendered twice")), {"svg": "<svg/>"})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_disabled(self):
+        cache = RenderedFragmentCache(None)
+        key = cache.key("plot", 1)
+        cache.fetch(key, lambda: "<svg/>")
+        cache.fetch(key, lambda: "<svg/>")
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+
+class TestGlycopeptideReportFigures(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database_path = os.path.join(self.directory, "analysis.db")
+        self.cache_directory = os.path.join(self.directory, "figures")
+        self.mzml_path = get_test_data("example_glycopeptide_spectra.mzML")
+        db = DatabaseBoundOperation(self.database_path)
+        self.analysis_id = populate_glycopeptide_analysis(db.session)
+        scan_ids = [scan.id for scan in ProcessedMzMLDeserializer(self.mzml_path)]
+        for i, scan in enumerate(db.query(MSScan).order_by(MSScan.index)):
+            scan.scan_id = scan_ids[min(i, len(scan_ids) - 1)]
+        db.session.commit()
+        db.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def describe_all(self, n_processes, cache_directory):
+        creator = GlycopeptideDatabaseSearchReportCreator(
+            self.database_path, self.analysis_id, mzml_path=self.mzml_path,
+            n_processes=n_processes, cache_directory=cache_directory)
+        creator.start_workers()
+        try:
+            glycopeptides = creator.session.query(IdentifiedGlycopeptide).order_by(
+                IdentifiedGlycopeptide.id.desc()).all()
+            return creator, {gp.id: creator.spectrum_match_info(gp) for gp in glycopeptides}
+        finally:
+            creator.stop_workers()
+
+    def test_cached_and_parallel(self):
+        creator, serial = self.describe_all(1, self.cache_directory)
+        self.assertEqual(len(serial), 2)
+        for info in serial.values():
+            self.assertTrue(info['spectrum_plot'].startswith("<img"))
+            self.assertEqual(info['mass_shift_name'], "Unmodified")
+        # Both identifications share a structure and best scan, so the second reuses
+        # the first's figures
+        self.assertEqual((creator.figure_cache.hits, creator.figure_cache.misses), (2, 2))
+
+        creator, cached = self.describe_all(1, self.cache_directory)
+        self.assertEqual(creator.figure_cache.misses, 0)
+        self.assertEqual(cached, serial)
+
+        _, parallel = self.describe_all(2, None)
+        self.assertEqual(parallel, serial)
+
+
+if __name__ == '__main__':
+    unittest.main()